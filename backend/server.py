@@ -1,17 +1,66 @@
 # server.py
-from flask import Flask, jsonify, make_response
+from flask import Flask, Response, jsonify, make_response, request, stream_with_context
 from flask_cors import CORS
+import gzip
+import hashlib
+import json
+import bisect
+import importlib
+import queue
 import re
+import subprocess
+import sys
+import threading
 import time
 import logging
 import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 CORS(app)  # <- allow all origins for development. For production, lock this down.
 
 logging.basicConfig(level=logging.INFO)
 
-def parse_explanation(path="output_explanation.txt"):
+# --- Repository paths ---
+# The agent, predictor and data directories live in the repository, not next to this file (there is a
+# copy under backend/ and one under mobile-app/flutter_application_1/). REPO_ROOT defaults to the
+# nearest ancestor holding src/agent; each directory can also be set on its own (AGENT_DIR, ...).
+# A container built from backend/ alone must mount the repository and set REPO_ROOT.
+class DataDirMissing(RuntimeError):
+    pass
+
+def find_repo_root():
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = here
+    while not os.path.isdir(os.path.join(path, "src", "agent")):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return os.path.dirname(here)
+        path = parent
+    return path
+
+REPO_ROOT = os.environ.get("REPO_ROOT") or find_repo_root()
+
+def repo_path(env_name, *parts):
+    return os.path.abspath(os.environ.get(env_name) or os.path.join(REPO_ROOT, *parts))
+
+def require_dir(path, env_name):
+    """Raises DataDirMissing (answered with a 503) naming the env var to set."""
+    if not os.path.isdir(path):
+        raise DataDirMissing(f"{path} does not exist; set {env_name} (or REPO_ROOT for every directory)")
+    return path
+
+@app.errorhandler(DataDirMissing)
+def data_dir_error(e):
+    return make_response(jsonify({"error": str(e)}), 503)
+
+# The agent writes its outputs at the repository root; older runs named the explanations file
+# output_explanation.txt, the agent now writes output_explanations.txt. Both are accepted.
+ANALYSIS_FILES = ("output_explanation.txt", "output_explanations.txt")
+
+def parse_explanation(path):
     appliances = {}
     if not os.path.exists(path):
         app.logger.error(f"{path} not found")
@@ -40,11 +89,154 @@ def parse_explanation(path="output_explanation.txt"):
 
     return appliances
 
+# --- Response cache ---
+# Each endpoint's JSON is parsed, serialized and gzipped once per version of its source file
+# (mtime + size), so polling clients mostly get a cheap 304 or a pre-built body.
+GZIP_MIN_BYTES = 512
+
+class CachedFileResponse:
+    def __init__(self, path, build):
+        """
+        build(path) -> (status_code, payload dict); only called when the file changes.
+        path may be a tuple of candidates: the first that exists is served (re-checked on every get).
+        """
+        self.candidates = (path,) if isinstance(path, str) else tuple(path)
+        self.build = build
+        self._lock = threading.Lock()
+        self._signature = object()
+        self._entry = None
+
+    @property
+    def path(self):
+        return next((p for p in self.candidates if os.path.exists(p)), self.candidates[0])
+
+    def _file_signature(self, path):
+        try:
+            stat = os.stat(path)
+            return path, stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def get(self):
+        path = self.path
+        signature = self._file_signature(path)
+        with self._lock:
+            if signature != self._signature:
+                status, payload = self.build(path)
+                body = json.dumps(payload).encode("utf-8")
+                self._entry = {
+                    "status": status,
+                    "body": body,
+                    "gzip": gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None,
+                    # Content hash: an unchanged rewrite still matches the client's ETag
+                    "etag": hashlib.sha1(body).hexdigest()[:20],
+                    "last_modified": signature[1] / 1e9 if signature else None,
+                }
+                self._signature = signature
+            return self._entry
+
+def cached_json_response(cache):
+    return conditional_json_response(cache.get())
+
+def conditional_json_response(entry):
+    """Serve a pre-built {status, body, gzip, etag, last_modified} entry with ETag/304 and gzip."""
+    use_gzip = entry["gzip"] is not None and "gzip" in request.accept_encodings
+    response = make_response(entry["gzip"] if use_gzip else entry["body"], entry["status"])
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Cache-Control"] = "no-cache"  # always revalidate, usually with a 304
+    response.headers["Vary"] = "Accept-Encoding"
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    if entry["status"] == 200:
+        response.set_etag(entry["etag"] + ("-gz" if use_gzip else ""))
+        if entry["last_modified"] is not None:
+            response.last_modified = entry["last_modified"]
+        response.make_conditional(request)
+    return response
+
+def build_analysis(path):
+    return 200, parse_explanation(path)
+
+def build_schedules(path):
+    if not os.path.exists(path):
+        return 404, {"error": f"{os.path.basename(path)} not found", "schedules": ""}
+    with open(path, "r", encoding="utf-8") as f:
+        data = f.read()
+    # Return schedules as a string (you already parse it on the client)
+    return 200, {"schedules": data}
+
+analysis_cache = CachedFileResponse([os.path.join(REPO_ROOT, name) for name in ANALYSIS_FILES], build_analysis)
+schedules_cache = CachedFileResponse(os.path.join(REPO_ROOT, "output.txt"), build_schedules)
+
+# --- Push updates (Server-Sent Events) ---
+# One watcher thread stats the two output files; every /events client just waits on a shared
+# condition and receives the same pre-serialized event bytes, so idle connections cost no polling.
+# For thousands of connections run under gevent, e.g.
+#   gunicorn -k gevent -w 1 --worker-connections 5000 server:app
+EVENTS_WATCH_SECS = 0.5   # new plans reach clients within about this long
+EVENTS_HEARTBEAT_SECS = 15
+
+class ScheduleEvents:
+    def __init__(self, caches):
+        self.caches = caches
+        self._cond = threading.Condition()
+        self._event_id = None
+        self._event = None
+        self._watcher = None
+        self._start_lock = threading.Lock()
+
+    def _snapshot(self):
+        entries = {name: cache.get() for name, cache in self.caches.items()}
+        event_id = ".".join(entries[name]["etag"] for name in sorted(entries))
+        return event_id, entries
+
+    def _publish(self):
+        event_id, entries = self._snapshot()
+        if event_id == self._event_id:
+            return
+        payload = {"id": event_id}
+        for name, entry in entries.items():
+            payload[name] = json.loads(entry["body"]) if entry["status"] == 200 else None
+        event = f"id: {event_id}\nevent: update\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+        with self._cond:
+            self._event_id, self._event = event_id, event
+            self._cond.notify_all()
+
+    def _watch(self):
+        while True:
+            try:
+                self._publish()
+            except Exception:
+                app.logger.exception("Error watching schedule files")
+            time.sleep(EVENTS_WATCH_SECS)
+
+    def start(self):
+        with self._start_lock:
+            if self._watcher is None:
+                self._publish()
+                self._watcher = threading.Thread(target=self._watch, name="schedule-events", daemon=True)
+                self._watcher.start()
+
+    def stream(self, last_event_id=None):
+        """Yield SSE frames: the current state (unless the client already has it), then each change."""
+        yield f"retry: {int(EVENTS_WATCH_SECS * 2000)}\n\n".encode("utf-8")
+        seen = last_event_id
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._event_id != seen, EVENTS_HEARTBEAT_SECS)
+                event_id, event = self._event_id, self._event
+            if event_id != seen:
+                seen = event_id
+                yield event
+            else:
+                yield b": keepalive\n\n"
+
+schedule_events = ScheduleEvents({"schedules": schedules_cache, "analysis": analysis_cache})
+
 @app.route("/analysis")
 def get_analysis():
     try:
-        data = parse_explanation()
-        return jsonify(data)
+        return cached_json_response(analysis_cache)
     except Exception as e:
         app.logger.exception("Error in /analysis")
         return make_response(jsonify({"error": "internal server error"}), 500)
@@ -52,26 +244,536 @@ def get_analysis():
 @app.route("/schedules")
 def get_schedules():
     try:
-        if not os.path.exists("output.txt"):
-            return make_response(jsonify({"error": "output.txt not found", "schedules": ""}), 404)
-        with open("output.txt", "r", encoding="utf-8") as f:
-            data = f.read()
-        # Return schedules as a string (you already parse it on the client)
-        return jsonify({"schedules": data})
+        return cached_json_response(schedules_cache)
     except Exception as e:
         app.logger.exception("Error in /schedules")
         return make_response(jsonify({"error": "internal server error", "schedules": ""}), 500)
 
-@app.route("/refresh")
+@app.route("/events")
+def events():
+    schedule_events.start()
+    response = Response(stream_with_context(schedule_events.stream(request.headers.get("Last-Event-ID"))),
+                        mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # don't let a reverse proxy buffer the stream
+    return response
+
+# --- Multi-home index ---
+# Per-home outputs live in HOMES_DIR/<home_id>/ (output.txt + output_explanation.txt). Each home gets
+# its own cached responses, so a lookup is a dict hit plus one stat regardless of fleet size. A
+# background scan picks up new/removed homes and keeps per-home summaries and fleet totals current,
+# re-parsing only homes whose files changed.
+HOMES_DIR = repo_path("HOMES_DIR", "homes")
+HOMES_SCAN_SECS = 5
+HOMES_PAGE_MAX = 500
+HOME_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")  # no leading dot: rules out "." and ".."
+
+def is_inside(root, path):
+    """True if path resolves (following symlinks) to somewhere under the directory root."""
+    root = os.path.realpath(root)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+def build_inside(home_dir, build):
+    """Wrap a build function so a file that resolves outside home_dir (e.g. a symlink out) is never read."""
+    def build_checked(path):
+        if not is_inside(home_dir, path):
+            return 404, {"error": f"{os.path.basename(path)} not found"}
+        return build(path)
+    return build_checked
+
+class HomeEntry:
+    def __init__(self, home_id, home_dir):
+        self.home_id = home_id
+        self.schedules = CachedFileResponse(os.path.join(home_dir, "output.txt"), build_inside(home_dir, build_schedules))
+        self.analysis = CachedFileResponse([os.path.join(home_dir, name) for name in ANALYSIS_FILES], build_inside(home_dir, build_analysis))
+        self.version = None
+        self.summary = None
+
+    def refresh_summary(self):
+        """Recompute the summary if either file changed; returns True when it did."""
+        schedules, analysis = self.schedules.get(), self.analysis.get()
+        version = (schedules["etag"], analysis["etag"])
+        if version == self.version:
+            return False
+        costs = json.loads(analysis["body"]) if analysis["status"] == 200 else {}
+        self.summary = {
+            "id": self.home_id,
+            "has_schedules": schedules["status"] == 200,
+            "appliances": len(costs),
+            "original_cost": round(sum(c["original_cost"] for c in costs.values()), 2),
+            "optimized_cost": round(sum(c["optimized_cost"] for c in costs.values()), 2),
+            "savings": round(sum(c["savings"] for c in costs.values()), 2),
+            "updated_at": max(filter(None, [schedules["last_modified"], analysis["last_modified"]]), default=None),
+        }
+        self.version = version
+        return True
+
+class HomeIndex:
+    def __init__(self, homes_dir):
+        self.homes_dir = homes_dir
+        self._lock = threading.Lock()
+        self._homes = {}
+        self._ids = []        # sorted, for stable pagination
+        self._fleet = None
+        self._scanner = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        require_dir(self.homes_dir, "HOMES_DIR")
+        with self._start_lock:
+            if self._scanner is None:
+                self.scan()
+                self._scanner = threading.Thread(target=self._scan_forever, name="home-index", daemon=True)
+                self._scanner.start()
+
+    def _scan_forever(self):
+        while True:
+            time.sleep(HOMES_SCAN_SECS)
+            try:
+                self.scan()
+            except Exception:
+                app.logger.exception("Error scanning %s", self.homes_dir)
+
+    def home_dir(self, home_id):
+        """Directory of a home, or None unless the id is valid and resolves to a directory inside homes_dir."""
+        if not HOME_ID_RE.match(home_id):
+            return None
+        root = os.path.realpath(self.homes_dir)
+        path = os.path.realpath(os.path.join(root, home_id))
+        if os.path.dirname(path) != root or not os.path.isdir(path):
+            return None
+        return path
+
+    def _add(self, home_id, home_dir):
+        entry = HomeEntry(home_id, home_dir)
+        entry.refresh_summary()
+        with self._lock:
+            if home_id not in self._homes:
+                self._homes[home_id] = entry
+                bisect.insort(self._ids, home_id)
+                self._fleet = None
+            return self._homes[home_id]
+
+    def scan(self):
+        try:
+            found = {e.name: self.home_dir(e.name) for e in os.scandir(self.homes_dir)}
+            found = {home_id: path for home_id, path in found.items() if path}
+        except FileNotFoundError:
+            found = {}
+        with self._lock:
+            known = set(self._homes)
+            for home_id in known - found.keys():
+                del self._homes[home_id]
+                self._ids.remove(home_id)
+            if known - found.keys():
+                self._fleet = None
+            entries = list(self._homes.values())
+        for home_id in found.keys() - known:
+            self._add(home_id, found[home_id])
+        changed = False
+        for entry in entries:
+            changed |= entry.refresh_summary()
+        if changed:
+            with self._lock:
+                self._fleet = None
+
+    def get(self, home_id):
+        """Entry for a home, adding it on first request if its directory exists."""
+        entry = self._homes.get(home_id)
+        if entry is None:
+            home_dir = self.home_dir(home_id)
+            if home_dir is not None:
+                entry = self._add(home_id, home_dir)
+        return entry
+
+    def page(self, offset, limit):
+        with self._lock:
+            ids = self._ids[offset:offset + limit]
+            total = len(self._ids)
+            summaries = [self._homes[home_id].summary for home_id in ids]
+        return summaries, total
+
+    def fleet_summary(self):
+        with self._lock:
+            if self._fleet is None:
+                summaries = [entry.summary for entry in self._homes.values()]
+                self._fleet = {
+                    "homes": len(summaries),
+                    "homes_with_schedules": sum(1 for s in summaries if s["has_schedules"]),
+                    "original_cost": round(sum(s["original_cost"] for s in summaries), 2),
+                    "optimized_cost": round(sum(s["optimized_cost"] for s in summaries), 2),
+                    "savings": round(sum(s["savings"] for s in summaries), 2),
+                    "top_savers": [
+                        {"id": s["id"], "savings": s["savings"]}
+                        for s in sorted(summaries, key=lambda s: s["savings"], reverse=True)[:10]
+                    ],
+                    "computed_at": time.time(),
+                }
+            return self._fleet
+
+home_index = HomeIndex(HOMES_DIR)
+
+@app.route("/homes")
+def list_homes():
+    try:
+        home_index.start()
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = max(1, min(int(request.args.get("limit", 100)), HOMES_PAGE_MAX))
+        homes, total = home_index.page(offset, limit)
+        body = {"homes": homes, "total": total, "offset": offset, "limit": limit}
+        if offset + limit < total:
+            body["next"] = f"/homes?offset={offset + limit}&limit={limit}"
+        return jsonify(body)
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+@app.route("/homes/<home_id>/schedules")
+def home_schedules(home_id):
+    home_index.start()
+    entry = home_index.get(home_id)
+    if entry is None:
+        return make_response(jsonify({"error": "unknown home", "schedules": ""}), 404)
+    return cached_json_response(entry.schedules)
+
+@app.route("/homes/<home_id>/analysis")
+def home_analysis(home_id):
+    home_index.start()
+    entry = home_index.get(home_id)
+    if entry is None:
+        return make_response(jsonify({"error": "unknown home"}), 404)
+    return cached_json_response(entry.analysis)
+
+@app.route("/fleet/summary")
+def fleet_summary():
+    home_index.start()
+    return jsonify(home_index.fleet_summary())
+
+# --- Chart data ---
+# /charts returns chart-ready series for a time range, downsampled server-side with LTTB
+# (src/predictor/downsample.py) so long histories stay small. Results are cached per
+# (series, range, resolution) and keyed on the source data's version, so repeat requests are free.
+PREDICTOR_DIR = repo_path("PREDICTOR_DIR", "src", "predictor")
+SENSOR_LOG_DIR = repo_path("SENSOR_LOG_DIR", "data", "sensor_log")
+CHART_POINTS_DEFAULT = 500
+CHART_POINTS_MAX = 5000
+CHART_CACHE_SIZE = 128
+CHART_NOW_STEP_SECS = 60   # open-ended ranges snap "now" to this step so they can be cached
+SCHEDULE_RE = re.compile(r"---\s*(.+?)\s*---\s*\nStates:\s*\[([^\]]*)\]")
+
+def import_predictor_module(name):
+    require_dir(PREDICTOR_DIR, "PREDICTOR_DIR")
+    if PREDICTOR_DIR not in sys.path:
+        sys.path.append(PREDICTOR_DIR)
+    return importlib.import_module(name)
+
+class ChartCache:
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+        entry = {
+            "status": 200,
+            "body": body,
+            "gzip": gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None,
+            "etag": hashlib.sha1(body).hexdigest()[:20],
+            "last_modified": None,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+chart_cache = ChartCache(CHART_CACHE_SIZE)
+
+def _points(x, y):
+    return [[round(float(a), 3), round(float(b), 3)] for a, b in zip(x, y)]
+
+def sensor_chart(start, end, points, appliance):
+    sensor_log = import_predictor_module("sensor_log")
+    downsample = import_predictor_module("downsample")
+    reader = sensor_log.SensorLogReader(require_dir(SENSOR_LOG_DIR, "SENSOR_LOG_DIR"))
+    segments = reader.segments(start, end)
+    version = tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in segments)
+
+    def build():
+        timestamps, values = reader.read(start, end)
+        columns = [i for i, name in enumerate(reader.columns) if appliance in (None, name)]
+        series = []
+        for i, (x, y) in zip(columns, downsample.downsample_columns(timestamps, values[:, columns], points)):
+            series.append({"name": reader.columns[i], "points": _points(x, y)})
+        return {"series": series, "start": start, "end": end, "raw_points": len(timestamps), "resolution": points}
+
+    return chart_cache.get_or_build(("sensor", start, end, points, appliance, version), build)
+
+def savings_chart(start, end, points, appliance):
+    downsample = import_predictor_module("downsample")
+    history = get_run_history()
+    start_day = datetime.fromtimestamp(start).strftime("%Y-%m-%d")
+    # RunHistory.savings takes an exclusive end day; include the day containing `end` (usually today)
+    end_day = (datetime.fromtimestamp(end) + timedelta(days=1)).strftime("%Y-%m-%d")
+    rows = history.savings("day", start_day, end_day, appliance or "total")
+    version = tuple((r["period"], r["appliance"], r["runs"]) for r in rows)[-1:] + (len(rows),)
+
+    def build():
+        series = []
+        for name in sorted({r["appliance"] for r in rows}):
+            mine = [r for r in rows if r["appliance"] == name]
+            x = [datetime.strptime(r["period"], "%Y-%m-%d").timestamp() for r in mine]
+            y = [r["avg_savings"] for r in mine]
+            idx = downsample.lttb(x, y, points)
+            series.append({"name": name, "points": [[x[i], round(y[i], 3)] for i in idx]})
+        return {"series": series, "start": start, "end": end, "raw_points": len(rows), "resolution": points}
+
+    return chart_cache.get_or_build(("savings", start, end, points, appliance, version), build)
+
+def schedule_chart():
+    entry = schedules_cache.get()
+
+    def build():
+        text = json.loads(entry["body"]).get("schedules", "") if entry["status"] == 200 else ""
+        series = [
+            {"name": name.strip(), "points": [[hour, int(v)] for hour, v in enumerate(values.split(",")) if v.strip()]}
+            for name, values in SCHEDULE_RE.findall(text)
+        ]
+        return {"series": series, "labels": [f"{h}:00" for h in range(24)]}
+
+    return chart_cache.get_or_build(("schedule", entry["etag"]), build)
+
+@app.route("/charts")
+def charts():
+    """?series=sensor|savings|schedule&start=&end=&points=&appliance="""
+    try:
+        kind = request.args.get("series", "schedule")
+        points = max(3, min(int(request.args.get("points", CHART_POINTS_DEFAULT)), CHART_POINTS_MAX))
+        end = parse_time_arg("end")
+        if end is None:
+            end = (time.time() // CHART_NOW_STEP_SECS + 1) * CHART_NOW_STEP_SECS
+        start = parse_time_arg("start")
+        if start is None:
+            start = end - 86400
+        appliance = request.args.get("appliance")
+
+        if kind == "sensor":
+            entry = sensor_chart(start, end, points, appliance)
+        elif kind == "savings":
+            entry = savings_chart(start, end, points, appliance)
+        elif kind == "schedule":
+            entry = schedule_chart()
+        else:
+            return make_response(jsonify({"error": f"unknown series '{kind}'"}), 400)
+        return conditional_json_response(entry)
+    except (ValueError, FileNotFoundError) as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    except DataDirMissing as e:
+        return data_dir_error(e)
+    except Exception as e:
+        app.logger.exception("Error in /charts")
+        return make_response(jsonify({"error": "internal server error"}), 500)
+
+# --- Refresh jobs ---
+# /refresh queues one agent scheduling cycle on a background worker and returns at once; while a run
+# is queued or in progress, further refreshes join it instead of adding runs.
+# The cycle runs as a child process (`agent.py --once`), not in this interpreter: its LLM, HTTP and
+# MQTT calls block for tens of seconds and would otherwise run on the gevent-patched serving worker.
+# The worker only reads the child's output, which is cooperative under gevent. AGENT_PYTHON selects
+# the interpreter (default: this one, so requirements.txt includes the agent's packages).
+AGENT_DIR = repo_path("AGENT_DIR", "src", "agent")
+AGENT_PYTHON = os.environ.get("AGENT_PYTHON") or sys.executable
+AGENT_STAGE_PREFIX = "[Stage] "  # printed by agent.py --once as each stage starts
+MAX_FINISHED_JOBS = 50
+
+class RefreshJobs:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}          # job_id -> job dict, oldest first
+        self._active = None      # id of the queued/running job
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def submit(self):
+        """Returns (job, created); joins the active job instead of queuing a duplicate."""
+        with self._lock:
+            if self._active is not None:
+                return dict(self._jobs[self._active]), False
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "stage": None,
+                "stages": [],
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "duration_secs": None,
+                "error": None,
+            }
+            self._active = job_id
+            self._trim()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="refresh-worker", daemon=True)
+                self._worker.start()
+            job = dict(self._jobs[job_id])
+        self._queue.put(job_id)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job, stages=[dict(s) for s in job["stages"]])
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished"] is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run_agent(self, job_id):
+        """Run one cycle in a child process, recording its stages; returns (status, error)."""
+        script = os.path.join(require_dir(AGENT_DIR, "AGENT_DIR"), "agent.py")
+        proc = subprocess.Popen([AGENT_PYTHON, "-u", script, "--once"], cwd=AGENT_DIR,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace")
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            if line.startswith(AGENT_STAGE_PREFIX):
+                self._on_stage(job_id, line[len(AGENT_STAGE_PREFIX):])
+            else:
+                app.logger.info("[refresh %s] %s", job_id, line)
+        code = proc.wait()
+        if code != 0:
+            return "failed", f"scheduling cycle aborted (agent exited with status {code}; see server log)"
+        return "done", None
+
+    def _on_stage(self, job_id, name):
+        now = time.time()
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["stages"]:
+                job["stages"][-1]["secs"] = round(now - job["stages"][-1]["started"], 3)
+            job["stages"].append({"name": name, "started": now, "secs": None})
+            job["stage"] = name
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                job["status"], job["started"] = "running", time.time()
+            try:
+                status, error = self._run_agent(job_id)
+            except Exception as e:
+                app.logger.exception("Refresh job %s failed", job_id)
+                status, error = "failed", str(e)
+            now = time.time()
+            with self._lock:
+                job = self._jobs[job_id]
+                if job["stages"] and job["stages"][-1]["secs"] is None:
+                    job["stages"][-1]["secs"] = round(now - job["stages"][-1]["started"], 3)
+                job.update(status=status, error=error, stage=None, finished=now,
+                           duration_secs=round(now - job["started"], 3))
+                self._active = None
+
+refresh_jobs = RefreshJobs()
+
+# --- Run history ---
+# Read-only views over the agent's SQLite run store (src/agent/run_history.py).
+RUN_HISTORY_DB = os.environ.get("RUN_HISTORY_DB")
+_run_history = None
+_run_history_lock = threading.Lock()
+
+def get_run_history():
+    global _run_history
+    with _run_history_lock:
+        if _run_history is None:
+            require_dir(AGENT_DIR, "AGENT_DIR")
+            if AGENT_DIR not in sys.path:
+                sys.path.append(AGENT_DIR)
+            from run_history import RunHistory, default_db_path
+            _run_history = RunHistory(RUN_HISTORY_DB or default_db_path)
+        return _run_history
+
+def parse_time_arg(name):
+    """Query arg as unix seconds; accepts a number or an ISO date/time."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def parse_day_arg(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value).strftime("%Y-%m-%d") if value else None
+
+@app.route("/history/runs")
+def history_runs():
+    try:
+        limit = min(int(request.args.get("limit", 100)), 1000)
+        offset = int(request.args.get("offset", 0))
+        runs = get_run_history().runs(parse_time_arg("start"), parse_time_arg("end"), limit, offset)
+        return jsonify({"runs": runs, "limit": limit, "offset": offset})
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    except DataDirMissing as e:
+        return data_dir_error(e)
+    except Exception as e:
+        app.logger.exception("Error in /history/runs")
+        return make_response(jsonify({"error": "internal server error"}), 500)
+
+@app.route("/history/runs/<int:run_id>")
+def history_run(run_id):
+    try:
+        run = get_run_history().run(run_id)
+        if run is None:
+            return make_response(jsonify({"error": "unknown run id"}), 404)
+        return jsonify(run)
+    except DataDirMissing as e:
+        return data_dir_error(e)
+    except Exception as e:
+        app.logger.exception("Error in /history/runs/<id>")
+        return make_response(jsonify({"error": "internal server error"}), 500)
+
+@app.route("/history/savings")
+def history_savings():
+    """?period=day|week&start=YYYY-MM-DD&end=YYYY-MM-DD&appliance=<name>|total"""
+    try:
+        rows = get_run_history().savings(request.args.get("period", "day"), parse_day_arg("start"),
+                                         parse_day_arg("end"), request.args.get("appliance"))
+        return jsonify({"savings": rows})
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    except DataDirMissing as e:
+        return data_dir_error(e)
+    except Exception as e:
+        app.logger.exception("Error in /history/savings")
+        return make_response(jsonify({"error": "internal server error"}), 500)
+
+@app.route("/refresh", methods=["GET", "POST"])
 def refresh():
     try:
-        # Here you can re-run your model or pull new data files
-        # For now, we'll just note the time it was refreshed
-        print(f"Data refreshed at {time.ctime()}")
-        return jsonify({"status": "success", "message": "Files reloaded"})
+        job, created = refresh_jobs.submit()
+        print(f"Refresh {'queued' if created else 'joined'} job {job['id']} at {time.ctime()}")
+        body = {"status": job["status"], "job_id": job["id"], "deduplicated": not created,
+                "status_url": f"/refresh/{job['id']}"}
+        return make_response(jsonify(body), 202)
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/refresh/<job_id>")
+def refresh_status(job_id):
+    job = refresh_jobs.get(job_id)
+    if job is None:
+        return make_response(jsonify({"error": "unknown job id"}), 404)
+    return jsonify(job)
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=port)
@@ -3,6 +3,8 @@ import 'package:http/http.dart' as http;
 import 'dart:convert';
 import 'package:fl_chart/fl_chart.dart';
 import 'dart:async';
+import '../services/charts_api.dart';
+import '../services/schedule_events.dart';
 
 class PredictionsPage extends StatefulWidget {
   const PredictionsPage({super.key});
@@ -14,18 +16,78 @@ class PredictionsPage extends StatefulWidget {
 class _PredictionsPageState extends State<PredictionsPage> {
   List<Map<String, dynamic>> appliances = [];
   bool loading = true;
+  final ScheduleEvents _events = ScheduleEvents();
+  final ChartsApi _charts = ChartsApi();
+  Map<String, List<double>> usage = {}; // last 24 h of power per appliance, from /charts
+  StreamSubscription<Map<String, dynamic>>? _updates;
+  Timer? _refreshTimer;
 
   @override
   void initState() {
     super.initState();
     fetchApplianceData();
+    fetchUsage();
 
-    // re-fetch every 30 minutes
-    Timer.periodic(Duration(minutes: 30), (timer) {
+    // New analyses are pushed over /events as soon as the agent writes them
+    _updates = _events.updates.listen((update) {
+      final payload = update["analysis"];
+      if (payload is Map<String, dynamic> && mounted) {
+        setState(() {
+          appliances = toAppliances(payload);
+          loading = false;
+        });
+        fetchUsage();
+      }
+    });
+
+    // Fallback: re-fetch every 30 minutes
+    _refreshTimer = Timer.periodic(Duration(minutes: 30), (timer) {
       fetchApplianceData();
+      fetchUsage();
     });
   }
 
+  @override
+  void dispose() {
+    _updates?.cancel();
+    _events.close();
+    _refreshTimer?.cancel();
+    super.dispose();
+  }
+
+  List<Map<String, dynamic>> toAppliances(Map<String, dynamic> data) {
+    return data.entries.map<Map<String, dynamic>>((entry) {
+      final value = entry.value;
+      return {
+        'name': entry.key,
+        'original_cost': value != null && value['original_cost'] != null
+            ? value['original_cost']
+            : 0,
+        'optimized_cost':
+            value != null && value['optimized_cost'] != null
+            ? value['optimized_cost']
+            : 0,
+        'savings': value != null && value['savings'] != null
+            ? value['savings']
+            : 0,
+        // optional: 'prediction': value['prediction'],
+      };
+    }).toList();
+  }
+
+  /// Power history for the cards' graphs, downsampled by the backend to 48 points.
+  Future<void> fetchUsage() async {
+    try {
+      final series = await _charts.fetch("sensor", points: 48);
+      if (!mounted) return;
+      setState(() {
+        usage = {for (final s in series) s.name: s.values};
+      });
+    } catch (e) {
+      print("Usage chart unavailable: $e");
+    }
+  }
+
   Future<void> fetchApplianceData() async {
     try {
       final response = await http.get(
@@ -35,23 +97,7 @@ class _PredictionsPageState extends State<PredictionsPage> {
         final data = jsonDecode(response.body);
         if (data is Map<String, dynamic>) {
           setState(() {
-            appliances = data.entries.map<Map<String, dynamic>>((entry) {
-              final value = entry.value;
-              return {
-                'name': entry.key,
-                'original_cost': value != null && value['original_cost'] != null
-                    ? value['original_cost']
-                    : 0,
-                'optimized_cost':
-                    value != null && value['optimized_cost'] != null
-                    ? value['optimized_cost']
-                    : 0,
-                'savings': value != null && value['savings'] != null
-                    ? value['savings']
-                    : 0,
-                // optional: 'prediction': value['prediction'],
-              };
-            }).toList();
+            appliances = toAppliances(data);
             loading = false;
           });
         } else {
@@ -94,10 +140,10 @@ class _PredictionsPageState extends State<PredictionsPage> {
               itemBuilder: (context, index) {
                 final appliance = appliances[index];
 
-                // If your Flask also sends a 'prediction' list, you can use it for the graph
-                final List<double> prediction = appliance['prediction'] != null
-                    ? List<double>.from(appliance['prediction'])
-                    : [0, 0, 0, 0, 0];
+                // Last 24 h of measured power from /charts (flat line until it loads)
+                final List<double> history = usage[appliance['name']] ?? [];
+                final List<double> prediction =
+                    history.isNotEmpty ? history : [0, 0, 0, 0, 0];
 
                 return Card(
                   shape: RoundedRectangleBorder(
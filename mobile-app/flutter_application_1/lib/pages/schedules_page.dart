@@ -2,6 +2,8 @@ import 'package:flutter/material.dart';
 import 'package:http/http.dart' as http;
 import 'dart:convert';
 import 'dart:async';
+import '../services/charts_api.dart';
+import '../services/schedule_events.dart';
 
 class SchedulesPage extends StatefulWidget {
   const SchedulesPage({super.key});
@@ -13,19 +15,60 @@ class SchedulesPage extends StatefulWidget {
 class _SchedulesPageState extends State<SchedulesPage> {
   Map<String, List<int>> schedules = {};
   bool loading = true;
+  final ScheduleEvents _events = ScheduleEvents();
+  final ChartsApi _charts = ChartsApi();
+  StreamSubscription<Map<String, dynamic>>? _updates;
+  Timer? _refreshTimer;
 
   @override
   void initState() {
     super.initState();
     fetchSchedules();
 
-    // re-fetch every 30 minutes
-    Timer.periodic(Duration(minutes: 30), (timer) {
+    // /events announces each new plan; the states are then read from /charts
+    _updates = _events.updates.listen((update) {
+      if (update["schedules"] != null && mounted) {
+        fetchSchedules();
+      }
+    });
+
+    // Fallback: re-fetch every 30 minutes
+    _refreshTimer = Timer.periodic(Duration(minutes: 30), (timer) {
       fetchSchedules();
     });
   }
 
+  @override
+  void dispose() {
+    _updates?.cancel();
+    _events.close();
+    _refreshTimer?.cancel();
+    super.dispose();
+  }
+
   Future<void> fetchSchedules() async {
+    try {
+      final series = await _charts.fetch("schedule");
+      if (!mounted) return;
+      setState(() {
+        // Points are [hour, state]; hours missing from the plan stay OFF
+        schedules = {
+          for (final s in series)
+            s.name: List.generate(24, (hour) {
+              final p = s.points.where((p) => p[0].toInt() == hour);
+              return p.isEmpty ? 0 : p.first[1].toInt();
+            }),
+        };
+        loading = false;
+      });
+    } catch (e) {
+      print("Schedule chart unavailable ($e); falling back to /schedules");
+      await fetchScheduleText();
+    }
+  }
+
+  /// Fallback for backends without /charts: parse output.txt from /schedules.
+  Future<void> fetchScheduleText() async {
     try {
       final response = await http.get(
         Uri.parse("https://energy-api-632525537450.asia-south1.run.app/schedules"),
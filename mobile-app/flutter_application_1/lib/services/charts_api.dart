@@ -0,0 +1,70 @@
+import 'dart:convert';
+import 'package:http/http.dart' as http;
+
+/// One named series from `/charts`: [x, y] points, already downsampled by
+/// the backend (x is unix seconds for sensor/savings, the hour for schedule).
+class ChartSeries {
+  final String name;
+  final List<List<double>> points;
+
+  ChartSeries(this.name, this.points);
+
+  List<double> get values => points.map((p) => p[1]).toList();
+}
+
+/// Client for the backend's `/charts` endpoint. Remembers each URL's ETag
+/// and body, so a refresh of unchanged data is a 304 with no parsing.
+class ChartsApi {
+  static const String chartsUrl =
+      "https://energy-api-632525537450.asia-south1.run.app/charts";
+
+  final Map<String, String> _etags = {};
+  final Map<String, List<ChartSeries>> _cached = {};
+
+  /// series: "sensor", "savings" or "schedule"; start/end are unix seconds
+  /// (the backend defaults to the last 24 hours).
+  Future<List<ChartSeries>> fetch(
+    String series, {
+    int? points,
+    String? appliance,
+    double? start,
+    double? end,
+  }) async {
+    final query = <String, String>{"series": series};
+    if (points != null) query["points"] = "$points";
+    if (appliance != null) query["appliance"] = appliance;
+    if (start != null) query["start"] = "$start";
+    if (end != null) query["end"] = "$end";
+    final url = Uri.parse(chartsUrl).replace(queryParameters: query);
+    final key = url.toString();
+
+    final headers = <String, String>{};
+    if (_etags[key] != null && _cached[key] != null) {
+      headers["If-None-Match"] = _etags[key]!;
+    }
+    final response = await http.get(url, headers: headers);
+    if (response.statusCode == 304 && _cached[key] != null) {
+      return _cached[key]!;
+    }
+    if (response.statusCode != 200) {
+      throw Exception("/charts returned ${response.statusCode}: ${response.body}");
+    }
+
+    final decoded = jsonDecode(response.body);
+    final result = <ChartSeries>[];
+    for (final s in (decoded["series"] as List? ?? [])) {
+      final pts = (s["points"] as List)
+          .map<List<double>>(
+            (p) => [(p[0] as num).toDouble(), (p[1] as num).toDouble()],
+          )
+          .toList();
+      result.add(ChartSeries(s["name"].toString(), pts));
+    }
+    final etag = response.headers["etag"];
+    if (etag != null) {
+      _etags[key] = etag;
+      _cached[key] = result;
+    }
+    return result;
+  }
+}
@@ -0,0 +1,78 @@
+import 'dart:async';
+import 'dart:convert';
+import 'package:http/http.dart' as http;
+
+/// Listens to the backend's Server-Sent Events stream (`/events`) and emits
+/// one decoded update per new schedule/analysis:
+///   {"id": ..., "schedules": {"schedules": "<output.txt>"}, "analysis": {...}}
+/// Reconnects with backoff and resumes from the last event id.
+class ScheduleEvents {
+  static const String eventsUrl =
+      "https://energy-api-632525537450.asia-south1.run.app/events";
+
+  final _controller = StreamController<Map<String, dynamic>>.broadcast();
+  http.Client? _client;
+  String? _lastEventId;
+  bool _closed = false;
+
+  Stream<Map<String, dynamic>> get updates => _controller.stream;
+
+  ScheduleEvents() {
+    _connect();
+  }
+
+  Future<void> _connect() async {
+    var delay = const Duration(seconds: 1);
+    while (!_closed) {
+      _client = http.Client();
+      try {
+        final request = http.Request("GET", Uri.parse(eventsUrl));
+        request.headers["Accept"] = "text/event-stream";
+        if (_lastEventId != null) {
+          request.headers["Last-Event-ID"] = _lastEventId!;
+        }
+        final response = await _client!.send(request);
+        if (response.statusCode == 200) {
+          delay = const Duration(seconds: 1);
+          await _readEvents(response.stream);
+        } else {
+          print("/events returned ${response.statusCode}");
+        }
+      } catch (e) {
+        if (!_closed) print("Event stream error: $e");
+      } finally {
+        _client?.close();
+      }
+      if (_closed) break;
+      await Future.delayed(delay);
+      delay = delay * 2 > const Duration(seconds: 60)
+          ? const Duration(seconds: 60)
+          : delay * 2;
+    }
+  }
+
+  Future<void> _readEvents(Stream<List<int>> stream) async {
+    final data = StringBuffer();
+    await for (final line
+        in stream.transform(utf8.decoder).transform(const LineSplitter())) {
+      if (line.isEmpty) {
+        if (data.isNotEmpty) {
+          final decoded = jsonDecode(data.toString());
+          if (decoded is Map<String, dynamic>) {
+            _lastEventId = decoded["id"]?.toString() ?? _lastEventId;
+            _controller.add(decoded);
+          }
+          data.clear();
+        }
+      } else if (line.startsWith("data:")) {
+        data.write(line.substring(5).trimLeft());
+      }
+    }
+  }
+
+  void close() {
+    _closed = true;
+    _client?.close();
+    _controller.close();
+  }
+}
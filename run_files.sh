@@ -18,38 +18,10 @@ fi
 echo "[+] Starting Mosquitto MQTT broker..."
 mosquitto -d 2>/dev/null && echo "[OK] Mosquitto started." || echo "[!] Mosquitto not found; using public broker test.mosquitto.org."
 
-# --- MQTT Publisher (background) ---
-echo "[+] Starting MQTT Publisher script..."
-(
-    source .venv/bin/activate
-    python3 src/mqtt/publish_tou_test.py
-    deactivate
-    echo "[OK] MQTT Publisher finished."
-) &
-
-sleep 10
-
-# --- LSTM Predictor (synchronous: wait for appliance_data.txt to be written before agent starts) ---
-echo "[+] Running LSTM Predictor (waiting for it to write appliance_data.txt)..."
+# --- TOU publisher, LSTM predictor and LLM agent in one supervised process ---
+# src/run_edge.py starts the agent as soon as the predictor has states and the
+# TOU table is published, and restarts any component that fails.
+echo "[+] Starting edge stack (publisher + predictor + agent)..."
 source .venv/bin/activate
-timeout 120 python3 src/predictor/Run_LSTM.py
+python3 src/run_edge.py
 deactivate
-echo "[OK] LSTM Predictor finished. appliance_data.txt is ready."
-
-# --- LLM Agent (runs after LSTM is done) ---
-echo "[+] Starting LLM Agent script (with Ollama LLM scheduling)..."
-(
-    source .venv/bin/activate
-    python3 src/agent/agent.py
-    deactivate
-    echo "[OK] LLM Agent finished."
-) &
-
-echo ""
-echo "------------------------------------"
-echo "[OK] All scripts executing."
-echo "[OK] MQTT Publisher running in background."
-echo "[OK] LLM Agent running with Ollama-powered scheduling."
-echo "------------------------------------"
-
-wait
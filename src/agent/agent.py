@@ -1,5 +1,5 @@
-import paho.mqtt.client as mqtt
 import time
+import argparse
 import ast
 import json
 from langchain_ollama import ChatOllama
@@ -10,14 +10,34 @@ from typing import Dict, List, Tuple
 import requests
 from datetime import datetime
 import os
+import sys
 from zoneinfo import ZoneInfo
 
+import numpy as np
+
+# Predictor -> agent state handoff (src/predictor/state_bus.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'predictor')))
+from sensor_log import SensorLogReader
+from state_bus import StateBusSubscriber
+from run_history import RunHistory
+from tariff_engine import LEGACY_BANDS, compile_tariff
+
+# Shared MQTT session (src/mqtt/mqtt_session.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mqtt')))
+from mqtt_session import get_session_for_profile
+
 # =========================
 # CONFIG
 # =========================
-MQTT_BROKER = "test.mosquitto.org"
-MQTT_PORT = 1883
-MQTT_TOPIC = "power/tou_domestic"
+MQTT_PROFILE = "mosquitto"  # mqtt_session.BROKER_PROFILES; MQTT_HOST / MQTT_PORT etc. override it
+# Retained tariff to schedule against: LECO domestic TOU from tou_publisher.py, or any plan published by
+# tariff_ingest.py as power/tariffs/<source>/<plan>
+TARIFF_TOPIC = os.getenv("TARIFF_TOPIC", "power/tou_domestic")
+TARIFF_TZ = "Asia/Colombo"  # calendar used for weekday/holiday/season tariff rules and billing months
+
+# Block (slab) tariffs are priced at the month-to-date consumption, integrated from the predictor's sensor log
+SENSOR_LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'sensor_log'))
+SENSOR_MAX_GAP_SECS = 300  # gaps longer than this in the log count as no consumption
 
 # =========================
 # FIREBASE INITIALIZATION
@@ -63,6 +83,16 @@ USE_LLM_FOR_SCHED = True
 LLM_MODEL = "llama3.2:latest"  # your local Ollama tag
 LLM_TEMP = 0.0
 
+# Receive predicted states over the state bus; appliance_data.txt is the fallback.
+USE_STATE_BUS = True
+STATE_BUS_WAIT_SECS = 5
+state_subscriber = None
+last_states_tag = ""  # model version behind the states used in the current run
+
+# Keep every run (inputs, schedules, costs, timings) in data/run_history.sqlite3
+RECORD_RUN_HISTORY = True
+run_history = None
+
 
 # =========================
 #WEATHER INTIGRATION
@@ -124,39 +154,15 @@ def get_mqtt_power_data(timeout: int = 5):
       "peak":     {"time": "18:30 - 22:30", "rate": 67.0},
       "off_peak": {"time": "22:30 - 05:30", "rate": 21.0}
     }
-    """
-    result: Dict[str, str] = {}
 
-    # Try Paho v5 callback API; fall back to v1 if not available
-    try:
-        client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.v5)
-        def on_connect(client, userdata, flags, reason_code, properties):
-            if reason_code == 0:
-                client.subscribe(MQTT_TOPIC)
-            else:
-                result['error'] = f"Failed to connect, reason code: {reason_code}"
-    except AttributeError:
-        client = mqtt.Client()
-        def on_connect(client, userdata, flags, rc):
-            if rc == 0:
-                client.subscribe(MQTT_TOPIC)
-            else:
-                result['error'] = f"Failed to connect, return code: {rc}"
-
-    def on_message(client, userdata, msg):
-        result['payload'] = msg.payload.decode(errors="ignore")
-        client.disconnect()
-
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
-    for _ in range(timeout):
-        if 'payload' in result or 'error' in result:
-            break
-        time.sleep(1)
-    client.loop_stop()
-    return result.get('payload', result.get('error', 'No data received'))
+    The first call subscribes on the process's shared MQTT session; the broker
+    sends the retained TOU message and later calls return the newest payload
+    without reconnecting.
+    """
+    payload = get_session_for_profile(MQTT_PROFILE).latest(TARIFF_TOPIC, timeout=timeout)
+    if payload is None:
+        return 'No data received'
+    return payload.decode(errors="ignore")
 
 
 def read_appliance_status(filename: str) -> Dict[str, Dict[str, List[int]]]:
@@ -189,17 +195,6 @@ def read_appliance_status(filename: str) -> Dict[str, Dict[str, List[int]]]:
 # =========================
 # UTILS
 # =========================
-def parse_price_num(val) -> float:
-    """Extract numeric price from strings like 'LKR 54.00' or just numbers."""
-    if isinstance(val, (int, float)):
-        return float(val)
-    if isinstance(val, str):
-        m = re.search(r"[-+]?\d*\.?\d+", val)
-        if m:
-            return float(m.group(0))
-    return 0.0
-
-
 def fix_length(arr: List[int]) -> List[int]:
     """Ensure ON/OFF array has exactly 24 values (pads/truncates) as 0/1 ints."""
     arr = [int(x) & 1 for x in list(arr)]
@@ -210,32 +205,6 @@ def fix_length(arr: List[int]) -> List[int]:
     return arr
 
 
-def time_range_to_hours(start_time: str, end_time: str) -> List[int]:
-    """
-    Map a time band [start, end) to whole-hour indices [0..23].
-    Minutes are ignored for the hour end (half-open interval):
-      e.g., 05:30–18:30 -> [5,6,...,17]
-    Supports overnight wrap (e.g., 22:30–05:30) and '24:00'.
-    """
-    def parse_hhmm(s: str) -> int:
-        h, m = map(int, s.strip().split(":"))
-        if h == 24 and m == 0:
-            return 24 * 60
-        if not (0 <= h < 24 and 0 <= m < 60):
-            raise ValueError(f"Invalid HH:MM: {s}")
-        return h * 60 + m
-
-    s = parse_hhmm(start_time)
-    e = parse_hhmm(end_time)
-    if e <= s:
-        e += 24 * 60  # overnight
-
-    h_start = s // 60
-    h_end   = e // 60  # half-open: do not include h_end
-    hours = [(h % 24) for h in range(h_start, h_end)]
-    return sorted(set(hours))
-
-
 def extract_first_array(text: str):
     """Extract the first [...] block from LLM output (no markdown, just the array)."""
     text = re.sub(r"```[\w\W]*?```", "", text)  # strip fenced blocks
@@ -245,37 +214,62 @@ def extract_first_array(text: str):
 # =========================
 # PRICE MAP (per hour)
 # =========================
-def build_price_map(tou_json: Dict) -> Tuple[Dict[int, Dict], str]:
+def month_to_date_kwh(now=None):
+    """
+    kWh used since the start of the current month in TARIFF_TZ, integrated from the sensor log
+    (appliance power in W). Only monitored appliances are logged, so this is a lower bound on the
+    household's consumption. Returns None if there is no sensor log.
+    """
+    now = now or datetime.now(ZoneInfo(TARIFF_TZ))
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    try:
+        reader = SensorLogReader(SENSOR_LOG_DIR)
+    except (OSError, ValueError):
+        return None
+    watt_secs, last_ts, last_power = 0.0, None, 0.0
+    for timestamps, values in reader.iter_blocks(month_start.timestamp(), now.timestamp()):
+        power = np.clip(values.sum(axis=1, dtype=np.float64), 0.0, None)
+        if last_ts is not None:  # bridge from the previous block's last reading
+            timestamps = np.concatenate([[last_ts], timestamps])
+            power = np.concatenate([[last_power], power])
+        dt = np.clip(np.diff(timestamps), 0.0, SENSOR_MAX_GAP_SECS)
+        watt_secs += float(np.dot(power[:-1], dt))
+        last_ts, last_power = timestamps[-1], power[-1]
+    return watt_secs / 3.6e6
+
+
+def build_price_map(tou_json: Dict, day=None, consumed_kwh=None) -> Tuple[Dict[int, Dict], str]:
     """
     Build a 24-hour price map: {hour: {"price": float, "band": "day/peak/off_peak"}}
-    Accepts payloads using keys like `rate` or `price` (or `tariff`).
+    Accepts the LECO payload (keys like `rate`, `price` or `tariff`) or a seasonal /
+    holiday / slab tariff (see tariff_engine.py); the tariff is compiled once and the
+    prices for `day` (default: today in TARIFF_TZ) are sliced from its tables.
+    Block tariffs are priced at the marginal rate after `consumed_kwh` (default: the
+    month-to-date sensor log total; with no log, the first slab, so costs are a lower bound).
+    Sets tou_json[band]["hours"] for day/peak/off_peak for the scheduling rules; other
+    bands (e.g. "weekend") count as day hours there but keep their own price and name.
     Returns (price_map, currency).
     """
-    # Normalize hours for each band
-    for period, values in tou_json.items():
-        if period in ("day", "peak", "off_peak"):
-            start, end = values["time"].split(" - ")
-            tou_json[period]["hours"] = time_range_to_hours(start.strip(), end.strip())
-
-    currency = tou_json.get("currency", "LKR")
-
-    def get_rate_value(band: dict) -> float:
-        return parse_price_num(band.get("rate", band.get("price", band.get("tariff", 0))))
-
-    day_price = get_rate_value(tou_json["day"])
-    peak_price = get_rate_value(tou_json["peak"])
-    off_peak_price = get_rate_value(tou_json["off_peak"])
-
-    price_map: Dict[int, Dict] = {h: {"price": off_peak_price, "band": "off_peak"} for h in range(24)}
-
-    for h in tou_json["day"]["hours"]:
-        price_map[h] = {"price": day_price, "band": "day"}
-    for h in tou_json["peak"]["hours"]:
-        price_map[h] = {"price": peak_price, "band": "peak"}
-    for h in tou_json["off_peak"]["hours"]:
-        price_map[h] = {"price": off_peak_price, "band": "off_peak"}
-
-    return price_map, currency
+    tariff = compile_tariff(tou_json)
+    if day is None:
+        day = datetime.now(ZoneInfo(TARIFF_TZ)).date()
+    if tariff.slab_rates and consumed_kwh is None:
+        consumed_kwh = month_to_date_kwh()
+        if consumed_kwh is None:
+            print("[Agent] ⚠️ No sensor log for month-to-date kWh; block tariff priced at its first slab "
+                  "(costs and savings are a lower bound).")
+        else:
+            print(f"[Agent] Block tariff: {consumed_kwh:.1f} kWh logged this month -> "
+                  f"{tariff.marginal_rate(consumed_kwh)} {tariff.currency}/kWh")
+    prices, bands = tariff.day_prices(day, consumed_kwh or 0.0)
+
+    price_map: Dict[int, Dict] = {h: {"price": float(prices[h]), "band": bands[h]} for h in range(24)}
+    for period in LEGACY_BANDS:
+        tou_json.setdefault(period, {})["hours"] = [
+            h for h in range(24)
+            if bands[h] == period or (period == "day" and bands[h] not in LEGACY_BANDS)
+        ]
+    return price_map, tariff.currency
 
 # =========================
 # COSTS + EXPLANATIONS
@@ -425,6 +419,11 @@ def enforce_required_ons_improved(schedules: Dict[str, List[int]],
 def build_system_prompt(APPLIANCES, status, tou_json, weather, i, allow_peak):
     appliance = APPLIANCES[i]
     original = status[appliance]["states"]
+    measured = status[appliance].get("measured_on_minutes")
+    measured_str = (
+        f"Measured ON minutes per hour over the last 24h (hour indices 0..23): {measured}\n"
+        if measured is not None else ""
+    )
 
     # Weather context (24h ahead)
     temps = weather.get("temperature", [25]*24)
@@ -475,7 +474,7 @@ Given a single appliance, propose a 24-hour ON/OFF array (0=OFF, 1=ON) obeying t
 
 APPLIANCE: {appliance}
 Original predicted states (24h): {original}
-
+{measured_str}
 Time bands (hour indices 0..23):
   Day: {tou_json['day']['hours']}
   Peak: {tou_json['peak']['hours']}
@@ -554,14 +553,78 @@ def parse_user_preferences(user_msg: str) -> Dict[str, bool]:
     return allow_peak
 
 
-def main_once():
-    # 1) Read original states
-    import os
+def measured_on_minutes(msg) -> Dict[str, List[int]]:
+    """
+    ON minutes per hour of day (TARIFF_TZ) over the last 24 hours of real readings, read from the
+    predictor's hourly rollups carried by the state bus message. Empty if the message has none.
+    """
+    if msg.readings is None:
+        return {}
+    tz = ZoneInfo(TARIFF_TZ)
+    hour_of_day = [datetime.fromtimestamp(int(h) * 3600, tz).hour for h in msg.readings["hour"]]
+    measured = {}
+    for i, name in enumerate(msg.appliance_names):
+        minutes = [0] * 24
+        for col, hour in enumerate(hour_of_day):
+            minutes[hour] = int(msg.readings["on_minutes"][i, col])
+        measured[name] = minutes
+    return measured
+
+
+def get_predicted_states() -> Dict[str, Dict[str, List[int]]]:
+    """
+    Latest predicted states from the state bus, falling back to appliance_data.txt.
+    States from the bus also carry "measured_on_minutes" (see measured_on_minutes) when available.
+    """
+    global state_subscriber, last_states_tag
+    last_states_tag = ""
+    if USE_STATE_BUS:
+        if state_subscriber is None:
+            state_subscriber = StateBusSubscriber()
+        msg = state_subscriber.wait_for_update(timeout=STATE_BUS_WAIT_SECS)
+        if msg is not None:
+            print(f"[Agent] Using states #{msg.seq} from the state bus "
+                  f"(produced {time.time() - msg.timestamp:.0f}s ago).")
+            last_states_tag = msg.tag
+            status = msg.as_status()
+            for name, minutes in measured_on_minutes(msg).items():
+                status[name]["measured_on_minutes"] = minutes
+            return status
+        print("[Agent] No states on the state bus; reading appliance_data.txt.")
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
     appliance_data_path = os.path.abspath(os.path.join(base_dir, '..', '..', 'appliance_data.txt'))
-    status = read_appliance_status(appliance_data_path)
+    return read_appliance_status(appliance_data_path)
+
+
+def main_once(on_stage=None):
+    """
+    One scheduling cycle.
+
+    Parameters:
+    - on_stage: Optional callable(stage_name) invoked as each stage starts (progress / timings)
+
+    Returns:
+    - {"status", "schedules", "explanations", "currency"}, or None if the cycle was aborted
+    """
+    run_started = time.time()
+    timings: Dict[str, float] = {}
+    current_stage = [None, run_started]
+
+    def stage(name):
+        now = time.time()
+        if current_stage[0] is not None:
+            timings[current_stage[0]] = round(now - current_stage[1], 3)
+        current_stage[:] = [name, now]
+        if on_stage is not None:
+            on_stage(name)
+
+    # 1) Read original states
+    stage("read_states")
+    status = get_predicted_states()
 
     # 2) TOU from MQTT
+    stage("fetch_tou")
     print("[Agent] Fetching TOU rates from MQTT broker (timeout=30s)...")
     tou_json_raw = get_mqtt_power_data(timeout=30)
     print(f"[Agent] MQTT raw payload: {tou_json_raw[:120]}")
@@ -572,9 +635,15 @@ def main_once():
         print("Raw payload:", tou_json_raw)
         return
 
-    price_map, currency = build_price_map(tou_json)
+    try:
+        price_map, currency = build_price_map(tou_json)
+    except ValueError as e:
+        # e.g. a band with no price or an unreadable rate; never schedule against made-up prices
+        print("Invalid tariff from MQTT:", e)
+        return
 
     # 3) Weather (stub) – available for future LLM prompts
+    stage("weather")
     weather = fetch_weather_24h(LAT, LON)
 
     # 4) User preferences (example)
@@ -582,6 +651,7 @@ def main_once():
     allow_peak = parse_user_preferences(user_msg)
 
     # 5) Build schedules
+    stage("schedule")
     use_llm = USE_LLM_FOR_SCHED
     if use_llm:
         try:
@@ -645,6 +715,7 @@ def main_once():
             schedules[appliance] = original
 
     # 6) Post-process schedules
+    stage("postprocess")
     schedules = redistribute_peak_violations(schedules, tou_json, allow_peak)
     schedules = enforce_required_ons_improved(schedules, tou_json, required_ons, allow_peak)
 
@@ -659,6 +730,7 @@ def main_once():
                     raise AssertionError(f"{a} ON during forbidden peak hour {h}")
 
     # 8) WRITE schedules file
+    stage("write_outputs")
     write_schedules(schedules)
 
     # 9) COST & REASONS FILE
@@ -690,6 +762,7 @@ def main_once():
 
     # 10) WRITE TO FIRESTORE
     if db is not None:
+        stage("firestore")
         try:
             print("Writing outputs to Firestore...")
             analysis_data = {}
@@ -717,6 +790,26 @@ def main_once():
         except Exception as fe:
             print(f"❌ Failed to write to Firestore: {fe}")
 
+    result = {"status": status, "schedules": schedules, "explanations": explanations, "currency": currency}
+    stage("record_history")
+    record_run(run_started, result, mode, tou_json, timings)
+    return result
+
+
+def record_run(run_started, result, mode, tou_json, timings):
+    """Append the finished run to the local history store (never fails the cycle)."""
+    global run_history
+    if not RECORD_RUN_HISTORY:
+        return
+    try:
+        if run_history is None:
+            run_history = RunHistory()
+        run_id = run_history.record_run(run_started, time.time(), result, mode=mode,
+                                        model_tag=last_states_tag, tou=tou_json, timings=timings)
+        print(f"[Agent] Run #{run_id} saved to {run_history.path}")
+    except Exception as e:
+        print(f"[Agent] ⚠️ Could not save run history: {e}")
+
 
 def main_loop():
     while True:
@@ -726,4 +819,12 @@ def main_loop():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Appliance scheduling agent.")
+    parser.add_argument('--once', action='store_true',
+                        help="Run one cycle and exit (status 1 if it was aborted); used by the backend's /refresh")
+    args = parser.parse_args()
+    if args.once:
+        # The backend reads these lines as job progress
+        result = main_once(on_stage=lambda name: print(f"[Stage] {name}", flush=True))
+        sys.exit(0 if result is not None else 1)
     main_loop()
@@ -6,13 +6,14 @@ LLM-First Appliance Scheduler (Edge-friendly)
 - ALWAYS calls the LLM to produce a 24x binary schedule per appliance.
 - Strict prompt: same # of ones as input (or MIN_ONS override).
 - Deterministic fallback if LLM output is invalid.
-- Robust status-file parser, MQTT v2, wrap-around time bands.
+- Robust status-file parser, shared MQTT session, wrap-around time bands.
 """
 
 import os
 import re
 import ast
 import json
+import sys
 import time
 from datetime import datetime
 
@@ -24,7 +25,8 @@ try:
 except Exception:
     HAS_OLLAMA = False
 
-import paho.mqtt.client as mqtt
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mqtt')))
+from mqtt_session import get_session_for_profile
 
 # ---------- Config / Env ----------
 APPLIANCES = [
@@ -38,10 +40,8 @@ APPLIANCES = [
 STATUS_FILE = os.getenv("STATUS_FILE", "appliance_data.txt")
 OUTPUT_FILE = os.getenv("OUTPUT_FILE", "output.txt")
 
-MQTT_BROKER = os.getenv("MQTT_BROKER", "1b68f21e37a44697a7872f3c9321ce24.s1.eu.hivemq.cloud")
-MQTT_PORT   = int(os.getenv("MQTT_PORT", "8883"))
-MQTT_USER   = os.getenv("MQTT_USER", "malshan")
-MQTT_PASS   = os.getenv("MQTT_PASS", "Pankaja1")
+# Broker profile from mqtt_session.BROKER_PROFILES; MQTT_HOST / MQTT_PORT / MQTT_USER / MQTT_PASS / MQTT_TLS override it
+MQTT_PROFILE = os.getenv("MQTT_PROFILE", "hivemq")
 MQTT_TOPIC  = os.getenv("MQTT_TOPIC", "power/tou_domestic")
 
 # LLM config (LLM is always used; fallback only if invalid)
@@ -169,32 +169,12 @@ def read_appliance_status(filename: str):
 
 
 def get_mqtt_power_data(timeout: int = 5):
-    """Fetch one MQTT TOU JSON."""
-    result = {}
-
-    def on_connect(client, userdata, flags, rc, properties=None):
-        if rc == 0:
-            client.subscribe(MQTT_TOPIC)
-        else:
-            result["error"] = f"Failed to connect, return code: {rc}"
-
-    def on_message(client, userdata, msg):
-        result["payload"] = msg.payload.decode(errors="replace")
-        client.disconnect()
-
-    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-    client.username_pw_set(MQTT_USER, MQTT_PASS)
-    client.tls_set()
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
-    for _ in range(timeout):
-        if "payload" in result or "error" in result:
-            break
-        time.sleep(1)
-    client.loop_stop()
-    return result.get("payload", result.get("error", "No data received"))
+    """Fetch the latest MQTT TOU JSON over the shared session."""
+    session = get_session_for_profile(MQTT_PROFILE)
+    payload = session.latest(MQTT_TOPIC, timeout=timeout)
+    if payload is None:
+        return "No data received"
+    return payload.decode(errors="replace")
 
 
 def write_output(schedules):
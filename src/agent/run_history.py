@@ -0,0 +1,252 @@
+"""
+Local history of every scheduling run (SQLite, WAL mode).
+
+Tables:
+- runs: one row per agent cycle (time, mode, model tag, totals, TOU input, stage timings)
+- run_appliances: per-appliance original/optimized states and costs, indexed by (appliance, time)
+- daily_savings: per-day, per-appliance aggregates kept up to date in the same transaction as
+  each insert, so daily/weekly savings over years of runs read a few hundred rows at most
+
+WAL lets the backend read while the agent writes. Timestamps are unix seconds; days are
+local calendar days (YYYY-MM-DD).
+
+Example:
+    python run_history.py --db ../../data/run_history.sqlite3 --days 30
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+default_db_path = os.path.abspath(os.path.join(base_dir, '..', '..', 'data', 'run_history.sqlite3'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    mode TEXT,
+    model_tag TEXT,
+    currency TEXT,
+    baseline_cost REAL NOT NULL,
+    optimized_cost REAL NOT NULL,
+    savings REAL NOT NULL,
+    tou_json TEXT,
+    timings_json TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs(started_at);
+
+CREATE TABLE IF NOT EXISTS run_appliances (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    appliance TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    original_states TEXT NOT NULL,
+    optimized_states TEXT NOT NULL,
+    original_cost REAL NOT NULL,
+    optimized_cost REAL NOT NULL,
+    savings REAL NOT NULL,
+    PRIMARY KEY (run_id, appliance)
+);
+CREATE INDEX IF NOT EXISTS run_appliances_by_time ON run_appliances(appliance, started_at);
+
+CREATE TABLE IF NOT EXISTS daily_savings (
+    day TEXT NOT NULL,
+    appliance TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    original_cost REAL NOT NULL,
+    optimized_cost REAL NOT NULL,
+    savings REAL NOT NULL,
+    PRIMARY KEY (day, appliance)
+);
+"""
+
+TOTAL = '__total__'  # daily_savings row holding the all-appliance totals
+
+
+def _day(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+
+
+def _states_text(states):
+    return ''.join('1' if v else '0' for v in states)
+
+
+class RunHistory:
+    def __init__(self, path=default_db_path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA foreign_keys=ON')
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record_run(self, started_at, finished_at, result, mode=None, model_tag=None, tou=None, timings=None):
+        """
+        Store one agent cycle.
+
+        Parameters:
+        - result: main_once() result: {"status", "schedules", "explanations", "currency"}
+        - tou: TOU JSON the run priced against
+        - timings: {stage_name: seconds}
+
+        Returns:
+        - the new run id
+        """
+        day = _day(started_at)
+        totals = result['explanations']['totals']
+        per_appliance = result['explanations']['per_appliance']
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO runs (started_at, finished_at, day, mode, model_tag, currency, baseline_cost, '
+                'optimized_cost, savings, tou_json, timings_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (started_at, finished_at, day, mode, model_tag, result.get('currency'),
+                 totals['baseline'], totals['optimized'], totals['savings'],
+                 None if tou is None else json.dumps(tou), None if timings is None else json.dumps(timings)),
+            )
+            run_id = cursor.lastrowid
+
+            rows, daily = [], [(day, TOTAL, totals['baseline'], totals['optimized'], totals['savings'])]
+            for appliance, info in per_appliance.items():
+                original = result['status'].get(appliance, {}).get('states', [])
+                rows.append((run_id, appliance, started_at, _states_text(original),
+                             _states_text(result['schedules'][appliance]),
+                             info['original_cost'], info['optimized_cost'], info['savings']))
+                daily.append((day, appliance, info['original_cost'], info['optimized_cost'], info['savings']))
+            self._conn.executemany('INSERT INTO run_appliances VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self._conn.executemany(
+                'INSERT INTO daily_savings VALUES (?, ?, 1, ?, ?, ?) ON CONFLICT(day, appliance) DO UPDATE SET '
+                'runs = runs + 1, original_cost = original_cost + excluded.original_cost, '
+                'optimized_cost = optimized_cost + excluded.optimized_cost, savings = savings + excluded.savings',
+                daily,
+            )
+        return run_id
+
+    def runs(self, start=None, end=None, limit=100, offset=0):
+        """Run summaries with start <= started_at < end, newest first."""
+        query = ('SELECT id, started_at, finished_at, day, mode, model_tag, currency, baseline_cost, '
+                 'optimized_cost, savings, timings_json FROM runs WHERE started_at >= ? AND started_at < ? '
+                 'ORDER BY started_at DESC LIMIT ? OFFSET ?')
+        with self._lock:
+            rows = self._conn.execute(query, (start or 0, end or float('inf'), limit, offset)).fetchall()
+        result = []
+        for row in rows:
+            run = dict(row)
+            run['timings'] = json.loads(run.pop('timings_json') or '{}')
+            result.append(run)
+        return result
+
+    def run(self, run_id):
+        """One run with its TOU input and per-appliance states and costs, or None."""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM runs WHERE id = ?', (run_id,)).fetchone()
+            if row is None:
+                return None
+            appliances = self._conn.execute(
+                'SELECT appliance, original_states, optimized_states, original_cost, optimized_cost, savings '
+                'FROM run_appliances WHERE run_id = ? ORDER BY appliance', (run_id,)).fetchall()
+        run = dict(row)
+        run['tou'] = json.loads(run.pop('tou_json') or 'null')
+        run['timings'] = json.loads(run.pop('timings_json') or '{}')
+        run['appliances'] = {
+            a['appliance']: {
+                'original_states': [int(c) for c in a['original_states']],
+                'optimized_states': [int(c) for c in a['optimized_states']],
+                'original_cost': a['original_cost'],
+                'optimized_cost': a['optimized_cost'],
+                'savings': a['savings'],
+            }
+            for a in appliances
+        }
+        return run
+
+    def appliance_series(self, appliance, start=None, end=None, limit=1000):
+        """Per-run costs for one appliance in time order (index range scan)."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT run_id, started_at, original_cost, optimized_cost, savings FROM run_appliances '
+                'WHERE appliance = ? AND started_at >= ? AND started_at < ? ORDER BY started_at LIMIT ?',
+                (appliance, start or 0, end or float('inf'), limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def savings(self, period='day', start_day=None, end_day=None, appliance=None):
+        """
+        Aggregated costs per day or ISO week from the daily_savings table.
+
+        Parameters:
+        - period: 'day' or 'week'
+        - start_day / end_day: inclusive / exclusive 'YYYY-MM-DD' bounds
+        - appliance: one appliance, 'total' for all appliances combined, or None for every appliance
+
+        Returns:
+        - list of {"period", "appliance", "runs", "original_cost", "optimized_cost", "savings", "avg_savings"}
+        """
+        if period not in ('day', 'week'):
+            raise ValueError("period must be 'day' or 'week'")
+        where, params = ['day >= ?', 'day < ?'], [start_day or '0000-00-00', end_day or '9999-99-99']
+        if appliance is None:
+            where.append('appliance != ?')
+            params.append(TOTAL)
+        else:
+            where.append('appliance = ?')
+            params.append(TOTAL if appliance == 'total' else appliance)
+        query = (f'SELECT day AS period, appliance, runs, original_cost, optimized_cost, savings FROM daily_savings '
+                 f'WHERE {" AND ".join(where)} ORDER BY period, appliance')
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(query, params).fetchall()]
+        if period == 'week':
+            rows = _sum_by_iso_week(rows)
+        result = []
+        for item in rows:
+            if item['appliance'] == TOTAL:
+                item['appliance'] = 'total'
+            item['avg_savings'] = item['savings'] / item['runs'] if item['runs'] else 0.0
+            result.append(item)
+        return result
+
+
+def _sum_by_iso_week(rows):
+    """Fold per-day rows into ISO weeks ('2026-W01'); SQLite's strftime has no ISO week number."""
+    weeks = {}
+    for row in rows:
+        year, week, _ = datetime.strptime(row['period'], '%Y-%m-%d').isocalendar()
+        key = (f'{year}-W{week:02d}', row['appliance'])
+        total = weeks.get(key)
+        if total is None:
+            weeks[key] = dict(row, period=key[0])
+        else:
+            for column in ('runs', 'original_cost', 'optimized_cost', 'savings'):
+                total[column] += row[column]
+    return [weeks[key] for key in sorted(weeks)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the scheduling run history.")
+    parser.add_argument('--db', default=default_db_path)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--period', choices=['day', 'week'], default='day')
+    args = parser.parse_args()
+
+    history = RunHistory(args.db)
+    start_day = _day(time.time() - args.days * 86400)
+    for row in history.savings(args.period, start_day=start_day, appliance='total'):
+        print(f"{row['period']}: {row['runs']} run(s), avg savings {row['avg_savings']:.2f} "
+              f"(baseline {row['original_cost']:.2f}, optimized {row['optimized_cost']:.2f})")
+
+
+if __name__ == "__main__":
+    main()
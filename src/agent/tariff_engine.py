@@ -0,0 +1,289 @@
+"""
+Tariff engine: compiles TOU rules into lookup arrays once, then answers
+24-hour price vectors by slicing.
+
+Accepted payloads:
+- the LECO MQTT payload: {"day": {"time", "rate"}, "peak": {...}, "off_peak": {...}}
+- a richer tariff:
+    {
+      "currency": "LKR",
+      "bands": {"day": 35.0, "peak": 67.0, "off_peak": 21.0, "weekend": 25.0},
+      "seasons": [
+        {"name": "default", "default": "off_peak",
+         "rules": [{"days": "mon-fri", "time": "05:30 - 18:30", "band": "day"},
+                   {"days": "sat-sun", "time": "05:30 - 18:30", "band": "weekend"},
+                   {"time": "18:30 - 22:30", "band": "peak"}]},
+        {"name": "monsoon", "months": [5, 6, 7, 8, 9], "bands": {"peak": 60.0}, "rules": [...]}
+      ],
+      "holidays": {"dates": ["2026-01-14"], "rules": [{"time": "00:00 - 24:00", "band": "off_peak"}]}
+    }
+- a block (slab) tariff: {"slabs": [{"up_to_kwh": 60, "rate": 11.0}, {"up_to_kwh": null, "rate": 50.0}]}
+
+Compiled form, per season: a 168-hour week table of band indices and prices
+(Monday 00:00 = hour 0) and a 24-hour holiday profile; months map to seasons
+through a 13-entry array and holidays are a set of dates. A window touches at
+most two calendar days, so price_vector() is a constant number of slices no
+matter how many rules the tariff has. Time bands are half-open and rounded
+down to the hour, as in the agent's original 3-band price map.
+
+Example:
+    python tariff_engine.py tariff.json --date 2026-01-14
+"""
+
+import argparse
+import bisect
+import json
+import re
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+HOURS_PER_WEEK = 168
+DAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+LEGACY_BANDS = ('day', 'peak', 'off_peak')  # rule order of the original price map (later wins)
+
+
+def time_range_to_hours(start_time, end_time):
+    """
+    Map a time band [start, end) to whole-hour indices [0..23].
+    Minutes are ignored for the hour end (half-open interval):
+      e.g., 05:30–18:30 -> [5,6,...,17]
+    Supports overnight wrap (e.g., 22:30–05:30) and '24:00'.
+    """
+    def parse_hhmm(s):
+        h, m = map(int, s.strip().split(":"))
+        if h == 24 and m == 0:
+            return 24 * 60
+        if not (0 <= h < 24 and 0 <= m < 60):
+            raise ValueError(f"Invalid HH:MM: {s}")
+        return h * 60 + m
+
+    s = parse_hhmm(start_time)
+    e = parse_hhmm(end_time)
+    if e <= s:
+        e += 24 * 60  # overnight
+
+    hours = [(h % 24) for h in range(s // 60, e // 60)]
+    return sorted(set(hours))
+
+
+def band_hours(time_text):
+    """'05:30 - 18:30' (any dash) -> hour indices."""
+    for dash in ('–', '—'):
+        time_text = time_text.replace(dash, '-')
+    start, end = time_text.split('-', 1)
+    return time_range_to_hours(start, end)
+
+
+def parse_days(days):
+    """'mon-fri', 'sat,sun', ['mon', 'wed'] or None (every day) -> weekday indices (Monday = 0)."""
+    if days is None:
+        return list(range(7))
+    if isinstance(days, str):
+        days = days.split(',')
+    result = []
+    for item in days:
+        item = str(item).strip().lower()
+        if '-' in item:
+            first, last = (DAY_NAMES.index(d.strip()[:3]) for d in item.split('-', 1))
+            result.extend((first + i) % 7 for i in range((last - first) % 7 + 1))
+        else:
+            result.append(DAY_NAMES.index(item[:3]))
+    return sorted(set(result))
+
+
+def rate_value(band):
+    """Numeric rate from 35.0, 'LKR 35.00' or {"rate"|"price"|"tariff": ...}; ValueError if there is none."""
+    value = band
+    if isinstance(value, dict):
+        value = value.get('rate', value.get('price', value.get('tariff')))
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        m = re.search(r"[-+]?\d*\.?\d+", value.replace(',', ''))
+        if m:
+            return float(m.group(0))
+    raise ValueError(f"Unrecognized rate: {band!r}")
+
+
+def normalize_tariff(payload):
+    """Rewrite the LECO 3-band payload into the rich schema; rich payloads pass through."""
+    if 'seasons' in payload or 'slabs' in payload:
+        return payload
+    rules = [{'time': payload[name]['time'], 'band': name}
+             for name in LEGACY_BANDS if isinstance(payload.get(name), dict) and 'time' in payload[name]]
+    return {
+        'currency': payload.get('currency', 'LKR'),
+        'bands': {name: rate_value(payload[name]) for name in LEGACY_BANDS if name in payload},
+        'seasons': [{'name': 'default', 'default': 'off_peak', 'rules': rules}],
+    }
+
+
+class CompiledTariff:
+    def __init__(self, payload):
+        tariff = normalize_tariff(payload)
+        self.currency = tariff.get('currency', 'LKR')
+
+        # Block tariff: cumulative kWh bounds and per-slab rates
+        slabs = tariff.get('slabs') or []
+        self.slab_bounds = [float('inf') if s.get('up_to_kwh') is None else float(s['up_to_kwh']) for s in slabs]
+        self.slab_rates = [rate_value(s) for s in slabs]
+
+        seasons = tariff.get('seasons') or [{'name': 'flat', 'rules': []}]
+        base_bands = {name: rate_value(v) for name, v in (tariff.get('bands') or {}).items()}
+        self.band_names = list(base_bands)
+        holidays = tariff.get('holidays') or {}
+        self.holidays = {date.fromisoformat(d) for d in holidays.get('dates', [])}
+        holiday_rules = holidays.get('rules')
+
+        for season in seasons:
+            names = list(season.get('bands') or {}) + [r['band'] for r in season.get('rules', [])]
+            if season.get('default') is not None:
+                names.append(season['default'])
+            for name in names + [r['band'] for r in holiday_rules or []]:
+                if name not in self.band_names:
+                    self.band_names.append(name)
+        if not self.band_names:
+            self.band_names = ['flat']
+
+        self.season_names = []
+        week_bands, week_prices, holiday_bands, holiday_prices = [], [], [], []
+        self.month_season = np.zeros(13, dtype=np.int64)  # month (1..12) -> season index
+        for index, season in enumerate(seasons):
+            self.season_names.append(season.get('name', f'season{index}'))
+            prices = dict(base_bands, **{k: rate_value(v) for k, v in (season.get('bands') or {}).items()})
+            band_prices = np.array([prices.get(name, 0.0) for name in self.band_names])
+
+            bands = self._compile_rules(season.get('rules', []), season.get('default'), HOURS_PER_WEEK)
+            if holiday_rules is None:
+                holiday = bands[6 * 24:7 * 24].copy()  # holidays default to the Sunday profile
+            else:
+                holiday = self._compile_rules(holiday_rules, season.get('default'), 24)
+
+            # A band used by any hour must be priced (block tariffs price every hour by slab instead)
+            used = {self.band_names[b] for b in np.unique(np.concatenate([bands, holiday]))}
+            unpriced = sorted(used - set(prices))
+            if unpriced and not self.slab_rates:
+                raise ValueError(f"Season '{self.season_names[-1]}' uses bands with no price: {', '.join(unpriced)}")
+
+            week_bands.append(bands)
+            week_prices.append(band_prices[bands])
+            holiday_bands.append(holiday)
+            holiday_prices.append(band_prices[holiday])
+
+            # Months not claimed by any season fall back to the first one
+            if season.get('months') is not None:
+                self.month_season[list(season['months'])] = index
+
+        self.week_bands = np.stack(week_bands)          # (seasons, 168)
+        self.week_prices = np.stack(week_prices)        # (seasons, 168)
+        self.holiday_bands = np.stack(holiday_bands)    # (seasons, 24)
+        self.holiday_prices = np.stack(holiday_prices)  # (seasons, 24)
+
+    def _compile_rules(self, rules, default, n_hours):
+        default = default if default in self.band_names else ('off_peak' if 'off_peak' in self.band_names
+                                                              else self.band_names[0])
+        table = np.full(n_hours, self.band_names.index(default), dtype=np.int64)
+        for rule in rules:
+            band = self.band_names.index(rule['band'])
+            hours = band_hours(rule.get('time', '00:00 - 24:00'))
+            days = parse_days(rule.get('days')) if n_hours == HOURS_PER_WEEK else [0]
+            for day in days:
+                # Overnight bands wrap within the day, like the single-day price map
+                table[[day * 24 + h for h in hours]] = band
+        return table
+
+    # --- Lookups ---
+    def _day_profile(self, day):
+        season = self.month_season[day.month]
+        if day in self.holidays:
+            return self.holiday_prices[season], self.holiday_bands[season]
+        offset = day.weekday() * 24
+        return (self.week_prices[season, offset:offset + 24],
+                self.week_bands[season, offset:offset + 24])
+
+    def marginal_rate(self, consumed_kwh=0.0):
+        """Block tariff rate for the next kWh after `consumed_kwh` this billing period (None if no slabs)."""
+        if not self.slab_rates:
+            return None
+        index = min(bisect.bisect_right(self.slab_bounds, consumed_kwh), len(self.slab_rates) - 1)
+        return self.slab_rates[index]
+
+    def slab_cost(self, kwh):
+        """Bill for `kwh` over a whole billing period under the block tariff."""
+        cost, lower = 0.0, 0.0
+        for bound, rate in zip(self.slab_bounds, self.slab_rates):
+            if kwh <= lower:
+                break
+            cost += (min(kwh, bound) - lower) * rate
+            lower = bound
+        return cost
+
+    def price_vector(self, start, hours=24, consumed_kwh=0.0):
+        """
+        Hourly prices and band names from `start` (datetime, rounded down to the hour).
+
+        Returns:
+        - (prices: float array of length `hours`, bands: list of band names)
+        """
+        start = start.replace(minute=0, second=0, microsecond=0)
+        rate = self.marginal_rate(consumed_kwh)
+        if rate is not None:
+            return np.full(hours, rate), ['slab'] * hours
+
+        price_parts, band_parts = [], []
+        day, offset, remaining = start.date(), start.hour, hours
+        while remaining > 0:
+            prices, bands = self._day_profile(day)
+            take = min(24 - offset, remaining)
+            price_parts.append(prices[offset:offset + take])
+            band_parts.append(bands[offset:offset + take])
+            remaining -= take
+            day, offset = day + timedelta(days=1), 0
+        prices = np.concatenate(price_parts)
+        bands = [self.band_names[b] for b in np.concatenate(band_parts)]
+        return prices, bands
+
+    def day_prices(self, day, consumed_kwh=0.0):
+        """Prices for hours 0..23 of a calendar day."""
+        return self.price_vector(datetime(day.year, day.month, day.day), 24, consumed_kwh)
+
+    def band_hours_for_day(self, day):
+        """{band: [hours]} for one calendar day (feeds the scheduler's peak/off-peak rules)."""
+        _, bands = self.day_prices(day)
+        result = {}
+        for hour, band in enumerate(bands):
+            result.setdefault(band, []).append(hour)
+        return result
+
+
+_compiled = {}
+
+
+def compile_tariff(payload):
+    """CompiledTariff for a payload; recompiled only when the payload changes."""
+    key = json.dumps(payload, sort_keys=True, default=str)
+    tariff = _compiled.get(key)
+    if tariff is None:
+        if len(_compiled) >= 32:
+            _compiled.clear()
+        tariff = _compiled[key] = CompiledTariff(payload)
+    return tariff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the hourly prices of a tariff for one day.")
+    parser.add_argument('tariff', help="Tariff JSON file (LECO payload or rich schema)")
+    parser.add_argument('--date', default=date.today().isoformat())
+    parser.add_argument('--consumed-kwh', type=float, default=0.0, help="kWh already used this period (slabs)")
+    args = parser.parse_args()
+
+    with open(args.tariff, encoding='utf-8') as f:
+        tariff = compile_tariff(json.load(f))
+    prices, bands = tariff.day_prices(date.fromisoformat(args.date), args.consumed_kwh)
+    for hour, (price, band) in enumerate(zip(prices, bands)):
+        print(f"{hour:02d}:00  {band:<10} {price:8.2f} {tariff.currency}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Shared MQTT connection layer: one long-lived session per broker per process.
+
+get_session(host, port, ...) returns the process-wide MqttSession for that
+broker, creating and starting it on first use. Every component in the
+process (predictor ingest, agent TOU reads, ...) multiplexes its topics over
+that one connection instead of opening its own. A component that needs a
+persistent session (the TOU publisher) passes a fixed client_id and gets a
+second, persistent connection of its own.
+
+MqttSession:
+- runs its own network thread and reconnects with jittered exponential
+  backoff (min_delay .. max_delay), so a fleet restarting together does not
+  hit the broker in lock-step
+- re-subscribes every registered topic filter after each (re)connect; with a
+  fixed client_id the broker session is persistent (clean_session=False) and
+  qos 1 messages are queued while the connection is down
+- dispatches each message to every handler whose filter matches, so many
+  topics (and wildcards) share one client
+- subscribe()/publish() take raw payloads; subscribe_json()/publish_json()
+  decode and encode JSON; latest() returns the most recent (e.g. retained)
+  payload of a topic without a connect/disconnect round trip
+
+Brokers are named by profile (BROKER_PROFILES: local, mosquitto, hivemq);
+get_session_for_profile(name) applies the MQTT_HOST, MQTT_PORT, MQTT_USER,
+MQTT_PASS and MQTT_TLS overrides. No credentials are kept in the code: set
+MQTT_USER / MQTT_PASS for brokers that need them (hivemq).
+
+Works with paho-mqtt 1.x and 2.x (the callback API version is picked here).
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+KEEPALIVE_SECS = 60
+MIN_RECONNECT_SECS = 1.0
+MAX_RECONNECT_SECS = 120.0
+
+BROKER_PROFILES = {
+    'local': {'host': "localhost", 'port': 1883, 'user': None, 'password': None, 'tls': False},
+    'mosquitto': {'host': "test.mosquitto.org", 'port': 1883, 'user': None, 'password': None, 'tls': False},
+    'hivemq': {'host': "1b68f21e37a44697a7872f3c9321ce24.s1.eu.hivemq.cloud", 'port': 8883,
+               'user': None, 'password': None, 'tls': True},
+}
+
+
+def _make_client(client_id, clean_session):
+    if hasattr(mqtt, 'CallbackAPIVersion'):
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id, clean_session=clean_session)
+    return mqtt.Client(client_id=client_id, clean_session=clean_session)
+
+
+def _reason_value(reason_code):
+    """Integer reason/return code from a paho 2.x ReasonCode or a paho 1.x int."""
+    return getattr(reason_code, 'value', reason_code)
+
+
+class Subscription:
+    def __init__(self, topic_filter, handler, qos):
+        self.topic_filter = topic_filter
+        self.handler = handler
+        self.qos = qos
+
+
+class MqttSession:
+    def __init__(self, host, port=1883, username=None, password=None, tls=False, client_id=None,
+                 keepalive=KEEPALIVE_SECS, min_delay=MIN_RECONNECT_SECS, max_delay=MAX_RECONNECT_SECS):
+        """
+        Parameters:
+        - client_id: Fixed id for a persistent session; None uses a random id and a clean session
+        - min_delay / max_delay: Reconnect backoff bounds in seconds
+        """
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.connected = threading.Event()
+
+        self._subscriptions = []
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+
+        self.client = _make_client(client_id or '', clean_session=client_id is None)
+        if username:
+            self.client.username_pw_set(username, password)
+        if tls:
+            self.client.tls_set()
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f'mqtt-{self.host}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def join(self):
+        """Block until stop() (the long-running scripts' replacement for loop_forever)."""
+        while self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def wait_connected(self, timeout=None):
+        return self.connected.wait(timeout)
+
+    def _backoff(self, delay):
+        # Equal jitter: half the delay fixed, half random
+        time.sleep(delay / 2 + random.uniform(0, delay / 2))
+        return min(self.max_delay, delay * 2)
+
+    def _run(self):
+        delay = self.min_delay
+        socket_open = False
+        while not self._stopping:
+            if not socket_open:
+                try:
+                    print(f"Connecting to MQTT broker at {self.host}:{self.port}...")
+                    self.client.connect(self.host, self.port, self.keepalive)
+                    socket_open = True
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ MQTT connect to {self.host}:{self.port} failed: {e}")
+                    delay = self._backoff(delay)
+                    continue
+            rc = self.client.loop(timeout=1.0)
+            if rc == mqtt.MQTT_ERR_SUCCESS:
+                if self.connected.is_set():
+                    delay = self.min_delay
+                continue
+            socket_open = False
+            self.connected.clear()
+            if not self._stopping:
+                delay = self._backoff(delay)
+
+    # --- paho callbacks (network thread) ---
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        rc = _reason_value(reason_code)
+        if rc != 0:
+            print(f"❌ Failed to connect to {self.host}:{self.port}, return code {rc}")
+            return
+        print(f"✅ Connected to MQTT Broker {self.host}:{self.port}")
+        with self._lock:
+            topics = {}
+            for sub in self._subscriptions:
+                topics[sub.topic_filter] = max(sub.qos, topics.get(sub.topic_filter, 0))
+            # Set under the lock so a concurrent subscribe() either is in this snapshot or sends its own SUBSCRIBE
+            self.connected.set()
+        if topics:
+            client.subscribe(list(topics.items()))
+
+    def _on_disconnect(self, client, userdata, *args):
+        self.connected.clear()
+        # paho 1.x: (rc); paho 2.x: (disconnect_flags, reason_code, properties)
+        rc = _reason_value(args[0] if len(args) == 1 else args[1])
+        if rc != 0 and not self._stopping:
+            print(f"⚠️ MQTT disconnected from {self.host}:{self.port} (rc={rc}); reconnecting")
+
+    def _on_message(self, client, userdata, msg):
+        with self._lock:
+            handlers = [sub.handler for sub in self._subscriptions
+                        if mqtt.topic_matches_sub(sub.topic_filter, msg.topic)]
+        for handler in handlers:
+            try:
+                handler(msg)
+            except Exception as e:
+                print(f"❌ Error handling MQTT message on {msg.topic}:", e)
+
+    # --- Subscribe ---
+    def subscribe(self, topic_filter, handler, qos=0):
+        """
+        Call handler(msg) for every message matching topic_filter (kept across reconnects).
+
+        Avoid overlapping filters on one session: some brokers deliver a message once
+        per matching filter, and each copy reaches every matching handler.
+
+        Returns:
+        - the Subscription, for unsubscribe()
+        """
+        sub = Subscription(topic_filter, handler, qos)
+        with self._lock:
+            self._subscriptions.append(sub)
+            connected = self.connected.is_set()
+        if connected:
+            self.client.subscribe(topic_filter, qos)
+        return sub
+
+    def subscribe_json(self, topic_filter, handler, qos=0):
+        """Call handler(topic, value) with each message's decoded JSON; undecodable payloads are logged."""
+        def on_json(msg):
+            try:
+                value = json.loads(msg.payload.decode())
+            except (ValueError, UnicodeDecodeError) as e:
+                print(f"❌ Ignoring non-JSON message on {msg.topic}: {e}")
+                return
+            handler(msg.topic, value)
+        return self.subscribe(topic_filter, on_json, qos)
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions.remove(sub)
+            still_used = any(s.topic_filter == sub.topic_filter for s in self._subscriptions)
+        if not still_used and self.connected.is_set():
+            self.client.unsubscribe(sub.topic_filter)
+
+    def latest(self, topic, timeout=None, qos=1):
+        """
+        Most recent payload (bytes) on an exact topic, or None if nothing arrived within timeout.
+
+        The first call subscribes; the broker delivers the retained message, and
+        later calls return the cached value immediately.
+        """
+        with self._lock:
+            entry = self._latest.get(topic)
+            if entry is None:
+                entry = self._latest[topic] = {'payload': None, 'event': threading.Event()}
+                created = True
+            else:
+                created = False
+        if created:
+            def remember(msg):
+                entry['payload'] = msg.payload
+                entry['event'].set()
+            self.subscribe(topic, remember, qos)
+        entry['event'].wait(timeout)
+        return entry['payload']
+
+    # --- Publish ---
+    def publish(self, topic, payload, qos=0, retain=False, wait=None):
+        """
+        Publish raw bytes/str; with `wait` (seconds) block until the broker acknowledged it.
+
+        Raises:
+        - TimeoutError if `wait` is given and the publish was not acknowledged in time
+        """
+        info = self.client.publish(topic, payload=payload, qos=qos, retain=retain)
+        if wait is not None:
+            deadline = time.time() + wait
+            while not info.is_published() and time.time() < deadline:
+                time.sleep(0.05)
+            if not info.is_published():
+                raise TimeoutError(f"Publish to {topic} not acknowledged within {wait}s")
+        return info
+
+    def publish_json(self, topic, value, qos=0, retain=False, wait=None):
+        return self.publish(topic, json.dumps(value), qos=qos, retain=retain, wait=wait)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def broker_settings(profile):
+    """Profile defaults with MQTT_* environment overrides applied."""
+    settings = dict(BROKER_PROFILES[profile])
+    settings['host'] = os.getenv('MQTT_HOST', settings['host'])
+    settings['port'] = int(os.getenv('MQTT_PORT', settings['port']))
+    settings['user'] = os.getenv('MQTT_USER', settings['user'])
+    settings['password'] = os.getenv('MQTT_PASS', settings['password'])
+    if os.getenv('MQTT_TLS') is not None:
+        settings['tls'] = os.getenv('MQTT_TLS').lower() in ('1', 'true', 'yes')
+    return settings
+
+
+def default_client_id(name):
+    """Stable client id for a persistent session, e.g. 'tou-publisher-edge01'."""
+    return os.getenv('MQTT_CLIENT_ID', f"{name}-{socket.gethostname()}")
+
+
+def get_session(host, port=1883, username=None, password=None, tls=False, client_id=None):
+    """
+    Process-wide started session for a broker (keyed by host, port, user and client_id).
+
+    Callers without a client_id share one clean session; a caller asking for a fixed
+    client_id always gets its own persistent session, whoever connected first.
+    """
+    key = (host, int(port), username, client_id)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = MqttSession(host, int(port), username, password, tls, client_id)
+            session.start()
+    return session
+
+
+def get_session_for_profile(profile, client_id=None):
+    """get_session() for a named broker profile (see broker_settings for the overrides)."""
+    settings = broker_settings(profile)
+    return get_session(settings['host'], settings['port'], settings['user'], settings['password'],
+                       settings['tls'], client_id)
@@ -1,16 +1,22 @@
-import paho.mqtt.client as mqtt
 import json
+import os
 import random
 import time
 
-# MQTT broker details
-broker = "localhost"   # Replace with your actual broker IP if needed
-port = 1883
+from mqtt_session import get_session_for_profile
+from sensor_payload import APPLIANCE_ORDER, encode_packed, packed_topic
+
+# MQTT broker: a profile from mqtt_session.BROKER_PROFILES (MQTT_HOST / MQTT_PORT override it)
+mqtt_profile = "local"
 topic = "home/power"
 
-# Create MQTT client and connect
-client = mqtt.Client()
-client.connect(broker, port, 60)
+# Payload format: "json" (one object per message) or "packed" (float32 batches on <topic>/packed)
+payload_format = os.getenv("PAYLOAD_FORMAT", "json").lower()
+batch_size = int(os.getenv("BATCH_SIZE", "10"))   # samples per packed message
+interval = float(os.getenv("PUBLISH_INTERVAL", "0.5"))
+
+# Shared MQTT session (connects and reconnects in the background)
+session = get_session_for_profile(mqtt_profile)
 
 def generate_fake_data():
     """
@@ -26,14 +32,26 @@ def generate_fake_data():
     return data
 
 try:
-    print("📡 MQTT Publisher running... Press Ctrl+C to stop.")
+    print(f"📡 MQTT Publisher running ({payload_format})... Press Ctrl+C to stop.")
+    batch = []
+    batch_start = time.time()
     while True:
         fake_data = generate_fake_data()
-        payload = json.dumps(fake_data)
-        client.publish(topic, payload)
-        print(f"Published: {payload}")
-        time.sleep(0.5)  # send every 5 seconds
+        if payload_format == "packed":
+            if not batch:
+                batch_start = time.time()
+            batch.append([fake_data[name] for name in APPLIANCE_ORDER])
+            if len(batch) >= batch_size:
+                payload = encode_packed(batch, APPLIANCE_ORDER, timestamp=batch_start, interval=interval)
+                session.publish(packed_topic(topic), payload)
+                print(f"Published {len(batch)} samples ({len(payload)} bytes) to {packed_topic(topic)}")
+                batch = []
+        else:
+            payload = json.dumps(fake_data)
+            session.publish(topic, payload)
+            print(f"Published: {payload}")
+        time.sleep(interval)
 
 except KeyboardInterrupt:
     print("\nExiting...")
-    client.disconnect()
+    session.stop()
@@ -1,87 +1,24 @@
+"""
+Publish the LECO TOU table to the hivemq broker (retained, only on change).
 
-import time
-import requests
-from bs4 import BeautifulSoup
-import paho.mqtt.client as mqtt
-import json
+Thin wrapper over tou_publisher.py using the 'hivemq' broker profile; kept so
+existing scripts and run_edge.py (TOU_PUBLISHER=publish_tou_hivemq) keep working.
+"""
 
-while True:
-    try:
-        # -- 1. Scrape the page --
-        url = "https://www.leco.lk/pages_e.php?id=86"
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, "html.parser")
+import tou_publisher
 
-        table = soup.find("table", class_="table")
-        if not table:
-            raise Exception("Could not find table with TOU data!")
+PROFILE = 'hivemq'
 
-   
-        tou_found = False
-        tou_data = {}
-        rows = table.find_all("tr")
 
-        for i, row in enumerate(rows):
-            cols = [td.get_text(strip=True) for td in row.find_all(["td", "th"])]
-            if not cols:
-                continue
-            if "Domestic – Optional Time of Use Tariff" in cols[0]:
-                tou_found = True
-                continue
-            if tou_found and ("Day(" in cols[0] or "Peak" in cols[0] or "Off-peak" in cols[0]):
-                label = None
-                time_range = None
-                rate = None
+def publish_once():
+    """Fetch the tariff page and publish it if it changed; returns the TOU data."""
+    return tou_publisher.get_service(PROFILE).poll()
 
-                if "Day(" in cols[0]:
-                    label = "day"
-                    # Extract time range inside the parentheses
-                    time_range = cols[0].split("(")[1].split(")")[0].replace("hours", "").strip()
-                elif "Peak" in cols[0]:
-                    label = "peak"
-                    time_range = cols[0].split("(")[1].split(")")[0].replace("hours", "").strip()
-                elif "Off-peak" in cols[0]:
-                    label = "off_peak"
-                    time_range = cols[0].split("(")[1].split(")")[0].replace("hours", "").strip()
-                    for dash in ['\u2013', '\u2014', '–', '—']:
-                        time_range = time_range.replace(dash, '-')
 
+def main(ready=None):
+    """Poll every 5 minutes; `ready` (threading.Event) is set after the first successful cycle."""
+    tou_publisher.main(ready, profile=PROFILE)
 
-                try:
-                    rate = float(cols[1].replace(",", ""))
-                except:
-                    rate = None
 
-                tou_data[label] = {
-                    "rate": rate,
-                    "time": time_range
-                }
-            elif tou_found and not ("Day(" in cols[0] or "Peak" in cols[0] or "Off-peak" in cols[0]):
-                break
-
-        print("TOU rates and times extracted:", tou_data)
-
-        # -- 3. Publish to HiveMQ Cloud MQTT Broker --
-        MQTT_BROKER = "1b68f21e37a44697a7872f3c9321ce24.s1.eu.hivemq.cloud"
-        MQTT_PORT = 8883
-        MQTT_USER = "pankaja"
-        MQTT_PASS = "Pankaja1"
-        MQTT_TOPIC = "power/tou_domestic"
-
-        client = mqtt.Client()
-        client.username_pw_set(MQTT_USER, MQTT_PASS)
-        client.tls_set()
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-
-        payload = json.dumps(tou_data)
-        print(f"Publishing TOU data: {payload}")
-        client.publish(MQTT_TOPIC, payload=payload, qos=1, retain=True)
-        print(f"Published TOU data to MQTT topic {MQTT_TOPIC}: {payload}")
-
-        client.disconnect()
-
-    except Exception as e:
-        print("Error:", e)
-
-    print("Waiting 5 minutes before next update...\n")
-    time.sleep(300) 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Sensor payload encoding shared by the dummy publisher and the predictor.
+
+Two formats are supported on the wire:
+
+- JSON (default, backward compatible): one object per message,
+  {"WashingMachine_Power": 12.5, "Heater_Power": 0.0, ...}
+  A JSON list of such objects is also accepted as a batch.
+
+- Packed (published on "<topic>/packed"): a small header carrying the
+  appliance order followed by little-endian float32 samples, so many
+  samples fit in one message and decoding is a single np.frombuffer.
+
+  offset  size  field
+  0       2     magic b"EP"
+  2       1     version (1)
+  3       1     n_appliances
+  4       4     n_samples (uint32)
+  8       8     timestamp of the first sample (float64, unix seconds)
+  16      4     seconds between samples (float32)
+  20      ...   n_appliances x [1-byte length + utf-8 name]
+  ...     ...   n_samples x n_appliances float32 values
+"""
+
+import json
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"EP"
+VERSION = 1
+PACKED_SUFFIX = "/packed"
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_PACKED = "application/x-energy-float32"
+
+_HEADER = struct.Struct("<2sBBIdf")
+
+# Column order used by the publishers and the predictor
+APPLIANCE_ORDER = [
+    "WashingMachine_Power",
+    "Heater_Power",
+    "AC_Power",
+    "VehicleCharger_Power",
+    "VacuumCleaner_Power",
+]
+
+
+def packed_topic(topic):
+    """Topic that carries the packed variant of `topic`."""
+    return topic + PACKED_SUFFIX
+
+
+def is_packed(topic, payload, content_type=None):
+    """Negotiate the format by content type, then topic suffix, then magic bytes."""
+    if content_type:
+        return content_type == CONTENT_TYPE_PACKED
+    if topic.endswith(PACKED_SUFFIX):
+        return True
+    return payload[:2] == MAGIC
+
+
+def encode_packed(samples, appliance_names, timestamp=None, interval=1.0):
+    """Encode an (n_samples, n_appliances) array into one packed payload."""
+    samples = np.asarray(samples, dtype="<f4")
+    if samples.ndim == 1:
+        samples = samples.reshape(1, -1)
+    if samples.shape[1] != len(appliance_names):
+        raise ValueError(f"Expected {len(appliance_names)} columns, got {samples.shape[1]}")
+
+    names = b"".join(
+        struct.pack("B", len(encoded)) + encoded
+        for encoded in (name.encode("utf-8") for name in appliance_names)
+    )
+    header = _HEADER.pack(
+        MAGIC, VERSION, len(appliance_names), samples.shape[0],
+        time.time() if timestamp is None else timestamp, interval,
+    )
+    return header + names + samples.tobytes()
+
+
+def decode_packed(payload):
+    """Decode a packed payload. Returns (appliance_names, samples, timestamp, interval)."""
+    magic, version, n_appliances, n_samples, timestamp, interval = _HEADER.unpack_from(payload, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a packed sensor payload (bad magic)")
+    if version != VERSION:
+        raise ValueError(f"Unsupported packed payload version {version}")
+
+    offset = _HEADER.size
+    names = []
+    for _ in range(n_appliances):
+        length = payload[offset]
+        names.append(bytes(payload[offset + 1:offset + 1 + length]).decode("utf-8"))
+        offset += 1 + length
+
+    samples = np.frombuffer(payload, dtype="<f4", count=n_samples * n_appliances, offset=offset)
+    return names, samples.reshape(n_samples, n_appliances), timestamp, interval
+
+
+def encode_json(sample, appliance_names):
+    """Encode one sample as the legacy JSON object."""
+    return json.dumps({name: float(value) for name, value in zip(appliance_names, sample)})
+
+
+def decode_payload(topic, payload, appliance_names, content_type=None):
+    """
+    Decode either format into an (n_samples, len(appliance_names)) float array
+    with columns in `appliance_names` order.
+    """
+    if is_packed(topic, payload, content_type):
+        names, samples, _, _ = decode_packed(payload)
+        if names == list(appliance_names):
+            return samples
+        order = [names.index(name) for name in appliance_names]
+        return samples[:, order]
+
+    decoded = json.loads(payload.decode() if isinstance(payload, (bytes, bytearray)) else payload)
+    records = decoded if isinstance(decoded, list) else [decoded]
+    return np.array([[float(rec[name]) for name in appliance_names] for rec in records], dtype=np.float32)
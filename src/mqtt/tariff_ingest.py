@@ -0,0 +1,289 @@
+"""
+Multi-utility tariff ingestion: fetch every source concurrently, normalize
+each plan and publish it retained on its own topic when it changes.
+
+Sources come from a JSON config (DEFAULT_SOURCES covers the live LECO page):
+    {"sources": [
+      {"name": "leco", "url": "...", "format": "leco_html", "timeout": 10, "refresh_secs": 300,
+       "plans": [{"plan": "domestic_tou", "section": "Domestic – Optional Time of Use Tariff",
+                  "topic": "power/tou_domestic"}]},
+      {"name": "example", "url": ".../utility_tariffs.json", "format": "json", "currency": "LKR",
+       "plans": [{"plan": "domestic_tou"}, {"plan": "domestic_seasonal"}]}
+    ]}
+
+- Each source is fetched on its own schedule (refresh_secs) in a thread pool,
+  with its own timeout; one slow or failing utility never delays the others.
+- Fetches are conditional (ETag / If-Modified-Since) and hashed as in
+  tou_publisher.py; a source that fails keeps serving its last good plans.
+- Plans are normalized to the {"day", "peak", "off_peak"} payload (rates as
+  numbers, times as "HH:MM - HH:MM"), or passed through when they already use
+  the seasonal / holiday / slab schema of src/agent/tariff_engine.py.
+- Topic per plan: the plan's "topic", else power/tariffs/<source>/<plan>.
+  Each is published retained (qos 1) only when it differs from the broker's copy.
+
+Example (local stand-ins for the utilities and the broker):
+    python tou_fixture.py --port 8765 &
+    MQTT_HOST=localhost python tariff_ingest.py --config fixtures/tariff_sources_local.json
+
+In the edge stack: TOU_PUBLISHER=tariff_ingest TARIFF_SOURCES=<config> python src/run_edge.py
+The agent reads one plan: set TARIFF_TOPIC (default power/tou_domestic) to its topic.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+
+from mqtt_session import BROKER_PROFILES
+from tou_publisher import (
+    CONNECT_WAIT_SECS, DOMESTIC_TOU_SECTION, HTTP_TIMEOUT_SECS, POLL_SECS, RETAINED_WAIT_SECS, TOU_URL,
+    TouPublisher, TouSource, find_tariff_table, parse_tou_table,
+)
+
+TOPIC_PREFIX = "power/tariffs"
+TOU_BANDS = ("day", "peak", "off_peak")
+MIN_TICK_SECS = 5
+TARIFF_SOURCES = os.getenv('TARIFF_SOURCES')  # sources JSON path; None = DEFAULT_SOURCES
+
+DEFAULT_SOURCES = {
+    "sources": [
+        {
+            "name": "leco",
+            "url": TOU_URL,
+            "format": "leco_html",
+            "timeout": HTTP_TIMEOUT_SECS,
+            "refresh_secs": POLL_SECS,
+            "plans": [{"plan": "domestic_tou", "section": DOMESTIC_TOU_SECTION, "topic": "power/tou_domestic"}],
+        },
+    ],
+}
+
+
+# --- Parsers: page text -> {plan: raw payload} ---
+def parse_leco_html(text, plans):
+    table = find_tariff_table(text)  # parsed once for every plan on the page
+    return {p['plan']: parse_tou_table(table, p.get('section', DOMESTIC_TOU_SECTION)) for p in plans}
+
+
+def parse_json_document(text, plans):
+    document = json.loads(text)
+    available = document.get('plans', document)
+    return {p['plan']: available[p.get('key', p['plan'])] for p in plans}
+
+
+PARSERS = {
+    'leco_html': parse_leco_html,
+    'json': parse_json_document,
+}
+
+
+# --- Normalization ---
+def normalize_time_range(text):
+    """'05.30-18.30', '05:30 – 18:30 hours' -> '05:30 - 18:30'."""
+    times = re.findall(r'(\d{1,2})[.:](\d{2})', text)
+    if len(times) != 2:
+        raise ValueError(f"Unrecognized time band: {text!r}")
+    return ' - '.join(f"{int(h):02d}:{m}" for h, m in times)
+
+
+def normalize_rate(value):
+    """35, '35.00', 'LKR 1,035.50' or {"rate"|"price"|"tariff": ...} -> float."""
+    if isinstance(value, dict):
+        value = value.get('rate', value.get('price', value.get('tariff')))
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'[-+]?\d*\.?\d+', str(value).replace(',', ''))
+    if match is None:
+        raise ValueError(f"Unrecognized rate: {value!r}")
+    return float(match.group(0))
+
+
+def normalize_plan(payload, currency=None):
+    """
+    One plan in the agent's schema.
+
+    Returns:
+    - {"day": {"rate", "time"}, "peak": {...}, "off_peak": {...}[, "currency"]}, or the payload
+      unchanged (plus currency) if it is a seasonal/slab tariff
+    """
+    if 'seasons' in payload or 'slabs' in payload:
+        normalized = dict(payload)
+    else:
+        missing = [band for band in TOU_BANDS if band not in payload]
+        if missing:
+            raise ValueError(f"Missing TOU bands: {', '.join(missing)}")
+        normalized = {
+            band: {"rate": normalize_rate(payload[band]), "time": normalize_time_range(payload[band]['time'])}
+            for band in TOU_BANDS
+        }
+        if 'currency' in payload:
+            normalized['currency'] = payload['currency']
+    if currency and 'currency' not in normalized:
+        normalized['currency'] = currency
+    return normalized
+
+
+class SourceFeed:
+    """One utility page: conditional fetch, parse into plans, last good result kept on failure."""
+
+    def __init__(self, config):
+        self.name = config['name']
+        self.format = config.get('format', 'leco_html')
+        self.refresh_secs = float(config.get('refresh_secs', POLL_SECS))
+        self.currency = config.get('currency')
+        self.plans = config['plans']
+        self.source = TouSource(config['url'], timeout=float(config.get('timeout', HTTP_TIMEOUT_SECS)),
+                                parser=self.parse)
+        self.payloads = {}  # plan -> normalized payload (last good)
+        self.last_attempt = 0.0
+        self.last_success = None
+        self.last_error = None
+        self.future = None
+
+    def topic(self, plan):
+        return plan.get('topic') or f"{TOPIC_PREFIX}/{self.name}/{plan['plan']}"
+
+    def is_due(self, now):
+        return now - self.last_attempt >= self.refresh_secs and (self.future is None or self.future.done())
+
+    def parse(self, text):
+        """Page text -> {plan: normalized payload}; run by TouSource, which keeps the page's
+        validators only if this succeeds, so a plan that fails to normalize is refetched next time."""
+        raw = PARSERS[self.format](text, self.plans)
+        return {plan: normalize_plan(payload, self.currency) for plan, payload in raw.items()}
+
+    def fetch(self):
+        """Runs in the pool; returns True if the page changed."""
+        payloads = self.source.fetch()
+        if payloads is not None:
+            self.payloads = payloads
+        self.last_success = time.time()
+        self.last_error = None
+        return payloads is not None
+
+
+class TariffIngest:
+    def __init__(self, config=DEFAULT_SOURCES, profile='mosquitto'):
+        self.feeds = [SourceFeed(source) for source in config['sources']]
+        self.publishers = {}
+        for feed in self.feeds:
+            for plan in feed.plans:
+                topic = feed.topic(plan)
+                self.publishers[topic] = TouPublisher(profile, topic)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, len(self.feeds)), thread_name_prefix='tariff-fetch')
+        self._started = False
+
+    @property
+    def tick_secs(self):
+        return max(MIN_TICK_SECS, min(feed.refresh_secs for feed in self.feeds))
+
+    def start(self):
+        """Subscribe to every plan topic, then wait once for the broker's retained copies."""
+        for publisher in self.publishers.values():
+            publisher.subscribe()
+        session = next(iter(self.publishers.values())).session
+        if not session.wait_connected(CONNECT_WAIT_SECS):
+            raise TimeoutError(f"MQTT broker {session.host}:{session.port} not reachable")
+        deadline = time.time() + RETAINED_WAIT_SECS
+        for publisher in self.publishers.values():
+            publisher.retained_seen.wait(max(0.0, deadline - time.time()))
+        self._started = True
+
+    def fetch_due(self):
+        """
+        Fetch every due source concurrently, each bounded by its own timeout, and publish each
+        source's plans as soon as its fetch finishes, so a slow utility never holds back the others.
+        """
+        now = time.time()
+        due = [feed for feed in self.feeds if feed.is_due(now)]
+        for feed in due:
+            feed.last_attempt = now
+            feed.future = self.pool.submit(feed.fetch)
+        if not due:
+            return
+        by_future = {feed.future: feed for feed in due}
+        # requests' timeout bounds connect and each read; allow for both plus parsing
+        try:
+            for future in as_completed(by_future, timeout=max(feed.source.timeout for feed in due) * 2 + 1):
+                feed = by_future.pop(future)
+                try:
+                    changed = future.result()
+                    print(f"{feed.name}: {'updated' if changed else 'unchanged'}")
+                except Exception as e:
+                    feed.last_error = str(e)
+                    print(f"❌ {feed.name}: {e}; keeping last good tariffs")
+                self.publish_feed(feed)
+        except FuturesTimeout:
+            for feed in by_future.values():
+                feed.last_error = f"no response within {feed.source.timeout * 2 + 1:.0f}s"
+                print(f"⚠️ {feed.name}: {feed.last_error}; keeping last good tariffs")
+
+    def publish_feed(self, feed):
+        """Publish each of the feed's plans that differs from the broker's retained copy; returns topics sent."""
+        sent = []
+        for plan in feed.plans:
+            payload = feed.payloads.get(plan['plan'])
+            topic = feed.topic(plan)
+            if payload is None:
+                continue
+            try:
+                if self.publishers[topic].publish(payload):
+                    sent.append(topic)
+            except Exception as e:
+                # Retried next cycle: the broker's copy still differs
+                print(f"❌ Publishing {topic} failed: {e}")
+        return sent
+
+    def publish_all(self):
+        """publish_feed() for every source (retries failed publishes and late fetches); returns topics sent."""
+        return [topic for feed in self.feeds for topic in self.publish_feed(feed)]
+
+    def poll(self):
+        """One cycle: fetch due sources (publishing each as it lands), then publish anything still
+        pending; returns {topic: payload} currently held."""
+        if not self._started:
+            self.start()
+        self.fetch_due()
+        self.publish_all()
+        return {feed.topic(plan): feed.payloads[plan['plan']]
+                for feed in self.feeds for plan in feed.plans if plan['plan'] in feed.payloads}
+
+    def status(self):
+        return [{
+            'source': feed.name,
+            'plans': sorted(feed.payloads),
+            'last_success': feed.last_success,
+            'last_error': feed.last_error,
+        } for feed in self.feeds]
+
+
+def load_config(path=None):
+    if path is None:
+        return DEFAULT_SOURCES
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(ready=None, profile='mosquitto', config_path=TARIFF_SOURCES):
+    """Poll until stopped; `ready` (threading.Event) is set once every plan has been published or confirmed."""
+    ingest = TariffIngest(load_config(config_path), profile)
+    while True:
+        try:
+            held = ingest.poll()
+            if ready is not None and len(held) == len(ingest.publishers):
+                ready.set()
+        except Exception as e:
+            print("Error:", e)
+
+        time.sleep(ingest.tick_secs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch several utilities' tariffs and publish one topic per plan.")
+    parser.add_argument('--config', default=TARIFF_SOURCES,
+                        help="Sources JSON (default: $TARIFF_SOURCES, else the live LECO page only)")
+    parser.add_argument('--profile', choices=sorted(BROKER_PROFILES), default='mosquitto')
+    args = parser.parse_args()
+    main(profile=args.profile, config_path=args.config)
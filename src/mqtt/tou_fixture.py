@@ -0,0 +1,89 @@
+"""
+Local stand-in for the LECO tariff page, for testing tou_publisher.py offline.
+
+Serves fixtures/leco_tou.html (re-read on every request, so editing a rate
+changes the page) with an ETag and Last-Modified, and answers conditional
+requests with 304 like the real site's web server. A path naming another
+file in fixtures/ (e.g. /utility_tariffs.json) serves that file instead, so
+one server stands in for every source in tariff_ingest.py. A `delay=<secs>`
+query parameter holds the response back, to exercise per-source timeouts.
+
+Example:
+    python tou_fixture.py --port 8765
+    TOU_URL=http://127.0.0.1:8765/pages_e.php?id=86 python tou_publisher.py
+"""
+
+import argparse
+import hashlib
+import mimetypes
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+fixtures_dir = os.path.join(base_dir, 'fixtures')
+default_page = os.path.join(fixtures_dir, 'leco_tou.html')
+
+
+def make_handler(page_path):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            delay = parse_qs(url.query).get('delay')
+            if delay:
+                time.sleep(float(delay[0]))
+            name = os.path.basename(url.path)
+            path = os.path.join(fixtures_dir, name) if name else ''
+            if not os.path.isfile(path):
+                path = page_path
+            with open(path, 'rb') as f:
+                body = f.read()
+            mtime = int(os.path.getmtime(path))
+            etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+            last_modified = formatdate(mtime, usegmt=True)
+
+            if_none_match = self.headers.get('If-None-Match')
+            if_modified_since = self.headers.get('If-Modified-Since')
+            not_modified = False
+            if if_none_match is not None:
+                not_modified = etag in [t.strip() for t in if_none_match.split(',')]
+            elif if_modified_since is not None:
+                try:
+                    not_modified = mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    pass
+
+            self.send_response(304 if not_modified else 200)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            if not_modified:
+                self.end_headers()
+                return
+            content_type = mimetypes.guess_type(path)[0] or 'text/html'
+            self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            print(f"fixture: {self.command} {self.path} -> {args[1] if len(args) > 1 else ''}")
+
+    return FixtureHandler
+
+
+def serve(port=8765, host='127.0.0.1', page_path=default_page):
+    """Start the fixture server (blocking)."""
+    server = ThreadingHTTPServer((host, port), make_handler(page_path))
+    print(f"Serving {page_path} on http://{host}:{port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a LECO-like TOU page with ETag support.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--page', default=default_page)
+    args = parser.parse_args()
+    serve(args.port, args.host, args.page)
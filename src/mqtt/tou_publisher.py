@@ -0,0 +1,245 @@
+"""
+TOU tariff publisher: LECO page -> retained MQTT message, only on change.
+
+- HTTP: one requests.Session; each poll is a conditional GET (If-None-Match /
+  If-Modified-Since). A 304, or a 200 whose body hashes (sha256) to the last
+  parsed page, costs no parsing. Only the <table> elements are parsed.
+- MQTT: the process's shared session (mqtt_session.py) with a fixed client id,
+  so the broker session is persistent and reconnects back off with jitter
+  (1 s .. 120 s). The TOU JSON is published retained (qos 1) only when
+  its canonical form differs from what the broker already holds; the retained
+  value is read back once at startup so a restart does not republish.
+
+Brokers are picked by profile (mqtt_session.BROKER_PROFILES) and can be
+overridden with MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_PASS, MQTT_TLS; TOU_URL
+points the scraper elsewhere (e.g. the local fixture in tou_fixture.py).
+
+Example (local stand-ins for LECO and the broker):
+    python tou_fixture.py --port 8765 &
+    mosquitto -p 1883 &
+    TOU_URL=http://127.0.0.1:8765/pages_e.php MQTT_HOST=localhost python tou_publisher.py --profile mosquitto
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+
+from mqtt_session import BROKER_PROFILES, broker_settings, default_client_id, get_session_for_profile
+
+TOU_URL = os.getenv('TOU_URL', "https://www.leco.lk/pages_e.php?id=86")
+MQTT_TOPIC = "power/tou_domestic"
+POLL_SECS = 300
+HTTP_TIMEOUT_SECS = 20
+CONNECT_WAIT_SECS = 30
+RETAINED_WAIT_SECS = 3
+PUBLISH_WAIT_SECS = 10
+DOMESTIC_TOU_SECTION = "Domestic – Optional Time of Use Tariff"
+
+def canonical_json(tou_data):
+    """Stable serialization used both as the payload and for change detection."""
+    return json.dumps(tou_data, sort_keys=True, separators=(',', ':'))
+
+
+def parse_tou_table(table, section=DOMESTIC_TOU_SECTION):
+    """
+    Extract the Day/Peak/Off-peak rows that follow a section heading row.
+
+    Returns:
+    - {"day": {"rate", "time"}, "peak": {...}, "off_peak": {...}}
+    """
+    tou_found = False
+    tou_data = {}
+    for row in table.find_all("tr"):
+        cols = [td.get_text(strip=True) for td in row.find_all(["td", "th"])]
+        if not cols:
+            continue
+        if section in cols[0]:
+            tou_found = True
+            continue
+        if not tou_found:
+            continue
+        if "Day(" in cols[0]:
+            label = "day"
+        elif "Off-peak" in cols[0]:
+            label = "off_peak"
+        elif "Peak" in cols[0]:
+            label = "peak"
+        else:
+            break
+
+        time_range = cols[0].split("(")[1].split(")")[0].replace("hours", "").strip()
+        for dash in ['–', '—']:
+            time_range = time_range.replace(dash, '-')
+        try:
+            rate = float(cols[1].replace(",", ""))
+        except (IndexError, ValueError):
+            rate = None
+        tou_data[label] = {"rate": rate, "time": time_range}
+
+    if not tou_data:
+        raise Exception(f"No Day/Peak/Off-peak rows under '{section}'")
+    return tou_data
+
+
+def find_tariff_table(html):
+    """The LECO tariff <table class="table">; only <table> elements are parsed."""
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("table"))
+    table = soup.find("table", class_="table")
+    if not table:
+        raise Exception("Could not find table with TOU data!")
+    return table
+
+
+def parse_tou_html(html):
+    """Domestic TOU bands from the LECO tariff page."""
+    return parse_tou_table(find_tariff_table(html))
+
+
+class TouSource:
+    """Conditional fetch + content hash; fetch() returns new parsed data or None if unchanged."""
+
+    def __init__(self, url=TOU_URL, timeout=HTTP_TIMEOUT_SECS, parser=parse_tou_html):
+        """
+        Parameters:
+        - timeout: Connect/read timeout in seconds for each request
+        - parser: Callable(page_text) -> parsed data, run only when the page changed
+        """
+        self.url = url
+        self.timeout = timeout
+        self.parser = parser
+        self.session = requests.Session()
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+        self.tou_data = None
+
+    def fetch(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if content_hash != self.content_hash:
+            self.tou_data = self.parser(response.text)
+        # Remember the validators only once the page parsed, so a broken page is refetched next poll
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        if content_hash == self.content_hash:
+            return None
+        self.content_hash = content_hash
+        return self.tou_data
+
+
+class TouPublisher:
+    """Publishes the retained TOU message on change over the process's shared MQTT session."""
+
+    def __init__(self, profile='mosquitto', topic=MQTT_TOPIC, client_id=None):
+        self.profile = profile
+        self.settings = broker_settings(profile)
+        self.topic = topic
+        self.client_id = client_id or default_client_id(f"tou-publisher-{profile}")
+        self.session = None
+        self.retained_payload = None
+        self._subscription = None
+        self.retained_seen = threading.Event()
+
+    def subscribe(self):
+        """Join the shared session and subscribe for the broker's retained copy (no waiting)."""
+        self.session = get_session_for_profile(self.profile, client_id=self.client_id)
+        if self._subscription is None:
+            self._subscription = self.session.subscribe(self.topic, self._on_message, qos=1)
+
+    def start(self):
+        """Join the shared session and read back the broker's retained TOU message."""
+        self.subscribe()
+        if not self.session.wait_connected(CONNECT_WAIT_SECS):
+            raise TimeoutError(f"MQTT broker {self.settings['host']}:{self.settings['port']} not reachable")
+        self.retained_seen.wait(RETAINED_WAIT_SECS)
+
+    def publish(self, tou_data):
+        """Publish retained if the canonical payload differs from the broker's; returns True if sent."""
+        payload = canonical_json(tou_data)
+        if payload == self.retained_payload:
+            return False
+        self.session.publish(self.topic, payload, qos=1, retain=True, wait=PUBLISH_WAIT_SECS)
+        self.retained_payload = payload
+        print(f"Published TOU data to MQTT topic {self.topic}: {payload}")
+        return True
+
+    def _on_message(self, msg):
+        # Only retained copies reflect what the broker stores (sent on (re)subscribe)
+        if not msg.retain:
+            return
+        try:
+            self.retained_payload = canonical_json(json.loads(msg.payload.decode()))
+        except (ValueError, UnicodeDecodeError):
+            self.retained_payload = None
+        self.retained_seen.set()
+
+
+class TouService:
+    """Source + publisher pair; poll() is one cycle."""
+
+    def __init__(self, profile='mosquitto', url=TOU_URL, topic=MQTT_TOPIC):
+        self.source = TouSource(url)
+        self.publisher = TouPublisher(profile, topic)
+        self._started = False
+
+    def poll(self):
+        """Fetch once and publish if the tariff changed; returns the current TOU data."""
+        if not self._started:
+            self.publisher.start()
+            self._started = True
+        if self.source.fetch() is None:
+            print("TOU page unchanged")
+        else:
+            print("TOU rates and times extracted:", self.source.tou_data)
+        # Compared against the broker's copy rather than the last fetch, so a publish
+        # that failed while disconnected is retried on the next poll
+        if not self.publisher.publish(self.source.tou_data):
+            print("Broker already holds this TOU table; not republishing")
+        return self.source.tou_data
+
+
+_services = {}
+
+
+def get_service(profile='mosquitto'):
+    """Process-wide service per profile, so repeated publish_once() calls reuse the session."""
+    if profile not in _services:
+        _services[profile] = TouService(profile)
+    return _services[profile]
+
+
+def main(ready=None, profile='mosquitto', poll_secs=POLL_SECS):
+    """Poll every `poll_secs`; `ready` (threading.Event) is set after the first successful cycle."""
+    service = get_service(profile)
+    while True:
+        try:
+            service.poll()
+            if ready is not None:
+                ready.set()
+        except Exception as e:
+            print("Error:", e)
+
+        time.sleep(poll_secs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the LECO TOU tariff to MQTT when it changes.")
+    parser.add_argument('--profile', choices=sorted(BROKER_PROFILES), default='mosquitto')
+    parser.add_argument('--poll-secs', type=float, default=POLL_SECS)
+    args = parser.parse_args()
+    main(profile=args.profile, poll_secs=args.poll_secs)
@@ -1,23 +1,45 @@
-import paho.mqtt.client as mqtt
-import json
 import numpy as np
 import pickle
-import random
 from tensorflow.keras.models import load_model
 import threading
+import time
+from collections import deque
 import pandas as pd  # Add this import at the top if not already present
 
 import os
+import sys
+
+from checkpoint import load_checkpoint, save_checkpoint
+from ingest_queue import SampleQueue
+from metrics import MetricsRegistry, NullRegistry, start_http_server
+from model_registry import ModelRegistry
+from rollups import HourlyRollup
+from sensor_log import SensorLogWriter
+from state_bus import StateBus
+from synthetic_data import generate_samples
+from thresholds import ThresholdCalibrator, load_calibration
+
+# Shared MQTT session and payload helpers live next to the publishers
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mqtt')))
+from mqtt_session import get_session_for_profile
+from sensor_payload import decode_payload, packed_topic
 
 # --- Configurations ---
-broker = "localhost"
-port = 1883
+mqtt_profile = "local"  # mqtt_session.BROKER_PROFILES; MQTT_HOST / MQTT_PORT etc. override it
 topic = "home/power"
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(base_dir, 'my_lstm_model.keras')
 scaler_path = os.path.join(base_dir, 'scaler.pkl')
 output_file = os.path.abspath(os.path.join(base_dir, '..', '..', 'appliance_data.txt'))
+checkpoint_path = os.path.join(base_dir, 'predictor_state.ckpt')
+checkpoint_interval = 60  # seconds between state snapshots
+sensor_log_dir = os.path.abspath(os.path.join(base_dir, '..', '..', 'data', 'sensor_log'))
+sensor_log_enabled = True  # persist every real reading as compressed hourly segments
+state_bus_enabled = True   # push new 24-hour states to the agent (see state_bus.py)
+export_text_file = True    # also write appliance_data.txt for file-based consumers
+metrics_enabled = True     # False swaps every instrument for a no-op (see metrics.py)
+metrics_port = 9108        # Prometheus text at http://127.0.0.1:9108/metrics
 
 appliance_names = [
     'WashingMachine_Power',
@@ -29,239 +51,383 @@ appliance_names = [
 seq_length = 24
 initial_fill_samples = 1464  # 24*61: ensures exactly 24 hourly windows after seq_length offset
 max_buffer_size = 1464
+dummy_seed = None  # set an int for a reproducible warm-start buffer
+
+# Ingestion queue / inference worker
+queue_max_size = 10000
+queue_drop_policy = 'drop_oldest'  # 'drop_oldest', 'drop_newest' or 'block'
+batch_max_samples = 256     # max samples drained per micro-batch
+batch_wait_secs = 0.5       # how long the worker waits for new samples
+predict_every = 30          # run a prediction after this many new samples
+queue_stats_interval = 60   # seconds between queue depth/lag reports
+
+model_poll_secs = 10        # how often my_lstm_model.keras / scaler.pkl are checked for a new version
 
 # --- Load model and scaler ---
-model = load_model(model_path)
-with open(scaler_path, 'rb') as f:
-    scaler = pickle.load(f)
+def load_artifacts(model_path, scaler_path):
+    loaded_model = load_model(model_path)
+    with open(scaler_path, 'rb') as f:
+        loaded_scaler = pickle.load(f)
+    return loaded_model, loaded_scaler
+
+def validate_artifacts(candidate_model, candidate_scaler, samples):
+    """Raise unless the candidate pair produces sane predictions for `samples` (recent buffer rows)."""
+    n_features = getattr(candidate_scaler, 'n_features_in_', len(appliance_names))
+    if n_features != len(appliance_names):
+        raise ValueError(f"scaler expects {n_features} features, predictor has {len(appliance_names)}")
+    if not samples or len(samples) <= seq_length:
+        samples = generate_samples(seq_length + predict_every, appliance_names=appliance_names).tolist()
+    scaled = candidate_scaler.transform(pd.DataFrame(np.array(samples), columns=appliance_names))
+    x = np.array([scaled[i:i + seq_length] for i in range(len(scaled) - seq_length)])
+    preds = candidate_scaler.inverse_transform(candidate_model.predict(x, verbose=0))
+    if preds.shape != (len(x), len(appliance_names)):
+        raise ValueError(f"model output shape {preds.shape}, expected {(len(x), len(appliance_names))}")
+    if not np.all(np.isfinite(preds)):
+        raise ValueError("model produced non-finite predictions")
+
+# Predictions always use model_registry.current; new artifacts are swapped in between batches
+model_registry = ModelRegistry(model_path, scaler_path, load_artifacts, validate_artifacts, poll_secs=model_poll_secs)
+model_version = model_registry.load()
+model, scaler = model_version.model, model_version.scaler
 
 # --- Buffers and Locks ---
 data_buffer = []
-daily_prediction_store = []
+daily_prediction_store = deque(maxlen=1440)  # last 24 hours of minute predictions (checkpointed)
 buffer_lock = threading.Lock()
 buffer_pointer = 0
+sample_queue = SampleQueue(maxsize=queue_max_size, policy=queue_drop_policy)
+sensor_log = None
+state_bus = None
+inference_thread = None
+metrics_server = None
+# Per-appliance ON/OFF thresholds, seeded from thresholds.json and updated on every real reading
+threshold_calibrator = ThresholdCalibrator(appliance_names, load_calibration())
+# Running per-hour aggregates: 60 consecutive minute predictions per hour, and real readings by wall-clock
+# hour (sent to the agent with the states). One slot more than a day so 24 complete hours are kept while
+# the next one fills up
+rollup_hours = 25
+prediction_rollup = HourlyRollup(len(appliance_names), hours=rollup_hours)
+sample_rollup = HourlyRollup(len(appliance_names), hours=rollup_hours)
+
+# --- Metrics ---
+metrics = MetricsRegistry() if metrics_enabled else NullRegistry()
+metric_ingest_seconds = metrics.histogram('predictor_ingest_seconds', "Decode + enqueue time per MQTT message")
+metric_messages = metrics.counter('predictor_messages_total', "MQTT messages received")
+metric_message_errors = metrics.counter('predictor_message_errors_total', "MQTT messages that failed to decode")
+metric_samples = metrics.counter('predictor_samples_total', "Sensor samples decoded from MQTT")
+metric_inference_seconds = metrics.histogram('predictor_inference_seconds', "End-to-end predict_on_buffer latency per batch")
+metric_stage_seconds = {
+    stage: metrics.histogram('predictor_stage_seconds', "Latency per inference stage", labels={'stage': stage})
+    for stage in ('transform', 'predict', 'inverse_transform', 'postprocess', 'file_write', 'publish')
+}
+metric_model_swaps = metrics.counter('predictor_model_swaps_total', "Model/scaler versions hot-swapped in")
+metric_windows = metrics.counter('predictor_windows_total', "Input windows run through the model")
+metric_windows_per_sec = metrics.gauge('predictor_windows_per_second', "Windows per second in the last model call")
+metric_states_lag = metrics.histogram('predictor_sample_to_states_seconds',
+                                      "From receiving the newest sample in a batch to publishing its states")
+metrics.gauge('predictor_buffer_fill_ratio', "Ring buffer fill level (0-1)",
+              fn=lambda: len(data_buffer) / max_buffer_size)
+metrics.gauge('predictor_queue_depth', "Samples waiting in the ingest queue", fn=sample_queue.depth)
+metrics.gauge('predictor_queue_lag_seconds', "Age of the oldest queued sample", fn=sample_queue.lag)
+metrics.gauge('predictor_queue_dropped', "Samples dropped by the ingest queue",
+              fn=lambda: sample_queue.stats()['dropped'])
 
 states = {}
 averages = {}
 binary_average_states = {}
+states_model_tag = model_version.tag  # version of the model behind the latest published states
 
-# --- Dummy Sample Generator ---
-def generate_dummy_sample():
-    # Appliance power ratings (max values)
-    appliance_max_power = {
-        'WashingMachine': 2500,
-        'AC': 3000,
-        'Heater': 2000,
-        'VehicleCharger': 3500,
-        'VacuumCleaner': 1200
-    }
-    # Appliance usage patterns (minutes ON per day)
-    patterns = {
-        'WashingMachine': {'sessions': 1, 'duration': 120},
-        'Heater': {'sessions': 6, 'duration': 30},
-        'AC': {'sessions': 2, 'duration': 300},
-        'VehicleCharger': {'sessions': 1, 'duration': 300},
-        'VacuumCleaner': {'sessions': 3, 'duration': 60}
-    }
-    # Total minutes in a day
-    total_minutes = 1440
-
-    # For reproducibility, you can set a random seed if needed
-    # random.seed(42)
-
-    # Generate ON/OFF schedules for each appliance
-    schedules = {}
-    for app, pat in patterns.items():
-        on_minutes = []
-        if app == 'VehicleCharger':
-            # Prefer night: random start between 22:00 and 2:00 (1320-120)
-            start = random.randint(1200, 1380)
-            on_minutes = list(range(start, start + pat['duration']))
-        else:
-            for _ in range(pat['sessions']):
-                start = random.randint(0, total_minutes - pat['duration'])
-                on_minutes += list(range(start, start + pat['duration']))
-        schedules[app] = set(on_minutes)
-
-    # Internal pointer to track current minute in simulation
-    if not hasattr(generate_dummy_sample, "minute"):
-        generate_dummy_sample.minute = 0
-
-    minute = generate_dummy_sample.minute
-
-    # For each appliance, determine ON/OFF state and assign power
-    sample = []
-    for app in ['WashingMachine_Power', 'Heater_Power', 'AC_Power', 'VehicleCharger_Power', 'VacuumCleaner_Power']:
-        if minute in schedules[app.replace('_Power', '')]:
-            power = random.uniform(0.8, 1.0) * appliance_max_power[app.replace('_Power', '')]
-        else:
-            power = random.uniform(0, 5)
-        sample.append(power)
-
-    # Advance minute pointer
-    generate_dummy_sample.minute = (minute + 1) % total_minutes
-
-    return sample
+# --- Checkpointing ---
+def save_state():
+    """Snapshot the ordered ring buffer and prediction history."""
+    with buffer_lock:
+        ordered_buffer = data_buffer[buffer_pointer:] + data_buffer[:buffer_pointer]
+        predictions = list(daily_prediction_store)
+    save_checkpoint(checkpoint_path, ordered_buffer, predictions, len(appliance_names))
+
+def restore_state():
+    """Resume buffer and prediction history from the last snapshot. Returns False if there is none."""
+    global data_buffer, daily_prediction_store, buffer_pointer, prediction_rollup
+    snapshot = load_checkpoint(checkpoint_path, len(appliance_names))
+    if snapshot is None:
+        return False
+    buffer, predictions, created = snapshot
+    with buffer_lock:
+        data_buffer = buffer.tolist()
+        daily_prediction_store = deque(predictions.tolist(), maxlen=1440)
+        buffer_pointer = 0
+        prediction_rollup = HourlyRollup(len(appliance_names), hours=rollup_hours)
+        prediction_rollup.extend(predictions, current_thresholds())
+    print(f"Restored {len(data_buffer)} buffered samples and {len(daily_prediction_store)} predictions "
+          f"from checkpoint saved at {time.ctime(created)}")
+    if daily_prediction_store:
+        process_and_save_predictions(prediction_rollup, appliance_names,
+                                     output_filename=output_file if export_text_file else None,
+                                     model_tag=states_model_tag)
+        publish_states()
+    return True
 
 # --- Fill Initial Buffer ---
 def fill_initial_dummy_data():
     print(f"Filling initial buffer with {initial_fill_samples} dummy samples...")
+    samples = generate_samples(initial_fill_samples, seed=dummy_seed, appliance_names=appliance_names)
     with buffer_lock:
-        for _ in range(initial_fill_samples):
-            data_buffer.append(generate_dummy_sample())
+        data_buffer.extend(samples.tolist())
     print("Initial dummy data fill complete.")
 
-def binarize_power_values(power_values, threshold_ratio=0.6):
-    """
-    Convert continuous power predictions to binary ON/OFF states based on dynamic threshold.
+def recent_samples(n=seq_length + predict_every):
+    """The newest `n` buffered samples in time order (used to validate new model versions)."""
+    with buffer_lock:
+        ordered_buffer = data_buffer[buffer_pointer:] + data_buffer[:buffer_pointer]
+    return ordered_buffer[-n:]
+
+def activate_pending_model():
+    """Swap in a newly loaded model/scaler, if one is staged. Call between inference batches."""
+    global model_version, model, scaler
+    version = model_registry.activate_pending()
+    if version is not None:
+        model_version = version
+        model, scaler = version.model, version.scaler
+        metric_model_swaps.inc()
+
+def current_thresholds():
+    """Learned ON thresholds as an array in appliance order (NaN while still warming up)."""
+    thresholds = threshold_calibrator.thresholds()
+    return np.array([np.nan if thresholds[name] is None else thresholds[name] for name in appliance_names])
 
-    Parameters:
-    - power_values: List or np.array of predicted power values
-    - threshold_ratio: Fraction of the max value to determine ON/OFF threshold
+# --- Process and Save States & Averages ---
+def hourly_states(rollup, calibrator, appliance_names):
+    """
+    24 hourly states per appliance from a rollup: the last 24 complete hours of minute predictions
+    (60 per hour), binarized with `calibrator`. Pure, so serve_homes can use it with per-home state.
 
     Returns:
-    - binary_states: List of 1s (ON) and 0s (OFF)
+    - ({appliance: states (24,) int}, {appliance: averages (24,) float})
     """
-    power_values = np.array(power_values)
-    threshold = threshold_ratio * np.max(power_values)
-    binary_states = (power_values >= threshold).astype(int)
-    return binary_states
-
-# --- Process and Save States & Averages ---
-def process_and_save_predictions(all_day_predictions, appliance_names, output_filename=output_file):
-    window_size = 60
     target_windows = 24  # Always produce exactly 24 hourly states
-    num_windows = len(all_day_predictions) // window_size
-
-    # If we have more windows than needed, use the last 24; if fewer, use what we have
-    num_windows = min(num_windows, target_windows)
+    hourly_means = rollup.hourly_means(target_windows, complete=True)
 
+    states, hourly_averages = {}, {}
     for idx, appliance_name in enumerate(appliance_names):
-        power_series = all_day_predictions[:, idx]
-        # Use only the last (target_windows * window_size) predictions
-        power_series = power_series[-(num_windows * window_size):]
-        avg_list = []
-
-        # Compute averages for each window
-        for i in range(num_windows):
-            window = power_series[i * window_size : (i + 1) * window_size]
-            avg = np.mean(window)
-            avg_list.append(avg)
+        avg_list = hourly_means[:, idx].tolist()
 
         # Pad to exactly 24 if fewer windows (edge case)
         while len(avg_list) < target_windows:
             avg_list.append(avg_list[-1] if avg_list else 0.0)
 
-        # Set different threshold_ratio based on appliance name
-        if appliance_name in ['AC_Power', 'Heater_Power', 'WashingMachine_Power']:
-            threshold_ratio = 0.6
-        else:
-            threshold_ratio = 0.8
-
-        binary_states = binarize_power_values(avg_list, threshold_ratio=threshold_ratio)
-        binary_average_states[appliance_name] = binary_states
+        states[appliance_name] = calibrator.binarize(appliance_name, avg_list)
+        hourly_averages[appliance_name] = np.array(avg_list)
+    return states, hourly_averages
 
-    with open(output_filename, 'w') as f:
+def write_states_file(states, appliance_names, output_filename, model_tag=None):
+    """Write appliance_data.txt (the agent's fallback when the state bus is unavailable)."""
+    with metric_stage_seconds['file_write'].time(), open(output_filename, 'w') as f:
+        if model_tag:
+            f.write(f"# Model version: {model_tag}\n")
         for appliance_name in appliance_names:
             f.write(f"--- {appliance_name} ---\n")
             f.write("States:\n")
-            if appliance_name in binary_average_states:
-                states_line = ', '.join(map(str, binary_average_states[appliance_name].tolist()))
+            if appliance_name in states:
+                states_line = ', '.join(map(str, states[appliance_name].tolist()))
                 f.write(states_line + '\n')
             else:
                 f.write("Binary average states data not available\n")
             f.write("\n")
 
-    print(f"Binary average states saved to appliance_data.txt (24 hourly states per appliance)")
+    print(f"Binary average states saved to {os.path.basename(output_filename)} (24 hourly states per appliance)")
+
+def process_and_save_predictions(rollup, appliance_names, output_filename=output_file, model_tag=None):
+    """Hourly states of this predictor (global calibrator), kept for publish_states and optionally written out."""
+    states, hourly_averages = hourly_states(rollup, threshold_calibrator, appliance_names)
+    binary_average_states.update(states)
+    averages.update(hourly_averages)
+
+    if output_filename:
+        write_states_file(states, appliance_names, output_filename, model_tag)
 
 # --- Run Prediction ---
 def predict_on_buffer(buffer):
-    global daily_prediction_store
+    with metric_inference_seconds.time():
+        _predict_on_buffer(buffer)
+
+def _predict_on_buffer(buffer):
+    global states_model_tag
+    version = model_registry.current  # one consistent model/scaler for the whole batch
     data_array = np.array(buffer)
     df = pd.DataFrame(data_array, columns=appliance_names)
-    scaled_data = scaler.transform(df)
+    with metric_stage_seconds['transform'].time():
+        scaled_data = version.scaler.transform(df)
 
     x = [scaled_data[i:i + seq_length] for i in range(len(scaled_data) - seq_length)]
     x = np.array(x)
 
-    preds_scaled = model.predict(x, verbose=0)
-    preds = scaler.inverse_transform(preds_scaled)
+    predict_start = time.perf_counter()
+    preds_scaled = version.model.predict(x, verbose=0)
+    predict_secs = time.perf_counter() - predict_start
+    metric_stage_seconds['predict'].observe(predict_secs)
+    metric_windows.inc(len(x))
+    metric_windows_per_sec.set(len(x) / predict_secs if predict_secs > 0 else 0.0)
+    with metric_stage_seconds['inverse_transform'].time():
+        preds = version.scaler.inverse_transform(preds_scaled)
+    states_model_tag = version.tag
 
     # Use only the latest prediction for each appliance
     latest_pred = preds[-1]  # shape: (num_appliances,)
+    latest_states = [
+        int(latest_pred[idx] >= threshold_calibrator.threshold_for(appliance, latest_pred))
+        for idx, appliance in enumerate(appliance_names)
+    ]
     print("\n--- Appliance Averages and Binary States (Latest Prediction) ---")
     for idx, appliance in enumerate(appliance_names):
-        avg = latest_pred[idx]
-        # Set threshold_ratio based on appliance type
-        threshold_ratio = 0.6 if appliance in ['AC_Power', 'Heater_Power', 'WashingMachine_Power'] else 0.8
-        threshold = threshold_ratio * np.max(latest_pred)
-        binary_state = int(avg >= threshold)
-        print(f"{appliance}: Average={avg:.4f}, Binary State={binary_state}")
-
-    # Save to file
-    with open(output_file, 'w') as f:
-        f.write("--- Appliance Averages and Binary States (Latest Prediction) ---\n")
-        for idx, appliance in enumerate(appliance_names):
-            avg = latest_pred[idx]
-            threshold_ratio = 0.6 if appliance in ['AC_Power', 'Heater_Power', 'WashingMachine_Power'] else 0.8
-            threshold = threshold_ratio * np.max(latest_pred)
-            binary_state = int(avg >= threshold)
-            f.write(f"{appliance}: Average={avg:.4f}, Binary State={binary_state}\n")
+        print(f"{appliance}: Average={latest_pred[idx]:.4f}, Binary State={latest_states[idx]}")
 
     daily_prediction_store.extend(preds.tolist())
-    if len(daily_prediction_store) > 1440:
-        daily_prediction_store = daily_prediction_store[-1440:]  # Keep last 24 hours
-
-    # Always update the file with the latest predictions
-    process_and_save_predictions(np.array(daily_prediction_store), appliance_names)
 
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("✅ Connected to MQTT Broker!")
-        client.subscribe(topic)
-    else:
-        print(f"❌ Failed to connect, return code {rc}")
-
-def on_message(client, userdata, msg):
-    global data_buffer, buffer_pointer
+    with metric_stage_seconds['postprocess'].time():
+        prediction_rollup.extend(preds, current_thresholds())
+        process_and_save_predictions(prediction_rollup, appliance_names,
+                                     output_filename=output_file if export_text_file else None,
+                                     model_tag=version.tag)
+    with metric_stage_seconds['publish'].time():
+        publish_states()
+
+def publish_states():
+    """Hand the latest 24-hour states to the agent over the state bus."""
+    if state_bus is None:
+        return
+    with buffer_lock:
+        recent = sample_rollup.recent(24)
+    state_bus.publish(
+        appliance_names,
+        [binary_average_states[name] for name in appliance_names],
+        [averages[name] for name in appliance_names],
+        tag=states_model_tag,
+        readings={'hour': recent['hour'], 'count': recent['count'],
+                  **{key: recent[key].T for key in ('mean', 'min', 'max', 'on_minutes')}},
+    )
+
+def on_message(msg):
+    # Runs in the MQTT session's network thread: decode and enqueue only, never predict here
+    metric_messages.inc()
     try:
-        payload = json.loads(msg.payload.decode())
-        values = [float(payload[appliance]) for appliance in appliance_names]
+        with metric_ingest_seconds.time():
+            content_type = getattr(msg.properties, 'ContentType', None) if msg.properties else None
+            samples = decode_payload(msg.topic, msg.payload, appliance_names, content_type)
+            for values in samples.tolist():
+                sample_queue.put(values)  # drops are counted in sample_queue.stats()
+        metric_samples.inc(len(samples))
+    except Exception as e:
+        metric_message_errors.inc()
+        print("❌ Error processing MQTT message:", e)
 
+def append_to_buffer(values):
+    global buffer_pointer
+    if len(data_buffer) < max_buffer_size:
+        data_buffer.append(values)
+    else:
+        data_buffer[buffer_pointer] = values
+        buffer_pointer = (buffer_pointer + 1) % max_buffer_size
+
+def inference_worker():
+    """Drain the sample queue in micro-batches and predict every `predict_every` new samples."""
+    new_samples = 0
+    last_stats = time.time()
+    last_checkpoint = time.time()
+    newest_ts = None  # receive time of the newest sample in the buffer
+    while True:
+        activate_pending_model()
+        batch = sample_queue.get_batch(max_items=batch_max_samples, timeout=batch_wait_secs)
+        recent_buffer = None
+        if batch:
+            newest_ts = batch[-1][0]
         with buffer_lock:
-            if len(data_buffer) < max_buffer_size:
-                data_buffer.append(values)
-                print(f"Added sensor sample at index {len(data_buffer)-1}: {values}")
-            else:
-                data_buffer[buffer_pointer] = values
-                print(f"Replaced sensor sample at index {buffer_pointer}: {values}")
-                buffer_pointer = (buffer_pointer + 1) % max_buffer_size
-
-            if len(data_buffer) >= seq_length + 30 and len(data_buffer) % 30 == 0:
+            thresholds = current_thresholds() if batch else None
+            for ts, values in batch:
+                append_to_buffer(values)
+                threshold_calibrator.update(values)
+                sample_rollup.add(int(ts // 3600), values, thresholds)
+                if sensor_log is not None:
+                    sensor_log.append(ts, values)
+            new_samples += len(batch)
+
+            if new_samples >= predict_every and len(data_buffer) >= seq_length + predict_every:
                 if len(data_buffer) == max_buffer_size:
                     ordered_buffer = data_buffer[buffer_pointer:] + data_buffer[:buffer_pointer]
                 else:
                     ordered_buffer = data_buffer
-                print("\nRunning prediction on buffered data (last 30 samples)...")
-                recent_buffer = ordered_buffer[-(seq_length + 30):]
+                # One model call covers every sample that arrived since the last prediction
+                window = min(new_samples, len(ordered_buffer) - seq_length)
+                recent_buffer = ordered_buffer[-(seq_length + window):]
+                new_samples = 0
+
+        if recent_buffer is not None:
+            print(f"\nRunning prediction on buffered data (last {len(recent_buffer) - seq_length} samples)...")
+            try:
                 predict_on_buffer(recent_buffer)
-    except Exception as e:
-        print("❌ Error processing MQTT message:", e)
+                if newest_ts is not None:
+                    metric_states_lag.observe(time.time() - newest_ts)
+            except Exception as e:
+                print("❌ Error running prediction:", e)
+
+        if time.time() - last_checkpoint >= checkpoint_interval:
+            try:
+                save_state()
+            except Exception as e:
+                print("❌ Error saving checkpoint:", e)
+            last_checkpoint = time.time()
+
+        if time.time() - last_stats >= queue_stats_interval:
+            stats = sample_queue.stats()
+            print(f"[Queue] depth={stats['depth']} max_depth={stats['max_depth']} "
+                  f"enqueued={stats['enqueued']} dropped={stats['dropped']} "
+                  f"lag={stats['lag_secs']:.2f}s last_batch={stats['last_batch_size']} "
+                  f"(lag {stats['last_batch_lag_secs']:.2f}s)")
+            last_stats = time.time()
 
 def mqtt_loop():
-    client = mqtt.Client()
-    client.on_connect = on_connect
-    client.on_message = on_message
-
-    print(f"Connecting to MQTT broker at {broker}:{port}...")
-    client.connect(broker, port, 60)
-    client.loop_forever()
+    session = get_session_for_profile(mqtt_profile)
+    # Legacy JSON on `topic`, packed float32 batches on `topic`/packed
+    subscriptions = [session.subscribe(topic, on_message), session.subscribe(packed_topic(topic), on_message)]
+    try:
+        session.join()
+    finally:
+        # The session outlives a restarted predictor (run_edge.py); don't leave duplicate handlers
+        for sub in subscriptions:
+            session.unsubscribe(sub)
 
 # --- Main Execution ---
+def main(ready=None):
+    """Run the predictor until the MQTT loop exits; `ready` (threading.Event) is set once states are available."""
+    global data_buffer, state_bus, sensor_log, inference_thread, metrics_server
+    if state_bus_enabled and state_bus is None:
+        state_bus = StateBus()
+    if not restore_state():
+        fill_initial_dummy_data()
+        with buffer_lock:
+            print("\nRunning prediction on initial dummy data...")
+            predict_on_buffer(data_buffer)
+            data_buffer = []
+    if metrics_enabled and metrics_server is None:
+        try:
+            metrics_server = start_http_server(metrics, metrics_port)
+            print(f"📈 Metrics at http://127.0.0.1:{metrics_port}/metrics")
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint not started on port {metrics_port}: {e}")
+    model_registry.start_watching(recent_samples)
+    if sensor_log_enabled and sensor_log is None:
+        sensor_log = SensorLogWriter(sensor_log_dir, appliance_names)
+    if inference_thread is None or not inference_thread.is_alive():
+        inference_thread = threading.Thread(target=inference_worker, name='inference-worker', daemon=True)
+        inference_thread.start()
+    if ready is not None:
+        ready.set()
+    try:
+        mqtt_loop()
+    finally:
+        save_state()
+        if sensor_log is not None:
+            sensor_log.close()
+            sensor_log = None
+
 if __name__ == "__main__":
-    fill_initial_dummy_data()
-    with buffer_lock:
-        print("\nRunning prediction on initial dummy data...")
-        predict_on_buffer(data_buffer)
-        data_buffer = []
-    mqtt_loop()
+    main()
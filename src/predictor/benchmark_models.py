@@ -0,0 +1,235 @@
+"""
+Accuracy vs speed benchmark for predictor model artifacts.
+
+Every model is scored on the same held-out block of history (the last
+--test-fraction of the series, i.e. the test split train_lstm.py uses),
+scaled with the deployed scaler.pkl and windowed exactly like
+Run_LSTM.predict_on_buffer. Reported side by side:
+
+- mse_scaled: next-step MSE in scaled units (the training loss)
+- mae_watts: next-step mean absolute error in watts
+- minute_acc: per-minute ON/OFF agreement with the actual readings
+  (each minute thresholded like Run_LSTM's latest-prediction states)
+- hourly_acc: agreement of the 24 hourly states the agent receives
+  (hourly averages binarized one 24-hour window at a time, like
+  process_and_save_predictions)
+
+Thresholds come from thresholds.json, then the calibrator is fed every
+reading before the held-out block, as the live predictor would have been.
+- latency per batch size (p50 / p95 per call, windows per second)
+- parameters, file size and resident memory added by loading the model
+
+Keras (.keras / .h5) and TFLite (.tflite, e.g. quantized) artifacts are supported.
+
+Example:
+    python benchmark_models.py my_lstm_model.keras my_lstm_model.h5 gru_64.keras \\
+        --data ../../data/history.hist --batch-sizes 1,32,256 --json results.json
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from thresholds import DEFAULT_RATIO, DEFAULT_THRESHOLD_RATIOS, ThresholdCalibrator, load_calibration
+from train_lstm import appliance_names, default_data_path, default_scaler_path, load_series, seq_length, time_split
+
+window_size = 60  # minutes per hourly state, as in process_and_save_predictions
+hours_per_day = 24  # hourly states binarized together, as in process_and_save_predictions
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class KerasModel:
+    def __init__(self, path):
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path)
+
+    def param_count(self):
+        return int(self.model.count_params())
+
+    def predict_batch(self, x):
+        return np.asarray(self.model.predict_on_batch(x))
+
+
+class TFLiteModel:
+    def __init__(self, path):
+        import tensorflow as tf
+        self.interpreter = tf.lite.Interpreter(model_path=path)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch = None
+
+    def param_count(self):
+        return None
+
+    def predict_batch(self, x):
+        if self._batch != len(x):
+            self.interpreter.resize_tensor_input(self.input['index'], list(x.shape))
+            self.interpreter.allocate_tensors()
+            self._batch = len(x)
+        self.interpreter.set_tensor(self.input['index'], x.astype(self.input['dtype']))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output['index']).astype(np.float32)
+
+
+def load_artifact(path):
+    if path.endswith('.tflite'):
+        return TFLiteModel(path)
+    return KerasModel(path)
+
+
+def make_windows(scaled):
+    """(n, features) -> ((n - seq_length, seq_length, features) windows, next-step targets)."""
+    windows = np.lib.stride_tricks.sliding_window_view(scaled, seq_length, axis=0)
+    return windows.transpose(0, 2, 1)[:-1], scaled[seq_length:]
+
+
+def predict_all(model, x, batch_size):
+    return np.concatenate([model.predict_batch(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+
+def hourly_states(calibrator, values):
+    """
+    Hourly ON/OFF states over the whole slice, per appliance: (hours, appliances).
+    Each consecutive 24 hours is binarized on its own, so the warm-up fallback uses that day's max
+    exactly as process_and_save_predictions does (a trailing partial day is binarized as is, which
+    matches its pad-with-last-value rule).
+    """
+    n_hours = len(values) // window_size
+    hourly = values[:n_hours * window_size].reshape(n_hours, window_size, -1).mean(axis=1)
+    return np.concatenate([
+        np.column_stack([calibrator.binarize(name, day[:, i]) for i, name in enumerate(appliance_names)])
+        for day in np.split(hourly, range(hours_per_day, n_hours, hours_per_day))
+    ])
+
+
+def minute_states(calibrator, values):
+    """
+    Per-minute ON/OFF states, each row thresholded like Run_LSTM's latest states:
+    threshold_for(appliance, latest_pred), i.e. the warm-up fallback uses the max of that row.
+    """
+    learned = calibrator.thresholds()
+    row_max = values.max(axis=1)
+    return np.column_stack([
+        values[:, i] >= (learned[name] if learned[name] is not None
+                         else DEFAULT_THRESHOLD_RATIOS.get(name, DEFAULT_RATIO) * row_max)
+        for i, name in enumerate(appliance_names)
+    ]).astype(int)
+
+
+def time_latency(model, x, batch_size, repeats):
+    """Per-call latencies (seconds) for `repeats` batches of `batch_size` windows, after one warm-up call."""
+    batch = x[:batch_size]
+    if len(batch) < batch_size:
+        batch = np.resize(batch, (batch_size,) + x.shape[1:])
+    model.predict_batch(batch)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_batch(batch)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings)
+
+
+def benchmark(path, x, targets, scaler, calibrator, batch_sizes, repeats):
+    rss_before = _rss_bytes()
+    model = load_artifact(path)
+    rss_after = _rss_bytes()
+
+    preds_scaled = predict_all(model, x, max(batch_sizes))
+    actual = scaler.inverse_transform(pd.DataFrame(targets, columns=appliance_names))
+    preds = scaler.inverse_transform(pd.DataFrame(preds_scaled, columns=appliance_names))
+
+    result = {
+        'model': os.path.basename(path),
+        'params': model.param_count(),
+        'file_bytes': os.path.getsize(path),
+        'load_rss_bytes': None if rss_before is None else rss_after - rss_before,
+        'windows': len(x),
+        'mse_scaled': float(np.mean((preds_scaled - targets) ** 2)),
+        'mae_watts': float(np.mean(np.abs(preds - actual))),
+        'minute_acc': float(np.mean(minute_states(calibrator, preds) == minute_states(calibrator, actual))),
+        'hourly_acc': float(np.mean(hourly_states(calibrator, preds) == hourly_states(calibrator, actual))),
+        'latency': {},
+    }
+    for batch_size in batch_sizes:
+        timings = time_latency(model, x, batch_size, repeats)
+        result['latency'][batch_size] = {
+            'p50_ms': float(np.percentile(timings, 50) * 1000),
+            'p95_ms': float(np.percentile(timings, 95) * 1000),
+            'windows_per_sec': float(batch_size / np.median(timings)),
+        }
+    return result
+
+
+def print_report(results, batch_sizes):
+    print(f"\n{'model':<28}{'params':>10}{'file MB':>9}{'load MB':>9}"
+          f"{'mse(scaled)':>13}{'mae W':>9}{'min acc':>9}{'hour acc':>10}")
+    for r in results:
+        params = '-' if r['params'] is None else r['params']
+        load_mb = '-' if r['load_rss_bytes'] is None else f"{r['load_rss_bytes'] / 1e6:.1f}"
+        print(f"{r['model']:<28}{params:>10}{r['file_bytes'] / 1e6:>9.2f}{load_mb:>9}"
+              f"{r['mse_scaled']:>13.6f}{r['mae_watts']:>9.2f}{r['minute_acc']:>9.3f}{r['hourly_acc']:>10.3f}")
+
+    print(f"\n{'model':<28}" + ''.join(f"{f'bs={b} p50/p95 ms':>24}{'win/s':>10}" for b in batch_sizes))
+    for r in results:
+        cells = ''
+        for b in batch_sizes:
+            lat = r['latency'][b]
+            cells += f"{lat['p50_ms']:>15.2f}/{lat['p95_ms']:<8.2f}{lat['windows_per_sec']:>10.0f}"
+        print(f"{r['model']:<28}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model artifacts on accuracy, latency and memory.")
+    parser.add_argument('models', nargs='+', help=".keras / .h5 / .tflite files")
+    parser.add_argument('--data', default=default_data_path, help="History CSV or history store directory")
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--test-fraction', type=float, default=0.1, help="Trailing share of the series to evaluate on")
+    parser.add_argument('--scaler', default=default_scaler_path)
+    parser.add_argument('--batch-sizes', default='1,32,256')
+    parser.add_argument('--repeats', type=int, default=50, help="Timed calls per batch size")
+    parser.add_argument('--json', default=None, help="Also write results to this file")
+    args = parser.parse_args()
+
+    batch_sizes = sorted({int(b) for b in args.batch_sizes.split(',') if b.strip()})
+    series = load_series(args.data, args.start, args.end)
+    train_end, test_start = time_split(len(series), 0.0, args.test_fraction)
+    if len(series) - test_start <= seq_length + window_size:
+        raise SystemExit(f"Held-out slice too short ({len(series) - test_start} rows)")
+
+    with open(args.scaler, 'rb') as f:
+        scaler = pickle.load(f)
+    scaled = scaler.transform(pd.DataFrame(series[test_start:], columns=appliance_names)).astype(np.float32)
+    x, targets = make_windows(scaled)
+    x = np.ascontiguousarray(x)
+    calibrator = ThresholdCalibrator(appliance_names, load_calibration())
+    for values in series[:train_end]:
+        calibrator.update(values)
+    print(f"Evaluating {len(args.models)} model(s) on {len(x)} held-out windows "
+          f"(rows {test_start}..{len(series)} of {args.data})")
+
+    results = [benchmark(path, x, targets, scaler, calibrator, batch_sizes, args.repeats) for path in args.models]
+    print_report(results, batch_sizes)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
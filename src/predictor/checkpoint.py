@@ -0,0 +1,96 @@
+"""
+Crash-safe snapshots of the predictor state (ring buffer + prediction history).
+
+The snapshot is a single memory-mappable file:
+
+  offset  size  field
+  0       4     magic b"EPCK"
+  4       2     version (1)
+  6       2     n_columns
+  8       4     n_buffer rows
+  12      4     n_prediction rows
+  16      4     crc32 of the data section
+  20      8     created (float64, unix seconds)
+  28      36    reserved (zero)
+  64      ...   float64 rows: buffer (oldest first) followed by predictions
+
+Snapshots are written to a temporary file, fsync'd and atomically renamed
+over the previous one, so a crash mid-write never leaves a torn snapshot.
+"""
+
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b"EPCK"
+VERSION = 1
+HEADER_SIZE = 64
+
+_HEADER = struct.Struct("<4sHHIIId")
+
+
+def save_checkpoint(path, buffer, predictions, n_columns):
+    """Atomically write the (ordered) buffer and prediction history to `path`."""
+    buffer = np.asarray(buffer, dtype="<f8").reshape(-1, n_columns)
+    predictions = np.asarray(predictions, dtype="<f8").reshape(-1, n_columns)
+    data = np.concatenate([buffer, predictions]).tobytes()
+
+    header = _HEADER.pack(MAGIC, VERSION, n_columns, len(buffer), len(predictions),
+                          zlib.crc32(data), time.time())
+    header = header.ljust(HEADER_SIZE, b"\0")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Persist the rename itself (not supported on Windows)
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def load_checkpoint(path, n_columns):
+    """
+    Memory-map a snapshot written by save_checkpoint.
+
+    Returns:
+    - (buffer, predictions, created) as read-only arrays, or None if the file
+      is missing, from another layout, or fails its checksum
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        magic, version, cols, n_buffer, n_preds, crc, created = _HEADER.unpack_from(header, 0)
+        if magic != MAGIC or version != VERSION or cols != n_columns:
+            print(f"⚠️ Ignoring checkpoint {path}: unexpected header")
+            return None
+
+        n_rows = n_buffer + n_preds
+        if n_rows == 0:
+            empty = np.empty((0, n_columns))
+            return empty, empty, created
+
+        data = np.memmap(path, dtype="<f8", mode="r", offset=HEADER_SIZE, shape=(n_rows, n_columns))
+        if zlib.crc32(data) != crc:
+            print(f"⚠️ Ignoring checkpoint {path}: checksum mismatch")
+            return None
+        return data[:n_buffer], data[n_buffer:], created
+    except (OSError, ValueError, struct.error) as e:
+        print(f"⚠️ Ignoring checkpoint {path}: {e}")
+        return None
@@ -0,0 +1,66 @@
+"""
+Shape-preserving downsampling for chart series.
+
+lttb() implements Largest-Triangle-Three-Buckets: it keeps the first and
+last points and, from each of the (n_out - 2) equal-count buckets in
+between, the point forming the largest triangle with the previously kept
+point and the next bucket's mean. Peaks and troughs (e.g. an appliance
+switching ON for a few minutes) survive, unlike plain averaging or
+striding.
+"""
+
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """
+    Downsample one series to at most n_out points.
+
+    Parameters:
+    - x: 1-D array, ascending (e.g. unix seconds)
+    - y: 1-D array of the same length
+    - n_out: Target number of points (>= 3 to have any effect)
+
+    Returns:
+    - indices of the kept points (ascending), so callers can take x[idx], y[idx]
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bucket edges over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    # Mean of each bucket, and of the final point for the last bucket's lookahead
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        ax, ay = x[prev], y[prev]
+        cx, cy = mean_x[b + 1], mean_y[b + 1]
+        # Twice the triangle area for every candidate in the bucket at once
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        prev = lo + int(area.argmax())
+        kept[b + 1] = prev
+    return kept
+
+
+def downsample_columns(x, values, n_out):
+    """
+    LTTB per column of values (n, k); returns [(x_kept, y_kept), ...] one pair per column.
+    """
+    values = np.asarray(values)
+    result = []
+    for col in range(values.shape[1]):
+        idx = lttb(x, values[:, col], n_out)
+        result.append((np.asarray(x)[idx], values[idx, col]))
+    return result
@@ -0,0 +1,175 @@
+"""
+Columnar, memory-mapped history store for minute-level sensor data.
+
+A store is a directory:
+
+  meta.json          {"columns": [...], "rows": N, "version": 1}
+  timestamp.npy      int64 unix seconds, sorted ascending
+  <column>.npy       float32 values, one file per appliance
+
+Files are opened with np.load(mmap_mode='r'), so opening a store costs
+nothing and a time-range slice only touches the pages it reads.
+
+Examples:
+    python history_store.py convert ../../data/final_realistic_appliance_power_data.csv ../../data/history.hist
+    python history_store.py info ../../data/history.hist
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+VERSION = 1
+TIMESTAMP_COLUMN = 'Timestamp'
+csv_chunk_rows = 100_000
+
+
+def to_epoch_seconds(value):
+    """Accept unix seconds, datetime, np.datetime64 or a date string."""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return int(value)
+    return int(pd.Timestamp(value).timestamp())
+
+
+class HistoryStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != VERSION:
+            raise ValueError(f"Unsupported history store version {self.meta.get('version')} in {path}")
+
+        self.columns = list(self.meta['columns'])
+        self.timestamps = np.load(os.path.join(path, 'timestamp.npy'), mmap_mode='r')
+        self._data = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in self.columns
+        }
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def column(self, name):
+        return self._data[name]
+
+    def index_range(self, start=None, end=None):
+        """Row range [lo, hi) covering timestamps in [start, end), found by binary search."""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, to_epoch_seconds(start), side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.timestamps, to_epoch_seconds(end), side='left'))
+        return lo, max(lo, hi)
+
+    def slice(self, start=None, end=None, columns=None):
+        """Return (timestamps, values[n, len(columns)]) for rows with start <= t < end."""
+        columns = self.columns if columns is None else columns
+        lo, hi = self.index_range(start, end)
+        values = np.column_stack([self._data[name][lo:hi] for name in columns]) if columns else np.empty((hi - lo, 0))
+        return np.asarray(self.timestamps[lo:hi]), values
+
+    def iter_chunks(self, chunk_rows=csv_chunk_rows, start=None, end=None, columns=None):
+        """Yield (timestamps, values) chunks of at most chunk_rows rows in time order."""
+        columns = self.columns if columns is None else columns
+        lo, hi = self.index_range(start, end)
+        for chunk_start in range(lo, hi, chunk_rows):
+            chunk_end = min(chunk_start + chunk_rows, hi)
+            values = np.column_stack([self._data[name][chunk_start:chunk_end] for name in columns])
+            yield np.asarray(self.timestamps[chunk_start:chunk_end]), values
+
+    def to_array(self, columns=None, start=None, end=None):
+        return self.slice(start, end, columns)[1]
+
+    def describe(self):
+        if len(self) == 0:
+            return f"{self.path}: empty"
+        first = pd.Timestamp(int(self.timestamps[0]), unit='s')
+        last = pd.Timestamp(int(self.timestamps[-1]), unit='s')
+        return f"{self.path}: {len(self)} rows, {first} .. {last}, columns={self.columns}"
+
+
+def write_store(path, timestamps, columns):
+    """
+    Write a store from in-memory arrays.
+
+    Parameters:
+    - timestamps: 1-D array of unix seconds (sorted ascending)
+    - columns: dict {name: 1-D array}
+    """
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, 'timestamp.npy'), np.asarray(timestamps, dtype=np.int64))
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_path, f'{name}.npy'), np.asarray(values, dtype=np.float32))
+    _finish_store(tmp_path, path, list(columns), len(timestamps))
+
+
+def convert_csv(csv_path, path, chunk_rows=csv_chunk_rows):
+    """Convert a Timestamp + appliance-columns CSV into a store, streaming it in chunks."""
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        header = f.readline().strip().split(',')
+        n_rows = sum(1 for line in f if line.strip())
+    columns = [name for name in header if name != TIMESTAMP_COLUMN]
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    open_memmap = np.lib.format.open_memmap
+    timestamps = open_memmap(os.path.join(tmp_path, 'timestamp.npy'), mode='w+', dtype=np.int64, shape=(n_rows,))
+    outputs = {
+        name: open_memmap(os.path.join(tmp_path, f'{name}.npy'), mode='w+', dtype=np.float32, shape=(n_rows,))
+        for name in columns
+    }
+
+    offset = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        n = len(chunk)
+        timestamps[offset:offset + n] = pd.to_datetime(chunk[TIMESTAMP_COLUMN]).to_numpy('datetime64[s]').astype(np.int64)
+        for name in columns:
+            outputs[name][offset:offset + n] = chunk[name].to_numpy(dtype=np.float32)
+        offset += n
+
+    if offset and np.any(np.diff(timestamps[:offset]) < 0):
+        raise ValueError(f"{csv_path} is not sorted by {TIMESTAMP_COLUMN}")
+
+    for array in [timestamps, *outputs.values()]:
+        array.flush()
+    del timestamps, outputs
+    _finish_store(tmp_path, path, columns, offset)
+
+
+def _finish_store(tmp_path, path, columns, n_rows):
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': VERSION, 'columns': columns, 'rows': n_rows}, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar history store tools.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    convert = sub.add_parser('convert', help="Convert a history CSV into a store")
+    convert.add_argument('csv')
+    convert.add_argument('store')
+
+    info = sub.add_parser('info', help="Describe a store")
+    info.add_argument('store')
+
+    args = parser.parse_args()
+    if args.command == 'convert':
+        convert_csv(args.csv, args.store)
+        print(f"✅ Converted {args.csv} -> {args.store}")
+    print(HistoryStore(args.store).describe())
+
+
+if __name__ == "__main__":
+    main()
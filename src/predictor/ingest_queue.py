@@ -0,0 +1,104 @@
+"""
+Bounded sample queue between MQTT ingestion and the inference worker.
+
+The MQTT network thread only calls put(); the worker drains samples in
+micro-batches with get_batch(). When the queue is full the configured
+policy decides what happens:
+
+- 'drop_oldest': discard the oldest queued sample to make room (default)
+- 'drop_newest': discard the incoming sample
+- 'block':       wait up to block_timeout seconds for room, then drop the incoming sample
+"""
+
+import threading
+import time
+from collections import deque
+
+DROP_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class SampleQueue:
+    def __init__(self, maxsize=10000, policy='drop_oldest', block_timeout=1.0):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy {policy!r}; expected one of {DROP_POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._items = deque()
+        self._cond = threading.Condition()
+
+        # Metrics
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.last_batch_size = 0
+        self.last_batch_lag = 0.0
+
+    def put(self, sample, timestamp=None):
+        """Enqueue one sample. Returns False if a sample (this or an older one) was dropped."""
+        item = (time.time() if timestamp is None else timestamp, sample)
+        accepted = True
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == 'drop_oldest':
+                    self._items.popleft()
+                    self.dropped += 1
+                    accepted = False
+                elif self.policy == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                else:
+                    room = self._cond.wait_for(lambda: len(self._items) < self.maxsize, self.block_timeout)
+                    if not room:
+                        self.dropped += 1
+                        return False
+
+            self._items.append(item)
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+        return accepted
+
+    def get_batch(self, max_items=256, timeout=0.5):
+        """
+        Wait up to `timeout` seconds for at least one sample, then return up to
+        `max_items` queued (timestamp, sample) tuples in arrival order.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                return []
+            n = min(max_items, len(self._items))
+            batch = [self._items.popleft() for _ in range(n)]
+            self.dequeued += n
+            self.last_batch_size = n
+            self.last_batch_lag = time.time() - batch[0][0]
+            self._cond.notify_all()
+        return batch
+
+    def depth(self):
+        with self._cond:
+            return len(self._items)
+
+    def lag(self):
+        """Age in seconds of the oldest sample still waiting in the queue."""
+        with self._cond:
+            if not self._items:
+                return 0.0
+            return time.time() - self._items[0][0]
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._items)
+            oldest_age = time.time() - self._items[0][0] if self._items else 0.0
+            return {
+                'depth': depth,
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'dequeued': self.dequeued,
+                'dropped': self.dropped,
+                'lag_secs': oldest_age,
+                'last_batch_size': self.last_batch_size,
+                'last_batch_lag_secs': self.last_batch_lag,
+            }
@@ -0,0 +1,223 @@
+"""
+Minimal in-process metrics (counters, gauges, histograms) with a local
+Prometheus text endpoint.
+
+    registry = MetricsRegistry()
+    latency = registry.histogram('predictor_predict_seconds', "model.predict latency")
+    with latency.time():
+        model.predict(x)
+    start_http_server(registry, port=9108)   # GET http://127.0.0.1:9108/metrics
+
+NullRegistry hands out one shared no-op instrument, so instrumented code
+keeps the same calls when metrics are disabled but does no timing, locking
+or bookkeeping. Gauges can take a callback that is only evaluated on scrape,
+which keeps values like queue depth off the hot path entirely.
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; spans sub-millisecond ingest up to multi-second model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels, extra=None):
+    items = list((labels or {}).items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, labels=None):
+        self.labels = labels
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def value(self):
+        return self._value
+
+    def render(self, name):
+        return [f"{name}{_format_labels(self.labels)} {self._value}"]
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, labels=None, fn=None):
+        self.labels = labels
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        return self._fn() if self._fn is not None else self._value
+
+    def render(self, name):
+        return [f"{name}{_format_labels(self.labels)} {float(self.value())}"]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, labels=None, buckets=DEFAULT_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """Context manager observing the elapsed wall time in seconds."""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def render(self, name):
+        counts, total, count = self.snapshot()
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(self.labels, {'le': bound})} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(self.labels, {'le': '+Inf'})} {count}")
+        lines.append(f"{name}_sum{_format_labels(self.labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(self.labels)} {count}")
+        return lines
+
+
+class _NoOpMetric:
+    """Stands in for every instrument when metrics are disabled."""
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP = _NoOpMetric()
+
+
+class MetricsRegistry:
+    enabled = True
+
+    def __init__(self):
+        self._families = {}   # name -> (kind, help, [metrics])
+        self._lock = threading.Lock()
+
+    def _register(self, name, help_text, metric):
+        with self._lock:
+            kind, _, metrics = self._families.setdefault(name, (metric.kind, help_text, []))
+            if kind != metric.kind:
+                raise ValueError(f"Metric {name} already registered as a {kind}")
+            metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=None):
+        return self._register(name, help_text, Counter(labels))
+
+    def gauge(self, name, help_text, labels=None, fn=None):
+        return self._register(name, help_text, Gauge(labels, fn))
+
+    def histogram(self, name, help_text, labels=None, buckets=DEFAULT_BUCKETS):
+        return self._register(name, help_text, Histogram(labels, buckets))
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics))
+                        for name, (kind, help_text, metrics) in self._families.items()]
+        lines = []
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                try:
+                    lines.extend(metric.render(name))
+                except Exception as e:
+                    lines.append(f"# {name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+class NullRegistry:
+    enabled = False
+
+    def counter(self, name, help_text, labels=None):
+        return NOOP
+
+    def gauge(self, name, help_text, labels=None, fn=None):
+        return NOOP
+
+    def histogram(self, name, help_text, labels=None, buckets=DEFAULT_BUCKETS):
+        return NOOP
+
+    def render(self):
+        return ""
+
+
+def start_http_server(registry, port, host='127.0.0.1'):
+    """Serve registry.render() on http://host:port/metrics from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep scrapes out of the predictor's console output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
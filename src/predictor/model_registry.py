@@ -0,0 +1,134 @@
+"""
+Hot-reloadable model + scaler for the predictor.
+
+ModelRegistry watches the artifact files (mtime + size). When they change
+and have stopped changing for `settle_secs` (so a half-copied file is
+never loaded), a background thread loads the new pair, validates it on
+samples from the live buffer and stages it. The inference worker calls
+activate_pending() between batches, which swaps the staged version in
+with a single reference assignment; a batch always runs on one
+consistent (model, scaler, tag) triple taken from `registry.current`.
+
+A candidate that fails to load or validate is logged and skipped until
+the files change again; the running version keeps serving.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ModelVersion:
+    model: object
+    scaler: object
+    tag: str
+    loaded_at: float = field(default_factory=time.time)
+
+
+def artifact_signature(paths):
+    """(mtime_ns, size) per file; None for a missing file."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def version_tag(paths):
+    """Short, stable tag for the artifact contents, e.g. 'm20250101T120000-1a2b3c4d'."""
+    digest = hashlib.sha1()
+    newest = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        newest = max(newest, os.path.getmtime(path))
+    return f"m{time.strftime('%Y%m%dT%H%M%S', time.gmtime(newest))}-{digest.hexdigest()[:8]}"
+
+
+class ModelRegistry:
+    def __init__(self, model_path, scaler_path, loader, validator=None, poll_secs=10.0, settle_secs=2.0):
+        """
+        Parameters:
+        - loader: Callable(model_path, scaler_path) -> (model, scaler)
+        - validator: Optional callable(model, scaler, samples) that raises if the pair is unusable
+        - poll_secs: How often the artifact files are checked
+        - settle_secs: How long the files must be unchanged before a reload
+        """
+        self.paths = (model_path, scaler_path)
+        self.loader = loader
+        self.validator = validator
+        self.poll_secs = poll_secs
+        self.settle_secs = settle_secs
+        self.current = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self._signature = None
+        self._rejected = None
+        self._thread = None
+
+    def load(self):
+        """Load the artifacts synchronously and make them current (startup)."""
+        signature = artifact_signature(self.paths)
+        self.current = self._load()
+        self._signature = signature
+        return self.current
+
+    def _load(self):
+        model, scaler = self.loader(*self.paths)
+        return ModelVersion(model, scaler, version_tag(self.paths))
+
+    def start_watching(self, sample_fn=None):
+        """
+        Poll the artifacts from a daemon thread.
+
+        Parameters:
+        - sample_fn: Callable returning recent raw samples (list of rows) for validation
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._watch, args=(sample_fn,), name='model-watcher', daemon=True)
+        self._thread.start()
+
+    def activate_pending(self):
+        """Swap in a staged version; returns the new ModelVersion or None. Call between batches."""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return None
+        previous = self.current
+        self.current = pending
+        print(f"🔁 Model {previous.tag if previous else '-'} -> {pending.tag}")
+        return pending
+
+    def _watch(self, sample_fn):
+        while True:
+            time.sleep(self.poll_secs)
+            signature = artifact_signature(self.paths)
+            if signature == self._signature or signature == self._rejected or None in signature:
+                continue
+
+            # Wait until the files stop changing (e.g. a copy still in progress)
+            time.sleep(self.settle_secs)
+            if artifact_signature(self.paths) != signature:
+                continue
+
+            try:
+                candidate = self._load()
+                if self.validator is not None:
+                    self.validator(candidate.model, candidate.scaler, sample_fn() if sample_fn else None)
+            except Exception as e:
+                print(f"❌ Rejected new model artifacts: {e}")
+                self._rejected = signature
+                continue
+
+            with self._lock:
+                self._pending = candidate
+            self._signature = signature
+            print(f"✅ Loaded and validated model {candidate.tag}; swapping in before the next batch")
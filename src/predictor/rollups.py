@@ -0,0 +1,110 @@
+"""
+Incremental per-hour aggregates for appliance power.
+
+HourlyRollup keeps a ring of `hours` slots, each holding per-appliance
+sum, count, min, max and ON-minutes. Adding a reading touches one slot
+(O(appliances)); reading the last 24 hours is O(24 x appliances) no matter
+how many minute values went in, so hourly states no longer rescan the
+1440-minute prediction history and the agent gets per-hour usage of the
+real readings over the state bus instead of re-reading them.
+
+Hours are plain integers chosen by the caller:
+- add(hour, values) for wall-clock buckets, e.g. hour = int(ts // 3600)
+- add_next(values) for a stream of minute values where every 60
+  consecutive values form one hour (how the predictor's minute
+  predictions are grouped)
+
+Stream hours are counted from the first value the rollup saw (e.g. after a
+restart, the first restored prediction), not back from the newest value as
+the original per-cycle re-averaging did; pass complete=True to leave out the
+newest hour until it has all its values.
+"""
+
+import numpy as np
+
+
+class HourlyRollup:
+    def __init__(self, n_columns, hours=24, minutes_per_hour=60):
+        self.n_columns = n_columns
+        self.hours = hours
+        self.minutes_per_hour = minutes_per_hour
+        self.slot_hour = np.full(hours, -1, dtype=np.int64)
+        self.count = np.zeros(hours, dtype=np.int64)
+        self.sum = np.zeros((hours, n_columns))
+        self.min = np.full((hours, n_columns), np.inf)
+        self.max = np.full((hours, n_columns), -np.inf)
+        self.on_minutes = np.zeros((hours, n_columns), dtype=np.int64)
+        self.latest_hour = -1
+        self.minute = 0  # position in the add_next() stream
+
+    def _reset(self, slot, hour):
+        self.slot_hour[slot] = hour
+        self.count[slot] = 0
+        self.sum[slot] = 0.0
+        self.min[slot] = np.inf
+        self.max[slot] = -np.inf
+        self.on_minutes[slot] = 0
+
+    def add(self, hour, values, thresholds=None):
+        """
+        Fold one reading into its hour.
+
+        Parameters:
+        - hour: Integer hour index (readings older than the ring are ignored)
+        - values: Sequence of n_columns floats
+        - thresholds: Optional (n_columns,) ON thresholds; NaN means unknown (not counted as ON)
+        """
+        if hour <= self.latest_hour - self.hours:
+            return
+        slot = hour % self.hours
+        if self.slot_hour[slot] != hour:
+            self._reset(slot, hour)
+        values = np.asarray(values, dtype=np.float64)
+        self.count[slot] += 1
+        self.sum[slot] += values
+        np.minimum(self.min[slot], values, out=self.min[slot])
+        np.maximum(self.max[slot], values, out=self.max[slot])
+        if thresholds is not None:
+            self.on_minutes[slot] += values >= thresholds
+        self.latest_hour = max(self.latest_hour, hour)
+
+    def add_next(self, values, thresholds=None):
+        self.add(self.minute // self.minutes_per_hour, values, thresholds)
+        self.minute += 1
+
+    def extend(self, rows, thresholds=None):
+        """add_next() for each row of a (n, n_columns) array."""
+        for values in np.asarray(rows, dtype=np.float64):
+            self.add_next(values, thresholds)
+
+    def recent(self, hours=None, complete=False):
+        """
+        Hours with data among the last `hours` (default: the whole ring), oldest first.
+
+        Parameters:
+        - complete: Skip the newest hour while it has fewer than minutes_per_hour values
+
+        Returns:
+        - dict with 'hour' (k,), 'count' (k,) and 'mean', 'min', 'max', 'on_minutes' (k, n_columns)
+        """
+        hours = self.hours if hours is None else min(hours, self.hours)
+        latest = self.latest_hour
+        if complete and latest >= 0 and self.count[latest % self.hours] < self.minutes_per_hour:
+            latest -= 1
+        wanted = np.arange(latest - hours + 1, latest + 1)
+        wanted = wanted[wanted >= 0]
+        slots = wanted % self.hours
+        slots = slots[self.slot_hour[slots] == wanted]
+        count = self.count[slots]
+        return {
+            'hour': self.slot_hour[slots],
+            'count': count,
+            'mean': self.sum[slots] / np.maximum(count, 1)[:, None],
+            'min': self.min[slots],
+            'max': self.max[slots],
+            'on_minutes': self.on_minutes[slots],
+        }
+
+    def hourly_means(self, hours=None, complete=False):
+        """(k, n_columns) per-hour averages, oldest first."""
+        return self.recent(hours, complete)['mean']
@@ -0,0 +1,231 @@
+"""
+Append-only, compressed on-disk log of live sensor readings.
+
+Readings are handed to a background writer thread (append() never touches
+the disk) and written as compressed blocks into segment files rolled by
+time, e.g. one file per hour:
+
+  <log_dir>/meta.json               {"columns": [...], "segment_secs": 3600, "version": 1}
+  <log_dir>/seg-<start_epoch>.bin   blocks appended in time order
+
+Block layout (little-endian):
+
+  magic b"EPSB" | n_rows uint32 | n_cols uint16 | payload_len uint32 | crc32 uint32
+  payload = zlib(timestamps_ms delta int64[n_rows] + per-column delta of the float32 bit patterns)
+
+Deltas of the raw float32 bits are lossless and compress well for slowly
+changing appliance power. A crash can only lose the block being written;
+readers skip a truncated or corrupt trailing block.
+
+Examples:
+    python sensor_log.py info ../../data/sensor_log
+    python sensor_log.py export ../../data/sensor_log ../../data/history.hist
+"""
+
+import argparse
+import glob
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b"EPSB"
+VERSION = 1
+_BLOCK = struct.Struct("<4sIHII")
+
+
+def _encode_block(timestamps_ms, values):
+    ts_delta = np.diff(timestamps_ms, prepend=np.int64(0)).astype("<i8")
+    bits = np.ascontiguousarray(values.astype("<f4").T).view("<i4")
+    bits_delta = np.diff(bits, axis=1, prepend=np.zeros((bits.shape[0], 1), dtype="<i4"))
+    payload = zlib.compress(ts_delta.tobytes() + bits_delta.astype("<i4").tobytes(), 6)
+    header = _BLOCK.pack(MAGIC, len(timestamps_ms), values.shape[1], len(payload), zlib.crc32(payload))
+    return header + payload
+
+
+def _decode_block(n_rows, n_cols, payload):
+    raw = zlib.decompress(payload)
+    timestamps_ms = np.cumsum(np.frombuffer(raw, dtype="<i8", count=n_rows))
+    bits_delta = np.frombuffer(raw, dtype="<i4", offset=n_rows * 8).reshape(n_cols, n_rows)
+    bits = np.cumsum(bits_delta, axis=1, dtype="<i4")
+    return timestamps_ms, bits.view("<f4").T.copy()
+
+
+class SensorLogWriter:
+    def __init__(self, log_dir, columns, segment_secs=3600, flush_rows=600, flush_secs=30.0, max_pending=100000):
+        self.log_dir = log_dir
+        self.columns = list(columns)
+        self.segment_secs = segment_secs
+        self.flush_rows = flush_rows
+        self.flush_secs = flush_secs
+
+        os.makedirs(log_dir, exist_ok=True)
+        meta_path = os.path.join(log_dir, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['columns'] != self.columns:
+                raise ValueError(f"{log_dir} was written with columns {meta['columns']}")
+            self.segment_secs = meta['segment_secs']
+        else:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': VERSION, 'columns': self.columns, 'segment_secs': segment_secs}, f, indent=2)
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        self._thread = threading.Thread(target=self._run, name='sensor-log-writer', daemon=True)
+        self._thread.start()
+
+    def append(self, timestamp, values):
+        """Queue one reading (unix seconds, list of floats). Never blocks."""
+        try:
+            self._queue.put_nowait((timestamp, values))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=10.0):
+        """Flush pending readings and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.log_dir, f'seg-{segment * self.segment_secs}.bin')
+
+    def _write(self, segment, rows):
+        try:
+            self._write_block(segment, rows)
+        except OSError as e:
+            print(f"❌ Sensor log write failed, {len(rows)} readings lost: {e}")
+
+    def _write_block(self, segment, rows):
+        timestamps_ms = np.array([int(ts * 1000) for ts, _ in rows], dtype=np.int64)
+        values = np.array([v for _, v in rows], dtype=np.float32)
+        block = _encode_block(timestamps_ms, values)
+        with open(self._segment_path(segment), 'ab') as f:
+            f.write(block)
+        self.rows_written += len(rows)
+        self.bytes_written += len(block)
+
+    def _run(self):
+        rows, segment, last_flush = [], None, time.time()
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                item = False
+
+            if item is None:
+                if rows:
+                    self._write(segment, rows)
+                return
+
+            if item:
+                item_segment = int(item[0] // self.segment_secs)
+                if rows and item_segment != segment:
+                    self._write(segment, rows)
+                    rows, last_flush = [], time.time()
+                segment = item_segment
+                rows.append(item)
+
+            if rows and (len(rows) >= self.flush_rows or time.time() - last_flush >= self.flush_secs):
+                self._write(segment, rows)
+                rows, last_flush = [], time.time()
+
+
+class SensorLogReader:
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+        with open(os.path.join(log_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.columns = meta['columns']
+        self.segment_secs = meta['segment_secs']
+
+    def segments(self, start=None, end=None):
+        """Segment paths overlapping [start, end), in time order."""
+        found = []
+        for path in glob.glob(os.path.join(self.log_dir, 'seg-*.bin')):
+            seg_start = int(os.path.basename(path)[4:-4])
+            if end is not None and seg_start >= end:
+                continue
+            if start is not None and seg_start + self.segment_secs <= start:
+                continue
+            found.append((seg_start, path))
+        return [path for _, path in sorted(found)]
+
+    def iter_blocks(self, start=None, end=None):
+        """Yield (timestamps_seconds, values[n, n_cols]) per stored block, filtered to [start, end)."""
+        for path in self.segments(start, end):
+            with open(path, 'rb') as f:
+                data = f.read()
+            offset = 0
+            while offset + _BLOCK.size <= len(data):
+                magic, n_rows, n_cols, length, crc = _BLOCK.unpack_from(data, offset)
+                payload = data[offset + _BLOCK.size:offset + _BLOCK.size + length]
+                if magic != MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+                    print(f"⚠️ Skipping truncated/corrupt block in {path} at byte {offset}")
+                    break
+                offset += _BLOCK.size + length
+
+                timestamps_ms, values = _decode_block(n_rows, n_cols, payload)
+                timestamps = timestamps_ms / 1000.0
+                mask = np.ones(n_rows, dtype=bool)
+                if start is not None:
+                    mask &= timestamps >= start
+                if end is not None:
+                    mask &= timestamps < end
+                if mask.any():
+                    yield timestamps[mask], values[mask]
+
+    def read(self, start=None, end=None):
+        """All readings in [start, end) as (timestamps_seconds, values)."""
+        blocks = list(self.iter_blocks(start, end))
+        if not blocks:
+            return np.empty(0), np.empty((0, len(self.columns)), dtype=np.float32)
+        return np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks])
+
+
+def export_to_store(log_dir, store_path, start=None, end=None):
+    """Write the logged readings as a history store for training and backtests."""
+    from history_store import write_store
+
+    reader = SensorLogReader(log_dir)
+    timestamps, values = reader.read(start, end)
+    order = np.argsort(timestamps, kind='stable')
+    write_store(store_path, timestamps[order].astype(np.int64),
+                {name: values[order, i] for i, name in enumerate(reader.columns)})
+    return len(timestamps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor log tools.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    info = sub.add_parser('info', help="Summarize a sensor log")
+    info.add_argument('log_dir')
+
+    export = sub.add_parser('export', help="Export a sensor log into a history store")
+    export.add_argument('log_dir')
+    export.add_argument('store')
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        rows = export_to_store(args.log_dir, args.store)
+        print(f"✅ Exported {rows} readings -> {args.store}")
+    else:
+        reader = SensorLogReader(args.log_dir)
+        segments = reader.segments()
+        timestamps, _ = reader.read()
+        size = sum(os.path.getsize(p) for p in segments)
+        print(f"{args.log_dir}: {len(segments)} segment(s), {len(timestamps)} readings, {size} bytes, "
+              f"columns={reader.columns}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Multi-household predictor serving.
+
+Subscribes to a wildcard topic (default "home/+/power", plus its packed
+variant), keeps a ring buffer per home and gathers the ready windows of
+many homes into a single model.predict batch. Each home gets its own
+ON/OFF threshold calibrator (seeded from thresholds.json, updated with
+that home's readings) and its own appliance_data.txt under
+<output-dir>/<home_id>/.
+
+Example:
+    python serve_homes.py --topic "home/+/power" --output-dir ../../homes
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Loads the shared model and scaler once for all homes
+import Run_LSTM as predictor
+from ingest_queue import SampleQueue
+from mqtt_session import get_session_for_profile  # on sys.path via Run_LSTM
+from rollups import HourlyRollup
+from sensor_payload import decode_payload, packed_topic  # on sys.path via Run_LSTM
+from thresholds import ThresholdCalibrator, load_calibration
+
+default_output_dir = os.path.abspath(os.path.join(predictor.base_dir, '..', '..', 'homes'))
+max_windows_per_batch = 8192   # cap on windows sent to one model.predict call
+throughput_interval = 60       # seconds between homes/sec reports
+
+_home_id_re = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$')  # no leading dot: rules out '.' and '..'
+
+
+class HomeState:
+    def __init__(self, home_id, calibration=None):
+        self.home_id = home_id
+        self.buffer = deque(maxlen=predictor.max_buffer_size)
+        self.rollup = HourlyRollup(len(predictor.appliance_names), hours=predictor.rollup_hours)  # hourly aggregates of minute predictions
+        self.calibrator = ThresholdCalibrator(predictor.appliance_names, calibration)  # learns this home's ON/OFF levels
+        self.new_samples = 0
+
+    def is_ready(self):
+        return (self.new_samples >= predictor.predict_every
+                and len(self.buffer) >= predictor.seq_length + predictor.predict_every)
+
+    def take_recent(self):
+        """Samples needed to predict everything that arrived since the last prediction."""
+        window = min(self.new_samples, len(self.buffer) - predictor.seq_length)
+        self.new_samples = 0
+        return list(self.buffer)[-(predictor.seq_length + window):]
+
+
+def home_id_from_topic(topic_filter, topic):
+    """Return the segment of `topic` matched by the single-level wildcard in `topic_filter`."""
+    filter_parts = topic_filter.split('/')
+    parts = topic.split('/')
+    wildcard = filter_parts.index('+')
+    if len(parts) <= wildcard:
+        return None
+    home_id = parts[wildcard]
+    return home_id if _home_id_re.match(home_id) else None
+
+
+def make_windows(scaled):
+    """(n, features) -> (n - seq_length, seq_length, features), same windows as predict_on_buffer."""
+    windows = np.lib.stride_tricks.sliding_window_view(scaled, predictor.seq_length, axis=0)
+    return windows.transpose(0, 2, 1)[:-1]
+
+
+class HomeServer:
+    def __init__(self, topic_filter, output_dir):
+        self.topic_filter = topic_filter
+        self.output_dir = os.path.realpath(output_dir)
+        self.homes = {}
+        self.calibration = load_calibration()  # shared seed for every home's calibrator
+        self.queue = SampleQueue(maxsize=predictor.queue_max_size * 10, policy=predictor.queue_drop_policy)
+
+        self.homes_served = 0
+        self.batches = 0
+        self.started = time.time()
+
+    def home_dir(self, home_id):
+        """<output_dir>/<home_id>, or None if it would resolve (e.g. through a symlink) outside output_dir."""
+        home_dir = os.path.realpath(os.path.join(self.output_dir, home_id))
+        if os.path.dirname(home_dir) != self.output_dir:
+            return None
+        return home_dir
+
+    # --- MQTT (network thread: decode + enqueue only) ---
+    def on_message(self, msg):
+        try:
+            home_id = home_id_from_topic(self.topic_filter, msg.topic)
+            if home_id is None:
+                return
+            content_type = getattr(msg.properties, 'ContentType', None) if msg.properties else None
+            samples = decode_payload(msg.topic, msg.payload, predictor.appliance_names, content_type)
+            for values in samples.tolist():
+                self.queue.put((home_id, values))
+        except Exception as e:
+            print(f"❌ Error processing MQTT message on {msg.topic}:", e)
+
+    # --- Inference worker ---
+    def ingest(self, batch):
+        for _, (home_id, values) in batch:
+            home = self.homes.get(home_id)
+            if home is None:
+                home = self.homes[home_id] = HomeState(home_id, self.calibration)
+                print(f"New home: {home_id}")
+            home.buffer.append(values)
+            home.calibrator.update(values)
+            home.new_samples += 1
+
+    def predict_ready_homes(self):
+        ready = [home for home in self.homes.values() if home.is_ready()]
+        if not ready:
+            return 0
+
+        # Scale every ready home's recent data in one transform call
+        recents = [np.asarray(home.take_recent(), dtype=np.float64) for home in ready]
+        lengths = [len(r) for r in recents]
+        version = predictor.model_registry.current  # one model/scaler for the whole batch
+        scaled = version.scaler.transform(pd.DataFrame(np.concatenate(recents), columns=predictor.appliance_names))
+
+        windows, offset = [], 0
+        for n in lengths:
+            windows.append(make_windows(scaled[offset:offset + n]))
+            offset += n
+        counts = [len(w) for w in windows]
+
+        preds_scaled = version.model.predict(np.concatenate(windows), batch_size=max_windows_per_batch, verbose=0)
+        preds = version.scaler.inverse_transform(preds_scaled)
+        self.batches += 1
+
+        offset = 0
+        for home, count in zip(ready, counts):
+            home.rollup.extend(preds[offset:offset + count])
+            offset += count
+            home_dir = self.home_dir(home.home_id)
+            if home_dir is None:
+                print(f"⚠️ Skipping home {home.home_id}: output path escapes {self.output_dir}")
+                continue
+            os.makedirs(home_dir, exist_ok=True)
+            states, _ = predictor.hourly_states(home.rollup, home.calibrator, predictor.appliance_names)
+            predictor.write_states_file(states, predictor.appliance_names,
+                                        os.path.join(home_dir, 'appliance_data.txt'), model_tag=version.tag)
+        self.homes_served += len(ready)
+        return len(ready)
+
+    def worker(self):
+        last_report = time.time()
+        served_at_report = 0
+        while True:
+            predictor.activate_pending_model()
+            batch = self.queue.get_batch(max_items=max_windows_per_batch, timeout=predictor.batch_wait_secs)
+            self.ingest(batch)
+            try:
+                self.predict_ready_homes()
+            except Exception as e:
+                print("❌ Error running batched prediction:", e)
+
+            now = time.time()
+            if now - last_report >= throughput_interval:
+                rate = (self.homes_served - served_at_report) / (now - last_report)
+                stats = self.queue.stats()
+                print(f"[Serve] uptime={now - self.started:.0f}s homes={len(self.homes)} served={self.homes_served} "
+                      f"throughput={rate:.1f} homes/s batches={self.batches} "
+                      f"queue_depth={stats['depth']} lag={stats['lag_secs']:.2f}s dropped={stats['dropped']}")
+                last_report, served_at_report = now, self.homes_served
+
+    def run(self):
+        predictor.model_registry.start_watching()
+        threading.Thread(target=self.worker, daemon=True).start()
+        session = get_session_for_profile(predictor.mqtt_profile)
+        # Every home's topic is multiplexed over the one session
+        session.subscribe(self.topic_filter, self.on_message)
+        session.subscribe(packed_topic(self.topic_filter), self.on_message)
+        print(f"Subscribed to {self.topic_filter} and {packed_topic(self.topic_filter)}")
+        session.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve LSTM predictions for many homes from one process.")
+    parser.add_argument('--topic', default='home/+/power', help="Topic filter with a '+' in place of the home id")
+    parser.add_argument('--output-dir', default=default_output_dir)
+    args = parser.parse_args()
+
+    if '+' not in args.topic.split('/'):
+        parser.error("--topic must contain a '+' level for the home id")
+
+    HomeServer(args.topic, args.output_dir).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Typed handoff of 24-hour appliance states from the predictor to the agent.
+
+Replaces writing appliance_data.txt and re-parsing it in the agent:
+
+- In-process: StateBus.subscribe(callback) delivers every StatesMessage
+  synchronously, as numpy arrays, the moment it is published.
+- Across processes: a local UDP pub/sub. Subscribers register with the
+  publisher's port (and re-register periodically as a keepalive); the
+  publisher pushes each message to every registered subscriber and sends
+  the latest one to new subscribers right away.
+
+Wire schema (little-endian):
+
+  magic b"EPST" | version uint8 | n_appliances uint8 | hours uint8 | seq uint32 | timestamp float64
+  tag: uint8 length + utf-8      (e.g. model version)
+  n_appliances x [uint8 length + utf-8 name]
+  states   uint8  [n_appliances, hours]
+  averages float32[n_appliances, hours]
+  readings (version 2): k uint8 | hour int64[k] | count uint32[k]
+           mean, min, max float32[n_appliances, k] | on_minutes uint32[n_appliances, k]
+
+`readings` are the predictor's wall-clock hourly rollups of the real
+readings (hour = unix time // 3600, see rollups.py); k is 0 when there are
+none. Version 1 messages (no readings) are still accepted.
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+MAGIC = b"EPST"
+VERSION = 2
+SUBSCRIBE = b"EPST-SUB"
+BUS_HOST = "127.0.0.1"
+BUS_PORT = int(os.getenv("STATE_BUS_PORT", "47474"))
+KEEPALIVE_SECS = 30
+SUBSCRIBER_TTL_SECS = 3 * KEEPALIVE_SECS
+
+_HEADER = struct.Struct("<4sBBBId")
+_READING_FIELDS = (("mean", "<f4"), ("min", "<f4"), ("max", "<f4"), ("on_minutes", "<u4"))
+
+
+@dataclass
+class StatesMessage:
+    appliance_names: list
+    states: np.ndarray            # uint8 [n_appliances, hours]
+    averages: np.ndarray = None   # float32 [n_appliances, hours]
+    timestamp: float = field(default_factory=time.time)
+    seq: int = 0
+    tag: str = ""
+    readings: dict = None         # 'hour', 'count' (k,) and 'mean', 'min', 'max', 'on_minutes' [n_appliances, k]
+
+    def as_status(self):
+        """The {appliance: {"states": [...]}} dict the agent's file parser returns."""
+        return {name: {"states": self.states[i].astype(int).tolist()} for i, name in enumerate(self.appliance_names)}
+
+
+def _pack_str(text):
+    encoded = text.encode("utf-8")
+    return struct.pack("B", len(encoded)) + encoded
+
+
+def _unpack_str(data, offset):
+    length = data[offset]
+    return bytes(data[offset + 1:offset + 1 + length]).decode("utf-8"), offset + 1 + length
+
+
+def encode_states(msg):
+    n_appliances, hours = msg.states.shape
+    averages = msg.averages if msg.averages is not None else np.zeros((n_appliances, hours))
+    return (
+        _HEADER.pack(MAGIC, VERSION, n_appliances, hours, msg.seq, msg.timestamp)
+        + _pack_str(msg.tag)
+        + b"".join(_pack_str(name) for name in msg.appliance_names)
+        + np.ascontiguousarray(msg.states, dtype=np.uint8).tobytes()
+        + np.ascontiguousarray(averages, dtype="<f4").tobytes()
+        + _encode_readings(msg.readings, n_appliances)
+    )
+
+
+def _encode_readings(readings, n_appliances):
+    if readings is None:
+        return struct.pack("B", 0)
+    k = len(readings["hour"])
+    return (
+        struct.pack("B", k)
+        + np.ascontiguousarray(readings["hour"], dtype="<i8").tobytes()
+        + np.ascontiguousarray(readings["count"], dtype="<u4").tobytes()
+        + b"".join(np.ascontiguousarray(np.reshape(readings[name], (n_appliances, k)), dtype=dtype).tobytes()
+                   for name, dtype in _READING_FIELDS)
+    )
+
+
+def _decode_readings(data, offset, n_appliances):
+    k = data[offset]
+    offset += 1
+    if k == 0:
+        return None
+    readings = {"hour": np.frombuffer(data, dtype="<i8", count=k, offset=offset)}
+    offset += 8 * k
+    readings["count"] = np.frombuffer(data, dtype="<u4", count=k, offset=offset)
+    offset += 4 * k
+    for name, dtype in _READING_FIELDS:
+        readings[name] = np.frombuffer(data, dtype=dtype, count=n_appliances * k, offset=offset).reshape(n_appliances, k)
+        offset += 4 * n_appliances * k
+    return readings
+
+
+def decode_states(data):
+    magic, version, n_appliances, hours, seq, timestamp = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError("Not a state bus message")
+    tag, offset = _unpack_str(data, _HEADER.size)
+    names = []
+    for _ in range(n_appliances):
+        name, offset = _unpack_str(data, offset)
+        names.append(name)
+    states = np.frombuffer(data, dtype=np.uint8, count=n_appliances * hours, offset=offset)
+    offset += n_appliances * hours
+    averages = np.frombuffer(data, dtype="<f4", count=n_appliances * hours, offset=offset)
+    offset += 4 * n_appliances * hours
+    readings = _decode_readings(data, offset, n_appliances) if version >= 2 else None
+    return StatesMessage(names, states.reshape(n_appliances, hours), averages.reshape(n_appliances, hours),
+                         timestamp, seq, tag, readings)
+
+
+class StateBus:
+    """Publisher side. network=False keeps it purely in-process."""
+
+    def __init__(self, port=BUS_PORT, network=True):
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._subscribers = {}   # addr -> last keepalive time
+        self._seq = 0
+        self.latest = None
+        self._sock = None
+
+        if network:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.bind((BUS_HOST, port))
+            threading.Thread(target=self._accept_subscribers, name="state-bus", daemon=True).start()
+
+    def subscribe(self, callback):
+        """Register an in-process callback(StatesMessage)."""
+        with self._lock:
+            self._callbacks.append(callback)
+            latest = self.latest
+        if latest is not None:
+            callback(latest)
+
+    def publish(self, appliance_names, states, averages=None, tag="", readings=None):
+        with self._lock:
+            self._seq += 1
+            msg = StatesMessage(list(appliance_names), np.asarray(states, dtype=np.uint8),
+                                None if averages is None else np.asarray(averages, dtype=np.float32),
+                                time.time(), self._seq, tag, readings)
+            self.latest = msg
+            callbacks = list(self._callbacks)
+            subscribers = self._live_subscribers()
+            self._cond.notify_all()
+
+        for callback in callbacks:
+            try:
+                callback(msg)
+            except Exception as e:
+                print(f"❌ State bus callback failed: {e}")
+
+        if self._sock is not None and subscribers:
+            data = encode_states(msg)
+            for addr in subscribers:
+                self._send(data, addr)
+        return msg
+
+    def wait_for_update(self, after_seq=None, timeout=None):
+        """Same contract as StateBusSubscriber.wait_for_update, for consumers in this process."""
+        def has_update():
+            return self.latest is not None and (after_seq is None or self.latest.seq != after_seq)
+
+        with self._cond:
+            self._cond.wait_for(has_update, timeout)
+            return self.latest if has_update() else None
+
+    def _live_subscribers(self):
+        cutoff = time.time() - SUBSCRIBER_TTL_SECS
+        for addr in [a for a, seen in self._subscribers.items() if seen < cutoff]:
+            del self._subscribers[addr]
+        return list(self._subscribers)
+
+    def _send(self, data, addr):
+        try:
+            self._sock.sendto(data, addr)
+        except OSError as e:
+            print(f"⚠️ State bus send to {addr} failed: {e}")
+
+    def _accept_subscribers(self):
+        while True:
+            try:
+                data, addr = self._sock.recvfrom(64)
+            except OSError:
+                return
+            if data != SUBSCRIBE:
+                continue
+            with self._lock:
+                is_new = addr not in self._subscribers
+                self._subscribers[addr] = time.time()
+                latest = self.latest
+            if is_new and latest is not None:
+                self._send(encode_states(latest), addr)
+
+
+class StateBusSubscriber:
+    """Subscriber side for another process (e.g. the agent)."""
+
+    def __init__(self, port=BUS_PORT):
+        self._publisher = (BUS_HOST, port)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((BUS_HOST, 0))
+        self._cond = threading.Condition()
+        self.latest = None
+        self._last_keepalive = 0.0
+        self._keepalive()
+        threading.Thread(target=self._receive, name="state-bus-sub", daemon=True).start()
+
+    def _keepalive(self):
+        try:
+            self._sock.sendto(SUBSCRIBE, self._publisher)
+        except OSError:
+            pass
+        self._last_keepalive = time.time()
+
+    def _receive(self):
+        self._sock.settimeout(1.0)
+        while True:
+            if time.time() - self._last_keepalive >= KEEPALIVE_SECS:
+                self._keepalive()
+            try:
+                data, _ = self._sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                # e.g. ICMP port unreachable while the publisher is down
+                time.sleep(1.0)
+                continue
+            try:
+                msg = decode_states(data)
+            except (ValueError, struct.error):
+                continue
+            with self._cond:
+                self.latest = msg
+                self._cond.notify_all()
+
+    def wait_for_update(self, after_seq=None, timeout=None):
+        """
+        Block until a message newer than `after_seq` (or any message) arrives.
+        Returns the latest StatesMessage, or None on timeout.
+        """
+        def has_update():
+            if self.latest is None:
+                return False
+            return after_seq is None or self.latest.seq != after_seq
+
+        with self._cond:
+            self._cond.wait_for(has_update, timeout)
+            return self.latest if has_update() else None
@@ -0,0 +1,200 @@
+"""
+Per-appliance ON/OFF thresholds for binarizing power values.
+
+Online: OnOffLevelEstimator tracks an OFF level and an ON level per
+appliance (a two-cluster, online k-means with a floor on the learning
+rate and clipped outliers), updated in O(1) per reading. The threshold
+sits midway between the two levels, so a single spike barely moves it and
+no window rescans are needed.
+
+Offline: calibrate() picks thresholds from historical data with a
+vectorized two-class (Otsu) split of each appliance's histogram and
+writes them to thresholds.json, which seeds the online estimators.
+
+Until an estimator has seen both levels, binarization falls back to the
+legacy fraction-of-window-max rule (DEFAULT_THRESHOLD_RATIOS).
+
+Example:
+    python thresholds.py --data ../../data/final_realistic_appliance_power_data.csv
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+default_thresholds_path = os.path.join(base_dir, 'thresholds.json')
+
+# Legacy fallback: fraction of the window max that counts as ON
+DEFAULT_THRESHOLD_RATIOS = {
+    'WashingMachine_Power': 0.6,
+    'Heater_Power': 0.6,
+    'AC_Power': 0.6,
+    'VehicleCharger_Power': 0.8,
+    'VacuumCleaner_Power': 0.8,
+}
+DEFAULT_RATIO = 0.8
+
+
+class OnOffLevelEstimator:
+    def __init__(self, alpha=0.01, min_count=10, min_gap=50.0, off_level=None, on_level=None):
+        """
+        Parameters:
+        - alpha: Floor on the learning rate once a level has seen 1/alpha readings
+        - min_count: Readings required on each level before the threshold is trusted
+        - min_gap: Minimum ON-OFF separation (watts) for the levels to count as distinct
+        - off_level / on_level: Optional starting levels (e.g. from offline calibration)
+        """
+        self.alpha = alpha
+        self.min_count = min_count
+        self.min_gap = min_gap
+        self.off_level = off_level
+        self.on_level = on_level
+        seeded = off_level is not None and on_level is not None
+        self.off_count = min_count if seeded else 0
+        self.on_count = min_count if seeded else 0
+
+    def update(self, value):
+        value = float(value)
+        if self.off_level is None:
+            self.off_level = self.on_level = value
+            self.off_count += 1
+            return
+        if self.is_ready():
+            # Clip outliers to one level-gap beyond the levels so a spike barely moves them
+            gap = self.on_level - self.off_level
+            value = min(max(value, self.off_level - gap), self.on_level + gap)
+        if value > (self.off_level + self.on_level) / 2:
+            self.on_count += 1
+            self.on_level += max(self.alpha, 1.0 / self.on_count) * (value - self.on_level)
+        else:
+            self.off_count += 1
+            self.off_level += max(self.alpha, 1.0 / self.off_count) * (value - self.off_level)
+
+    def is_ready(self):
+        return (self.off_count >= self.min_count and self.on_count >= self.min_count
+                and self.on_level - self.off_level >= self.min_gap)
+
+    def threshold(self):
+        if not self.is_ready():
+            return None
+        return (self.off_level + self.on_level) / 2
+
+
+class ThresholdCalibrator:
+    def __init__(self, appliance_names, calibration=None, **estimator_kwargs):
+        calibration = calibration or {}
+        self.appliance_names = list(appliance_names)
+        self.estimators = {
+            name: OnOffLevelEstimator(
+                off_level=calibration.get(name, {}).get('off_level'),
+                on_level=calibration.get(name, {}).get('on_level'),
+                **estimator_kwargs,
+            )
+            for name in self.appliance_names
+        }
+
+    def update(self, values):
+        """Feed one reading (list in appliance_names order)."""
+        for name, value in zip(self.appliance_names, values):
+            self.estimators[name].update(value)
+
+    def thresholds(self):
+        return {name: est.threshold() for name, est in self.estimators.items()}
+
+    def threshold_for(self, appliance_name, reference_values):
+        """Learned threshold, or the legacy ratio of max(reference_values) while still warming up."""
+        threshold = self.estimators[appliance_name].threshold()
+        if threshold is None:
+            ratio = DEFAULT_THRESHOLD_RATIOS.get(appliance_name, DEFAULT_RATIO)
+            threshold = ratio * np.max(reference_values)
+        return threshold
+
+    def binarize(self, appliance_name, power_values):
+        """ON/OFF states for `power_values` (legacy rule uses the max of the same window)."""
+        power_values = np.asarray(power_values)
+        return (power_values >= self.threshold_for(appliance_name, power_values)).astype(int)
+
+
+def otsu_levels(values, bins=256):
+    """
+    Two-class split of each column of `values` (n, k), all columns at once.
+
+    Returns:
+    - (thresholds, off_levels, on_levels), each of shape (k,); the threshold is
+      the midpoint of the two class means, matching OnOffLevelEstimator
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lo, hi = values.min(axis=0), values.max(axis=0)
+    span = np.where(hi > lo, hi - lo, 1.0)
+
+    # Per-column histograms in one bincount
+    idx = np.minimum(((values - lo) / span * bins).astype(np.int64), bins - 1)
+    idx += np.arange(values.shape[1]) * bins
+    hist = np.bincount(idx.ravel(), minlength=bins * values.shape[1]).reshape(values.shape[1], bins)
+    centers = lo[:, None] + (np.arange(bins) + 0.5)[None, :] / bins * span[:, None]
+
+    weight_off = np.cumsum(hist, axis=1)[:, :-1]
+    weight_on = hist.sum(axis=1, keepdims=True) - weight_off
+    sum_off = np.cumsum(hist * centers, axis=1)[:, :-1]
+    sum_on = (hist * centers).sum(axis=1, keepdims=True) - sum_off
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_off = sum_off / weight_off
+        mean_on = sum_on / weight_on
+        between = weight_off * weight_on * (mean_on - mean_off) ** 2
+    between = np.nan_to_num(between, nan=-1.0)
+
+    split = between.argmax(axis=1)
+    rows = np.arange(values.shape[1])
+    off_levels, on_levels = mean_off[rows, split], mean_on[rows, split]
+    return (off_levels + on_levels) / 2, off_levels, on_levels
+
+
+def calibrate(values, appliance_names):
+    """Offline calibration: {appliance: {"threshold", "off_level", "on_level"}} in watts."""
+    thresholds, off_levels, on_levels = otsu_levels(values)
+    return {
+        name: {
+            'threshold': float(thresholds[i]),
+            'off_level': float(np.nan_to_num(off_levels[i])),
+            'on_level': float(np.nan_to_num(on_levels[i])),
+        }
+        for i, name in enumerate(appliance_names)
+    }
+
+
+def load_calibration(path=default_thresholds_path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_calibration(calibration, path=default_thresholds_path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(calibration, f, indent=2)
+
+
+def main():
+    from train_lstm import appliance_names, default_data_path, load_series
+
+    parser = argparse.ArgumentParser(description="Calibrate per-appliance ON/OFF thresholds from history.")
+    parser.add_argument('--data', default=default_data_path, help="History CSV or history store directory")
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--out', default=default_thresholds_path)
+    args = parser.parse_args()
+
+    series = load_series(args.data, args.start, args.end)
+    calibration = calibrate(series, appliance_names)
+    for name, levels in calibration.items():
+        print(f"{name}: threshold={levels['threshold']:.1f} W "
+              f"(OFF~{levels['off_level']:.1f} W, ON~{levels['on_level']:.1f} W)")
+    save_calibration(calibration, args.out)
+    print(f"✅ Saved thresholds to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
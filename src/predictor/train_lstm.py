@@ -0,0 +1,149 @@
+"""
+Scripted training for the appliance LSTM (replaces the notebook's create_sequences flow).
+
+Windows are produced lazily from the scaled series with
+tf.keras.utils.timeseries_dataset_from_array, so memory stays at one copy
+of the (N, 5) data instead of an (N, 24, 5) window array. The split is
+time ordered (train / validation / test are consecutive blocks), so
+overlapping windows never leak between splits.
+
+Writes my_lstm_model.keras and scaler.pkl in the layout Run_LSTM.py loads.
+
+Example:
+    python train_lstm.py --data ../../data/final_realistic_appliance_power_data.csv --epochs 50
+    python train_lstm.py --data ../../data/history.hist --start 2025-01-01 --end 2025-04-01
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from history_store import HistoryStore
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+default_data_path = os.path.abspath(os.path.join(base_dir, '..', '..', 'data', 'final_realistic_appliance_power_data.csv'))
+default_model_path = os.path.join(base_dir, 'my_lstm_model.keras')
+default_scaler_path = os.path.join(base_dir, 'scaler.pkl')
+
+appliance_names = [
+    'WashingMachine_Power',
+    'Heater_Power',
+    'AC_Power',
+    'VehicleCharger_Power',
+    'VacuumCleaner_Power'
+]
+seq_length = 24
+csv_chunk_rows = 100_000
+
+
+def load_series(path, start=None, end=None):
+    """
+    Load the appliance columns as one float32 array from either a history
+    store directory (time-range sliced, memory-mapped) or a CSV (read in chunks).
+    """
+    if os.path.isdir(path):
+        return HistoryStore(path).to_array(appliance_names, start, end)
+    if start is not None or end is not None:
+        raise ValueError("--start/--end need a history store; convert the CSV with history_store.py first")
+    chunks = pd.read_csv(path, usecols=appliance_names, dtype=np.float32, chunksize=csv_chunk_rows)
+    return np.concatenate([chunk[appliance_names].to_numpy() for chunk in chunks])
+
+
+def time_split(n_rows, val_fraction, test_fraction):
+    """Row boundaries for consecutive train / validation / test blocks."""
+    train_end = int(n_rows * (1 - val_fraction - test_fraction))
+    val_end = int(n_rows * (1 - test_fraction))
+    return train_end, val_end
+
+
+def fit_scaler(series):
+    """MinMaxScaler fitted on the training rows only, in chunks (named columns, as Run_LSTM uses)."""
+    scaler = MinMaxScaler()
+    for start in range(0, len(series), csv_chunk_rows):
+        scaler.partial_fit(pd.DataFrame(series[start:start + csv_chunk_rows], columns=appliance_names))
+    return scaler
+
+
+def make_dataset(scaled, batch_size, shuffle=False):
+    """Lazy (window, next-step) dataset: x = scaled[i:i+24], y = scaled[i+24] for every i."""
+    import tensorflow as tf
+
+    # Window count is capped by len(targets), so the last full window has no target
+    return tf.keras.utils.timeseries_dataset_from_array(
+        data=scaled,
+        targets=scaled[seq_length:],
+        sequence_length=seq_length,
+        batch_size=batch_size,
+        shuffle=shuffle,
+    )
+
+
+def build_model(hidden_units=128, learning_rate=0.001):
+    from tensorflow.keras.layers import LSTM, Dense, Input
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.optimizers import Adam
+
+    model = Sequential([
+        Input(shape=(seq_length, len(appliance_names))),
+        LSTM(hidden_units, return_sequences=False),
+        Dense(len(appliance_names)),  # One output per appliance
+    ])
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
+    return model
+
+
+def train(series, epochs=50, batch_size=32, hidden_units=128, learning_rate=0.001,
+          val_fraction=0.2, test_fraction=0.1, model_path=default_model_path, scaler_path=default_scaler_path):
+    train_end, val_end = time_split(len(series), val_fraction, test_fraction)
+    if min(train_end, val_end - train_end, len(series) - val_end) <= seq_length:
+        raise ValueError(f"Not enough rows ({len(series)}) for a {seq_length}-step time-ordered split")
+
+    scaler = fit_scaler(series[:train_end])
+    scaled = scaler.transform(pd.DataFrame(series, columns=appliance_names)).astype(np.float32)
+
+    train_ds = make_dataset(scaled[:train_end], batch_size)
+    val_ds = make_dataset(scaled[train_end:val_end], batch_size)
+    test_ds = make_dataset(scaled[val_end:], batch_size)
+    print(f"Rows: train={train_end} val={val_end - train_end} test={len(series) - val_end}")
+
+    model = build_model(hidden_units, learning_rate)
+    model.summary()
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs)
+
+    mse = model.evaluate(test_ds, verbose=0)
+    print(f"Test MSE: {mse}")
+
+    model.save(model_path)
+    with open(scaler_path, 'wb') as f:
+        pickle.dump(scaler, f)
+    print(f"Saved model to {model_path} and scaler to {scaler_path}")
+    return model, scaler, mse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the appliance LSTM with streamed windows.")
+    parser.add_argument('--data', default=default_data_path, help="History CSV or history store directory")
+    parser.add_argument('--start', default=None, help="First timestamp to train on (history store only)")
+    parser.add_argument('--end', default=None, help="Timestamp to stop before (history store only)")
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--hidden-units', type=int, default=128)
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    parser.add_argument('--val-fraction', type=float, default=0.2)
+    parser.add_argument('--test-fraction', type=float, default=0.1)
+    parser.add_argument('--model-out', default=default_model_path)
+    parser.add_argument('--scaler-out', default=default_scaler_path)
+    args = parser.parse_args()
+
+    series = load_series(args.data, args.start, args.end)
+    train(series, epochs=args.epochs, batch_size=args.batch_size, hidden_units=args.hidden_units,
+          learning_rate=args.learning_rate, val_fraction=args.val_fraction, test_fraction=args.test_fraction,
+          model_path=args.model_out, scaler_path=args.scaler_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Single-process supervisor for the edge stack (replaces the publisher /
+predictor / agent part of run_files.sh).
+
+Each component runs in a daemon thread of this interpreter, supervised by
+an asyncio task:
+
+- publisher: TOU scraper -> MQTT (src/mqtt/publish_tou_test.py by default)
+- predictor: Run_LSTM.main(); the model and scaler are loaded once and
+  survive restarts
+- agent: agent.main_loop(), reading states straight from the predictor's
+  in-process StateBus instead of a UDP subscriber or appliance_data.txt
+
+Startup is gated on readiness events instead of fixed sleeps: the agent
+starts as soon as the predictor has states and the publisher has pushed
+the TOU table (or READY_TIMEOUT_SECS has passed). A component that exits
+or raises is restarted with exponential backoff.
+
+Ollama and Mosquitto are external services and are still started by
+run_files.sh.
+
+Examples:
+    python src/run_edge.py
+    python src/run_edge.py --components predictor,agent
+    TOU_PUBLISHER=publish_tou_hivemq python src/run_edge.py
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import threading
+import time
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+for sub_dir in ('mqtt', 'predictor', 'agent'):
+    sys.path.append(os.path.join(base_dir, sub_dir))
+
+TOU_PUBLISHER = os.getenv('TOU_PUBLISHER', 'publish_tou_test')
+READY_TIMEOUT_SECS = 180   # start dependents anyway after this long
+READY_POLL_SECS = 0.2
+BACKOFF_INITIAL_SECS = 1
+BACKOFF_MAX_SECS = 60
+HEALTHY_RUN_SECS = 300     # a run this long resets the backoff
+
+
+class Component:
+    def __init__(self, name, run, needs=()):
+        """
+        Parameters:
+        - name: Label used in logs and as the thread name
+        - run: Callable(ready) that blocks while the component is running
+        - needs: Components that must be ready before this one starts
+        """
+        self.name = name
+        self.run = run
+        self.needs = list(needs)
+        self.ready = threading.Event()
+        self.restarts = 0
+
+
+def run_publisher(ready):
+    publisher = importlib.import_module(TOU_PUBLISHER)
+    publisher.main(ready)
+
+
+def run_predictor(ready):
+    import Run_LSTM
+    Run_LSTM.main(ready)
+
+
+def run_agent(ready):
+    import Run_LSTM
+    import agent
+
+    if Run_LSTM.state_bus is not None:
+        # StateBus.wait_for_update matches StateBusSubscriber's, so the agent reads it directly
+        agent.state_subscriber = Run_LSTM.state_bus
+    ready.set()
+    agent.main_loop()
+
+
+def _run_in_thread(component):
+    """Start component.run in a daemon thread; the returned future resolves when it exits."""
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    def finish(error):
+        if not done.done():
+            done.set_result(error)
+
+    def target():
+        error = None
+        try:
+            component.run(component.ready)
+        except BaseException as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(finish, error)
+        except RuntimeError:
+            pass  # event loop already closed (shutting down)
+
+    threading.Thread(target=target, name=component.name, daemon=True).start()
+    return done
+
+
+async def _wait_ready(component, timeout):
+    deadline = time.monotonic() + timeout
+    while not component.ready.is_set():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(READY_POLL_SECS)
+    return True
+
+
+async def supervise(component):
+    for dependency in component.needs:
+        print(f"[edge] {component.name} waiting for {dependency.name}...")
+        if not await _wait_ready(dependency, READY_TIMEOUT_SECS):
+            print(f"⚠️ [edge] {dependency.name} not ready after {READY_TIMEOUT_SECS}s; starting {component.name} anyway")
+
+    backoff = BACKOFF_INITIAL_SECS
+    while True:
+        print(f"[edge] Starting {component.name}")
+        started = time.monotonic()
+        error = await _run_in_thread(component)
+        component.ready.clear()
+
+        if error is None:
+            print(f"⚠️ [edge] {component.name} exited")
+        else:
+            print(f"❌ [edge] {component.name} failed: {error!r}")
+
+        if time.monotonic() - started >= HEALTHY_RUN_SECS:
+            backoff = BACKOFF_INITIAL_SECS
+        component.restarts += 1
+        print(f"[edge] Restarting {component.name} in {backoff}s (restart #{component.restarts})")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, BACKOFF_MAX_SECS)
+
+
+def build_components(names):
+    publisher = Component('publisher', run_publisher)
+    predictor = Component('predictor', run_predictor)
+    agent = Component('agent', run_agent, needs=[c for c in (predictor, publisher) if c.name in names])
+    return [c for c in (publisher, predictor, agent) if c.name in names]
+
+
+async def run(names):
+    components = build_components(names)
+    started = time.monotonic()
+    tasks = [asyncio.create_task(supervise(c), name=c.name) for c in components]
+
+    async def report_ready():
+        for component in components:
+            await _wait_ready(component, float('inf'))
+        print(f"✅ [edge] All components ready in {time.monotonic() - started:.1f}s")
+
+    tasks.append(asyncio.create_task(report_ready()))
+    await asyncio.gather(*tasks)
+
+
+def shutdown():
+    """Persist predictor state; its own finally-block never runs when daemon threads are dropped."""
+    predictor = sys.modules.get('Run_LSTM')
+    if predictor is None:
+        return
+    predictor.save_state()
+    if predictor.sensor_log is not None:
+        predictor.sensor_log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the TOU publisher, predictor and agent in one process.")
+    parser.add_argument('--components', default='publisher,predictor,agent',
+                        help="Comma-separated subset of publisher,predictor,agent")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.components.split(',') if name.strip()]
+    unknown = set(names) - {'publisher', 'predictor', 'agent'}
+    if unknown:
+        parser.error(f"Unknown component(s): {', '.join(sorted(unknown))}")
+    try:
+        asyncio.run(run(names))
+    except KeyboardInterrupt:
+        print("\n[edge] Shutting down...")
+    finally:
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()